@@ -0,0 +1,55 @@
+"""农历与公历批量换算命令行工具。
+
+用法：python main.py convert (--to-solar | --to-lunar) [--year 2026] [--column 0] [文件 ...]
+
+    每行一个日期（或 CSV 的某一列），在行尾追加换算结果后输出到标准输出；
+    不给文件时从标准输入读取，逐行处理，不必整体读入内存。
+    农历日期写作 2025-08-15，闰月写作 2025-闰06-01 或 2025-L06-01；
+    给出 --year 时按该农历年换算纪念日（如生日），可只写月日，
+    该年没有对应闰月时取普通月，日超出月长时取月末。
+    第一行的日期列不含数字时视为 CSV 表头，照样输出并追加结果列名。
+
+无法换算的行结果留空并在标准错误输出中说明，此时退出码为 1。
+"""
+import argparse
+import csv
+import sys
+from calendar_core import MIN_YEAR, MAX_YEAR, iter_converted_rows
+
+
+def convert_stream(lines, writer, to_solar, column=0, year=None, source="-"):
+    """换算一个输入流，返回失败的行数"""
+    failures = 0
+    for line_number, (row, error) in enumerate(
+            iter_converted_rows(csv.reader(lines), to_solar, column, year), 1):
+        writer.writerow(row)
+        if error:
+            failures += 1
+            print(f"{source}:{line_number}: {error}", file=sys.stderr)
+    return failures
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="main.py convert", description="农历与公历批量换算（不启动图形界面）")
+    direction = parser.add_mutually_exclusive_group(required=True)
+    direction.add_argument("--to-solar", action="store_true", help="农历转公历")
+    direction.add_argument("--to-lunar", action="store_true", help="公历转农历")
+    parser.add_argument("--year", type=int, help="按该农历年换算纪念日，仅用于 --to-solar")
+    parser.add_argument("--column", type=int, default=0, help="日期所在的 CSV 列（从 0 开始），默认 0")
+    parser.add_argument("files", nargs="*", help="输入文件，默认读取标准输入")
+    args = parser.parse_args(argv)
+    if args.year is not None and (args.to_lunar or not MIN_YEAR <= args.year <= MAX_YEAR):
+        parser.error(f"--year 只能与 --to-solar 一起使用，且在 {MIN_YEAR}-{MAX_YEAR} 之间")
+
+    writer = csv.writer(sys.stdout, lineterminator="\n")
+    failures = 0
+    if not args.files:
+        failures += convert_stream(sys.stdin, writer, args.to_solar, args.column, args.year)
+    for path in args.files:
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            failures += convert_stream(f, writer, args.to_solar, args.column, args.year, path)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,1760 @@
+"""万年历的日期数据：日期信息计算、假期数据读写与 iCalendar 导入导出。
+
+本模块不依赖 PySide6，图形界面与命令行服务（serve）共用。
+"""
+import calendar
+import csv
+import glob
+import json
+import mmap
+import multiprocessing
+import os
+import re
+import sqlite3
+import struct
+import sys
+import zlib
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta, date, timezone
+from lunar_python import Solar, SolarMonth, Lunar, LunarYear, LunarMonth
+from lunar_python.util import HolidayUtil, LunarUtil, SolarUtil
+from calendar_metrics import METRICS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None # 列式日表是可选的，没有 NumPy 时逐日调用 lunar_python 计算
+
+def supported_year_range():
+    """根据 lunar_python 的能力确定日历支持的年份范围。
+
+    lunar_python 以 1582 年 10 月为界，此前按儒略历计算（如 1500-02-29 存在），
+    与界面和缓存使用的 datetime.date（外推格里高利历）不一致，因此从改历后的第一个整年开始；
+    上限取 lunar_python 与 datetime.date 都能表示的最大年份。
+    """
+    year = 2000
+    while all(SolarUtil.getDaysOfMonth(year - 1, m) == calendar.monthrange(year - 1, m)[1] for m in range(1, 13)):
+        year -= 1
+    return year, date.max.year
+
+
+# 日历支持的年份范围
+MIN_YEAR, MAX_YEAR = supported_year_range()
+
+# 用户配置目录，保存导入的假期数据等
+CONFIG_DIR = os.path.expanduser("~/.config/OfflineCalendar")
+
+
+# 假期地区：(标识, 显示名称)。内地以 lunar_python 自带的数据为基础，其余地区只包含用户导入的数据
+HOLIDAY_REGIONS = (
+    ("mainland", "内地"),
+    ("hongkong", "香港"),
+    ("macau", "澳门"),
+)
+DEFAULT_REGION = "mainland"
+
+# 各地区假期安排所用的时区：内地、香港、澳门都是 UTC+8，且不实行夏令时
+HOLIDAY_TIMEZONE = timezone(timedelta(hours=8))
+
+# HolidayUtil 用 chr(48 + 下标) 表示名称，"~" 是删除标记，下标不能超过 77
+MAX_HOLIDAY_NAMES = ord("~") - 48
+
+# HolidayUtil 数据串中每天一条记录的长度：当天 YYYYMMDD + 名称下标 + 调休标识 + 节假日当天 YYYYMMDD
+HOLIDAY_RECORD_SIZE = 18
+
+
+def user_holidays_path(region=DEFAULT_REGION):
+    os.makedirs(CONFIG_DIR, exist_ok=True)
+    if region == DEFAULT_REGION:
+        return os.path.join(CONFIG_DIR, "user_holidays.json")
+    return os.path.join(CONFIG_DIR, f"user_holidays-{region}.json")
+
+
+# HolidayUtil 没有公开正在使用的名称表与数据串，地区切换和用户假期只能读写它的私有属性，
+# 且只通过下面两个函数进行。lunar_python 改变内部实现后退回只使用内置数据，其余功能不受影响
+HOLIDAY_DATA_SWITCHABLE = (isinstance(getattr(HolidayUtil, "_HolidayUtil__NAMES_IN_USE", None), (list, tuple))
+                           and isinstance(getattr(HolidayUtil, "_HolidayUtil__DATA_IN_USE", None), str))
+if not HOLIDAY_DATA_SWITCHABLE:
+    print("lunar_python 的 HolidayUtil 内部结构已变化，地区假期与导入的假期不会生效，只使用内置假期数据",
+          file=sys.stderr)
+
+
+def current_holiday_data():
+    """当前生效的假期名称表与数据串，也供工作进程使用相同的假期安排"""
+    if not HOLIDAY_DATA_SWITCHABLE:
+        return list(HolidayUtil.NAMES), ""
+    return HolidayUtil._HolidayUtil__NAMES_IN_USE, HolidayUtil._HolidayUtil__DATA_IN_USE
+
+
+def use_holiday_data(names, data):
+    """让 HolidayUtil 使用给定的假期名称表与数据串（也是工作进程的初始化函数）"""
+    if HOLIDAY_DATA_SWITCHABLE:
+        HolidayUtil._HolidayUtil__NAMES_IN_USE = names
+        HolidayUtil._HolidayUtil__DATA_IN_USE = data
+
+
+def split_holiday_data(data):
+    """把 HolidayUtil 数据串切成每天一条的记录，末尾不足一条的部分忽略"""
+    return [data[i:i + HOLIDAY_RECORD_SIZE] for i in range(0, len(data) - HOLIDAY_RECORD_SIZE + 1, HOLIDAY_RECORD_SIZE)]
+
+
+def read_user_holidays(path):
+    """读取用户假期文件，返回 (名称表或 None, {年份: 数据串})。
+
+    文件不存在时返回空数据；内容不是合法的 JSON 对象（例如另一个进程正在写入）时抛出 ValueError。
+    """
+    try:
+        with open(path, "r") as f:
+            user_data = json.load(f)
+    except FileNotFoundError:
+        return None, {}
+    if not isinstance(user_data, dict):
+        raise ValueError(f"用户假期文件格式无效：{path}")
+    names = user_data.pop("names", None)
+    years = {key: value for key, value in user_data.items() if isinstance(value, str)}
+    return (names if isinstance(names, list) else None), years
+
+
+class HolidayRegion:
+    """一个地区编译好的假期数据：HolidayUtil 使用的名称表与数据串"""
+
+    def __init__(self, key, label, names, data):
+        self.key = key
+        self.label = label
+        self.names = names
+        self.data = data
+        # 未叠加用户数据的原始数据串，以及上次读取的用户假期文件（按年份）与文件状态
+        self.base_data = data
+        self.user_years = {}
+        self.user_file_state = None
+
+    @property
+    def extends_names(self):
+        """内地只接受标准名称，其余地区导入时遇到新名称会追加到名称表"""
+        return self.key != DEFAULT_REGION
+
+    def activate(self):
+        use_holiday_data(self.names, self.data)
+        DAY_TABLE.region = self.key
+
+    @METRICS.timed
+    def load_user_holidays(self):
+        """读取并应用本地区用户导入的假期数据，返回数据有变化的日期集合。
+
+        与上次读取的内容按年份比较，只重新编译有变化的年份涉及的日子：这些日子先恢复为原始数据，
+        再按文件中的顺序叠加各年份的记录（与 HolidayUtil.fix 相同，后出现的记录覆盖先出现的，
+        "~" 标记删除），其余日子的记录原样保留。HolidayUtil.getHolidays 要求同一年的记录连续，
+        所以合并后的记录按日期排序。文件未变化或内容无效时不做任何改动。
+        """
+        path = user_holidays_path(self.key)
+        try:
+            stat = os.stat(path)
+            state = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except FileNotFoundError:
+            state = None
+        if state is not None and state == self.user_file_state:
+            return set()
+        try:
+            names, years = read_user_holidays(path)
+        except ValueError:
+            return set() # 文件无效（可能正在被写入），等下次变化再读
+        self.user_file_state = state
+
+        if names is not None and self.extends_names and names != self.names:
+            # 名称表变化后记录中的名称下标含义随之改变，所有年份都要重新编译
+            self.names[:] = names
+            changed = self.user_years.keys() | years.keys()
+        else:
+            changed = {key for key in self.user_years.keys() | years.keys()
+                       if self.user_years.get(key) != years.get(key)}
+        days = {record[:8] for key in changed
+                for record in split_holiday_data(self.user_years.get(key, "")) + split_holiday_data(years.get(key, ""))}
+        self.user_years = years
+        if not days:
+            return set()
+
+        records = {record[:8]: record for record in split_holiday_data(self.base_data) if record[:8] in days}
+        for data_string in years.values():
+            for record in split_holiday_data(data_string):
+                if record[:8] not in days:
+                    continue
+                if record[8] == "~":
+                    records.pop(record[:8], None)
+                else:
+                    records[record[:8]] = record
+        kept = [record for record in split_holiday_data(self.data) if record[:8] not in days]
+        self.data = "".join(sorted(kept + list(records.values())))
+        return {date(int(day[:4]), int(day[4:6]), int(day[6:8])) for day in days}
+
+
+class HolidayRegions:
+    """各地区的假期数据，启动时各编译一次；切换地区只替换 HolidayUtil 正在使用的数据引用"""
+
+    def __init__(self):
+        _, base_data = current_holiday_data()
+        self.regions = {}
+        for key, label in HOLIDAY_REGIONS:
+            region = HolidayRegion(key, label, list(HolidayUtil.NAMES), base_data if key == DEFAULT_REGION else "")
+            region.activate()
+            region.load_user_holidays()
+            self.regions[key] = region
+        self.active = self.regions[DEFAULT_REGION]
+        self.active.activate()
+
+    def activate(self, key):
+        self.active = self.regions.get(key, self.regions[DEFAULT_REGION])
+        self.active.activate()
+        return self.active
+
+    def reload_user_holidays(self, key):
+        """重新读取某地区的用户假期文件，返回数据有变化的日期集合；当前地区的新数据立即生效"""
+        region = self.regions[key]
+        previous = region.data
+        days = region.load_user_holidays()
+        if days and region is self.active:
+            region.activate()
+            DAY_TABLE.update_marks(previous, days)
+        return days
+
+
+
+def get_day_mark(solar_day):
+    """返回某天的休/班标记：法定节假日安排优先，其次是周末"""
+    holiday = HolidayUtil.getHoliday(solar_day.getYear(), solar_day.getMonth(), solar_day.getDay())
+    if holiday:
+        return "班" if holiday.isWork() else "休"
+    if solar_day.getWeek() == 0 or solar_day.getWeek() == 6:
+        return "休"
+    return ""
+
+
+# 一天的显示数据，月历网格与托盘小日历共用
+DayInfo = namedtuple("DayInfo", ["ordinal", "year", "month", "day", "week", "festival", "lunar_text", "mark"])
+
+
+def build_month_days(year, month):
+    """计算某月每一天的显示数据"""
+    if DAY_TABLE.covers(year):
+        return DAY_TABLE.month_days(year, month)
+    days = []
+    for solar_day in SolarMonth.fromYm(year, month).getDays():
+        lunar_day = solar_day.getLunar()
+        festivals = lunar_day.getFestivals() + solar_day.getFestivals()
+        lunar_text = lunar_day.getJieQi() or f"{lunar_day.getMonthInChinese()}月{lunar_day.getDayInChinese()}"
+        days.append(DayInfo(
+            date(year, month, solar_day.getDay()).toordinal(),
+            year, month, solar_day.getDay(), solar_day.getWeek(),
+            festivals[0] if festivals else "", lunar_text, get_day_mark(solar_day),
+        ))
+    return tuple(days)
+
+
+# 左侧详情面板各标签的文字
+DayDetail = namedtuple("DayDetail", ["year_month", "day", "lunar_weekday", "ganzhi", "festivals", "yi", "ji"])
+
+
+def build_day_detail(year, month, day):
+    """计算某天在左侧详情面板中显示的文字"""
+    if DAY_TABLE.covers(year):
+        return DAY_TABLE.day_detail(year, month, day)
+    solar_day = Solar.fromYmd(year, month, day)
+    lunar_day = solar_day.getLunar()
+
+    festivals = lunar_day.getFestivals() + solar_day.getFestivals() + solar_day.getOtherFestivals()
+    festivals = list(dict.fromkeys(festivals))
+
+    return DayDetail(
+        f"{year}年{month}月",
+        str(day),
+        f"{lunar_day.getMonthInChinese()}月{lunar_day.getDayInChinese()} 星期{solar_day.getWeekInChinese()}",
+        f"{lunar_day.getYearInGanZhi()}年 {lunar_day.getMonthInGanZhi()}月 {lunar_day.getDayInGanZhi()}日 【属{lunar_day.getYearShengXiao()}】",
+        " ".join(festivals),
+        " ".join(lunar_day.getDayYi()),
+        " ".join(lunar_day.getDayJi()),
+    )
+
+
+def build_months(months, holiday_data, progress=None, cancelled=None):
+    """用进程池计算多个月份的显示数据，返回与 months（(年, 月) 列表）顺序一致的列表。
+
+    holiday_data 是 current_holiday_data() 的结果；progress(已完成数) 报告进度，
+    cancelled() 返回真时提前结束并返回 None。
+    """
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(len(months), os.cpu_count() or 1), mp_context=context,
+                             initializer=use_holiday_data, initargs=holiday_data) as pool:
+        futures = [pool.submit(build_month_days, year, month) for year, month in months]
+        results = []
+        for done, future in enumerate(futures, 1):
+            if cancelled and cancelled():
+                for pending in futures:
+                    pending.cancel()
+                return None
+            results.append(future.result())
+            if progress:
+                progress(done)
+    return results
+
+
+def shift_month(year, month, delta):
+    """按月偏移，结果限制在支持的年份范围内"""
+    index = year * 12 + (month - 1) + delta
+    index = max(MIN_YEAR * 12, min(MAX_YEAR * 12 + 11, index))
+    return index // 12, index % 12 + 1
+
+
+class LRUCache:
+    """按键缓存计算结果的 LRU 缓存，未命中时调用 builder 计算"""
+
+    def __init__(self, builder, capacity):
+        self.builder = builder
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, *key):
+        value = self._entries.get(key)
+        if value is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+        self.misses += 1
+        value = self.builder(*key)
+        self._entries[key] = value
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def discard(self, keys):
+        """只移除指定键的缓存结果"""
+        for key in keys:
+            self._entries.pop(key, None)
+
+
+# 列式日表覆盖的年份，以及文件格式版本（列变化时递增）
+DAY_TABLE_FIRST_YEAR = 1901
+DAY_TABLE_LAST_YEAR = 2100
+DAY_TABLE_FORMAT = 1
+
+# 列式日表的列；文字列保存的是字符串表中的编号，0 表示空字符串，干支列是六十甲子的序号
+DAY_TABLE_COLUMNS = [
+    ("ordinal", "<i4"),
+    ("week", "u1"),
+    ("lunar_year", "<i2"),
+    ("lunar_month", "u1"),
+    ("lunar_day", "u1"),
+    ("leap", "?"),
+    ("jieqi", "<u2"),
+    ("festival", "<u2"),  # 月历格子中显示的第一个节日
+    ("festivals", "<u2"),  # 详情面板中显示的全部节日
+    ("year_gz", "u1"),
+    ("month_gz", "u1"),
+    ("day_gz", "u1"),
+]
+
+# 休/班标记在日表中的编码
+DAY_MARKS = ("", "休", "班")
+
+
+def build_day_table_year(year):
+    """计算某年每一天的日表行，在工作进程中运行；文字列先返回字符串，由主进程统一编号"""
+    jia_zi = {text: i for i, text in enumerate(LunarUtil.JIA_ZI)}
+    rows = []
+    for month in range(1, 13):
+        for solar_day in SolarMonth.fromYm(year, month).getDays():
+            lunar_day = solar_day.getLunar()
+            festivals = lunar_day.getFestivals() + solar_day.getFestivals()
+            lunar_month = lunar_day.getMonth()
+            rows.append((
+                date(year, month, solar_day.getDay()).toordinal(),
+                solar_day.getWeek(),
+                lunar_day.getYear(), abs(lunar_month), lunar_day.getDay(), lunar_month < 0,
+                lunar_day.getJieQi(),
+                festivals[0] if festivals else "",
+                " ".join(dict.fromkeys(festivals + solar_day.getOtherFestivals())),
+                jia_zi[lunar_day.getYearInGanZhi()],
+                jia_zi[lunar_day.getMonthInGanZhi()],
+                jia_zi[lunar_day.getDayInGanZhi()],
+            ))
+    return rows
+
+
+class DayTable:
+    """DAY_TABLE_FIRST_YEAR-DAY_TABLE_LAST_YEAR 年每一天的列式日表（NumPy 结构化数组）。
+
+    由进程池逐年计算一次，保存为 .npy（字符串表另存为 JSON），之后以只读 mmap 加载，
+    月历、详情面板和休息日位图按日期序数直接切片读取，不再构造 Solar/Lunar 对象。
+    休/班标记随地区和用户导入的假期变化，不写入文件，在内存中按地区各算一列并保留，
+    切换地区时直接取用该地区已算好的一列。
+    """
+
+    def __init__(self, directory=CONFIG_DIR):
+        self.directory = directory
+        self.days = None
+        self.strings = None
+        self.first = date(DAY_TABLE_FIRST_YEAR, 1, 1).toordinal()
+        # 当前地区（由 HolidayRegion.activate 设置），以及各地区的 (计算时的假期数据串, 标记列)
+        self.region = DEFAULT_REGION
+        self._marks = {}
+
+    @property
+    def path(self):
+        try:
+            version = metadata.version("lunar_python")
+        except metadata.PackageNotFoundError:
+            version = "unknown"
+        key = zlib.crc32(f"{DAY_TABLE_FORMAT}:{version}".encode("utf-8"))
+        return os.path.join(self.directory, f"day_table-{key:08x}.npy")
+
+    @property
+    def strings_path(self):
+        return self.path[:-len(".npy")] + ".json"
+
+    def covers(self, year):
+        return self.days is not None and DAY_TABLE_FIRST_YEAR <= year <= DAY_TABLE_LAST_YEAR
+
+    def load(self):
+        """加载已建好的日表，文件不存在、已过期或没有 NumPy 时返回 False"""
+        if np is None:
+            return False
+        try:
+            with open(self.strings_path, "r", encoding="utf-8") as f:
+                strings = json.load(f)
+            days = np.load(self.path, mmap_mode="r")
+        except (OSError, ValueError):
+            return False
+        size = date(DAY_TABLE_LAST_YEAR, 12, 31).toordinal() - self.first + 1
+        if days.dtype != np.dtype(DAY_TABLE_COLUMNS) or len(days) != size or int(days["ordinal"][0]) != self.first:
+            return False
+        self.days = days
+        self.strings = strings
+        self._marks.clear()
+        return True
+
+    def close(self):
+        self.days = None
+        self.strings = None
+        self._marks.clear()
+
+    def build(self, progress=None, cancelled=None):
+        """用进程池逐年计算日表并保存；progress(已完成年数) 报告进度，cancelled() 返回真时放弃"""
+        years = range(DAY_TABLE_FIRST_YEAR, DAY_TABLE_LAST_YEAR + 1)
+        strings = [""]
+        string_ids = {"": 0}
+        rows = []
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=context) as pool:
+            futures = [pool.submit(build_day_table_year, year) for year in years]
+            for done, future in enumerate(futures, 1):
+                if cancelled and cancelled():
+                    for pending in futures:
+                        pending.cancel()
+                    return False
+                for row in future.result():
+                    # 第 6-8 列是文字，换成字符串表中的编号
+                    texts = []
+                    for text in row[6:9]:
+                        if text not in string_ids:
+                            string_ids[text] = len(strings)
+                            strings.append(text)
+                        texts.append(string_ids[text])
+                    rows.append(row[:6] + tuple(texts) + row[9:])
+                if progress:
+                    progress(done)
+
+        os.makedirs(self.directory, exist_ok=True)
+        for stale in glob.glob(os.path.join(self.directory, "day_table-*")):
+            if stale not in (self.path, self.strings_path):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+        temp_path = f"{self.strings_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(strings, f, ensure_ascii=False)
+        os.replace(temp_path, self.strings_path)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "wb") as f:
+            np.save(f, np.array(rows, dtype=DAY_TABLE_COLUMNS))
+        os.replace(temp_path, self.path)
+        return True
+
+    def marks(self):
+        """当前地区每一天的休/班标记（DAY_MARKS 中的序号），只在该地区的假期数据变化后重新计算"""
+        _, data = current_holiday_data()
+        cached = self._marks.get(self.region)
+        if cached is not None and cached[0] is data:
+            return cached[1]
+        week = self.days["week"]
+        marks = np.where((week == 0) | (week == 6), 1, 0).astype(np.uint8)
+        for year in range(DAY_TABLE_FIRST_YEAR, DAY_TABLE_LAST_YEAR + 1):
+            for holiday in HolidayUtil.getHolidays(year):
+                i = date.fromisoformat(holiday.getDay()).toordinal() - self.first
+                if 0 <= i < len(marks):
+                    marks[i] = 2 if holiday.isWork() else 1
+        self._marks[self.region] = (data, marks)
+        return marks
+
+    def update_marks(self, previous_data, days):
+        """当前地区的假期数据只在 days 这些日子上有变化时，就地修正按 previous_data 算好的标记，不必整列重算"""
+        cached = self._marks.get(self.region)
+        if cached is None or cached[0] is not previous_data:
+            return
+        marks = cached[1]
+        for day in days:
+            i = day.toordinal() - self.first
+            if not 0 <= i < len(marks):
+                continue
+            holiday = HolidayUtil.getHoliday(day.year, day.month, day.day)
+            if holiday:
+                marks[i] = 2 if holiday.isWork() else 1
+            else:
+                marks[i] = 1 if self.days["week"][i] in (0, 6) else 0
+        self._marks[self.region] = (current_holiday_data()[1], marks)
+
+    def month_days(self, year, month):
+        start = date(year, month, 1).toordinal() - self.first
+        end = start + calendar.monthrange(year, month)[1]
+        rows = self.days[start:end]
+        marks = self.marks()[start:end].tolist()
+        week = (date(year, month, 1).weekday() + 1) % 7
+        days = []
+        columns = zip(rows["lunar_month"].tolist(), rows["lunar_day"].tolist(), rows["leap"].tolist(),
+                      rows["jieqi"].tolist(), rows["festival"].tolist())
+        for i, (lunar_month, lunar_day, leap, jieqi, festival) in enumerate(columns):
+            lunar_text = self.strings[jieqi] or \
+                f"{'闰' if leap else ''}{LunarUtil.MONTH[lunar_month]}月{LunarUtil.DAY[lunar_day]}"
+            days.append(DayInfo(
+                self.first + start + i, year, month, i + 1, (week + i) % 7,
+                self.strings[festival], lunar_text, DAY_MARKS[marks[i]],
+            ))
+        return tuple(days)
+
+    def day_detail(self, year, month, day):
+        row = self.days[date(year, month, day).toordinal() - self.first]
+        leap = "闰" if row["leap"] else ""
+        year_gz, month_gz, day_gz = (LunarUtil.JIA_ZI[int(row[column])] for column in ("year_gz", "month_gz", "day_gz"))
+        # 生肖按年支计算，与 Lunar.getYearShengXiao 一致
+        shengxiao = LunarUtil.SHENGXIAO[LunarUtil.ZHI.index(year_gz[1])]
+        return DayDetail(
+            f"{year}年{month}月",
+            str(day),
+            f"{leap}{LunarUtil.MONTH[row['lunar_month']]}月{LunarUtil.DAY[row['lunar_day']]} 星期{SolarUtil.WEEK[row['week']]}",
+            f"{year_gz}年 {month_gz}月 {day_gz}日 【属{shengxiao}】",
+            self.strings[row["festivals"]],
+            " ".join(LunarUtil.getDayYi(month_gz, day_gz)),
+            " ".join(LunarUtil.getDayJi(month_gz, day_gz)),
+        )
+
+    def rest_day_bitmap(self, year):
+        start = date(year, 1, 1).toordinal() - self.first
+        end = date(year, 12, 31).toordinal() - self.first + 1
+        bits = np.packbits(self.marks()[start:end] == 1, bitorder="little")
+        return int.from_bytes(bits.tobytes(), "little")
+
+
+DAY_TABLE = DayTable()
+
+
+# 磁盘月份缓存：文件格式版本与布局，格式变化时递增版本号
+MONTH_CACHE_FORMAT = 1
+MONTH_CACHE_HEADER = struct.Struct("<4sHHII")  # 魔数, 格式版本, 保留, 缓存键, 条目数
+MONTH_CACHE_ENTRY = struct.Struct("<III")  # 月份序号(year*12+month-1), 数据偏移, 数据长度
+MONTH_CACHE_MAGIC = b"OCMC"
+FIELD_SEPARATOR = "\x1f"
+DAY_SEPARATOR = "\x1e"
+
+
+def month_cache_key(data=None):
+    """磁盘缓存的键：由 lunar_python 版本和假期数据（默认为当前生效的数据）共同决定"""
+    try:
+        version = metadata.version("lunar_python")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+    if data is None:
+        _, data = current_holiday_data()
+    return zlib.crc32(f"{MONTH_CACHE_FORMAT}:{version}:{data}".encode("utf-8"))
+
+
+class MonthDiskCache:
+    """把 build_month_days 的结果保存到磁盘，重启后无需再调用 lunar_python。
+
+    文件在第一次读取时以只读 mmap 映射，按月份序号二分查找索引，只解码用到的月份。
+    新算出的月份先留在内存中，由 save() 合并旧数据后整体写入新文件再原子替换。
+    holiday_data 返回该地区的假期数据，用来计算缓存键；地区未生效时也能按自己的键保存。
+    """
+
+    def __init__(self, directory=CONFIG_DIR, region=DEFAULT_REGION, holiday_data=None):
+        self.directory = directory
+        # 内地沿用原来的文件名，其他地区的文件名带上地区标识
+        self.prefix = "month_cache-" if region == DEFAULT_REGION else f"month_cache-{region}-"
+        self.holiday_data = holiday_data
+        self.key = None
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        self._opened = False
+        self._file = None
+        self._map = None
+        self._index = None
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f"{self.prefix}{self.key:08x}.bin")
+
+    def get(self, year, month):
+        if not self._opened:
+            self._open()
+        index = year * 12 + month - 1
+        days = self.pending.get(index)
+        if days is None:
+            days = self._read(index)
+        if days is None:
+            self.misses += 1
+            days = build_month_days(year, month)
+            self.pending[index] = days
+        else:
+            self.hits += 1
+        return days
+
+    def _open(self):
+        self._opened = True
+        self.key = month_cache_key(self.holiday_data() if self.holiday_data else None)
+        self._map_file()
+
+    def _map_file(self):
+        try:
+            self._file = open(self.path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # 文件不存在或为空
+            self._unmap()
+            return
+
+        if len(self._map) >= MONTH_CACHE_HEADER.size:
+            magic, version, _, key, count = MONTH_CACHE_HEADER.unpack_from(self._map)
+            index_end = MONTH_CACHE_HEADER.size + count * MONTH_CACHE_ENTRY.size
+            if (magic, version, key) == (MONTH_CACHE_MAGIC, MONTH_CACHE_FORMAT, self.key) and index_end <= len(self._map):
+                self._index = memoryview(self._map)[MONTH_CACHE_HEADER.size:index_end].cast("I")
+                return
+        self._unmap()
+
+    def _entries(self):
+        return len(self._index) // 3 if self._index is not None else 0
+
+    def _read(self, index):
+        # 索引按月份序号升序排列；bisect 的 key 参数需要 Python 3.10，这里手写二分查找
+        count = self._entries()
+        i, hi = 0, count
+        while i < hi:
+            mid = (i + hi) // 2
+            if self._index[mid * 3] < index:
+                i = mid + 1
+            else:
+                hi = mid
+        if i == count or self._index[i * 3] != index:
+            return None
+        offset, length = self._index[i * 3 + 1], self._index[i * 3 + 2]
+        return self._decode(index, self._map[offset:offset + length])
+
+    @staticmethod
+    def _decode(index, blob):
+        year, month = divmod(index, 12)
+        first = date(year, month + 1, 1)
+        ordinal = first.toordinal()
+        week = (first.weekday() + 1) % 7
+        days = []
+        for i, fields in enumerate(blob.decode("utf-8").split(DAY_SEPARATOR)):
+            festival, lunar_text, mark = fields.split(FIELD_SEPARATOR)
+            days.append(DayInfo(ordinal + i, year, month + 1, i + 1, (week + i) % 7, festival, lunar_text, mark))
+        return tuple(days)
+
+    @staticmethod
+    def _encode(days):
+        return DAY_SEPARATOR.join(
+            FIELD_SEPARATOR.join((info.festival, info.lunar_text, info.mark)) for info in days
+        ).encode("utf-8")
+
+    def save(self):
+        """把新算出的月份与已有数据一起写入缓存文件"""
+        if not self.pending:
+            return
+        if not self._opened:
+            self._open()
+
+        blobs = {}
+        for i in range(self._entries()):
+            index, offset, length = self._index[i * 3:i * 3 + 3]
+            blobs[index] = self._map[offset:offset + length]
+        for index, days in self.pending.items():
+            blobs[index] = self._encode(days)
+
+        path = self.path
+        self.close()
+        self.pending.clear()
+
+        os.makedirs(self.directory, exist_ok=True)
+        offset = MONTH_CACHE_HEADER.size + len(blobs) * MONTH_CACHE_ENTRY.size
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(MONTH_CACHE_HEADER.pack(MONTH_CACHE_MAGIC, MONTH_CACHE_FORMAT, 0, self.key, len(blobs)))
+                indices = sorted(blobs)
+                for index in indices:
+                    f.write(MONTH_CACHE_ENTRY.pack(index, offset, len(blobs[index])))
+                    offset += len(blobs[index])
+                for index in indices:
+                    f.write(blobs[index])
+            os.replace(temp_path, path)
+        except OSError:
+            return
+
+        # 旧版本或旧假期数据对应的缓存已不会再被读取
+        for stale in glob.glob(os.path.join(self.directory, f"{self.prefix}{'[0-9a-f]' * 8}.bin")):
+            if stale != path:
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+
+    def invalidate(self, months=None):
+        """假期数据变化后调用，下次读取时按新的缓存键重新打开。
+
+        months 给出受影响的月份序号（year*12+month-1）时，其余月份的数据留在内存中，随下次保存写入新文件。
+        """
+        kept = {}
+        if months is not None:
+            # save() 之后映射已释放；此时假期数据已经变了，只能按上次的缓存键重新映射旧文件
+            if not self._opened and self.key is not None:
+                self._map_file()
+            for i in range(self._entries()):
+                index, offset, length = self._index[i * 3:i * 3 + 3]
+                if index not in months:
+                    kept[index] = self._decode(index, self._map[offset:offset + length])
+            kept.update((index, days) for index, days in self.pending.items() if index not in months)
+        self.close()
+        self.pending = kept
+
+    def close(self):
+        """释放映射，保留尚未保存的月份，下次读取时重新映射"""
+        self._unmap()
+        self._opened = False
+
+    def _unmap(self):
+        if self._index is not None:
+            self._index.release()
+            self._index = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# lunar_python 中所有宜忌事项的名称，供查询界面选择
+YI_JI_ACTIVITIES = LunarUtil._LunarUtil__YI_JI
+
+# 宜忌倒排索引：事项 -> 该年按天的位图（Python 整数，第 i 位表示当年第 i 天，从 0 开始）
+YiJiYear = namedtuple("YiJiYear", ["yi", "ji"])
+
+
+def build_yiji_year(year):
+    """计算某年的宜忌倒排索引，在工作进程中运行"""
+    yi, ji = {}, {}
+    first = date(year, 1, 1).toordinal()
+    for i in range(date(year, 12, 31).toordinal() - first + 1):
+        day = date.fromordinal(first + i)
+        lunar_day = Solar.fromYmd(day.year, day.month, day.day).getLunar()
+        bit = 1 << i
+        for activity in lunar_day.getDayYi():
+            yi[activity] = yi.get(activity, 0) | bit
+        for activity in lunar_day.getDayJi():
+            ji[activity] = ji.get(activity, 0) | bit
+    return YiJiYear(yi, ji)
+
+
+def rest_day_bitmap(year):
+    """当前地区某年休息日（周末与法定假日，扣除调休上班）的位图"""
+    if DAY_TABLE.covers(year):
+        return DAY_TABLE.rest_day_bitmap(year)
+    first = date(year, 1, 1).toordinal()
+    bitmap = 0
+    for i in range(date(year, 12, 31).toordinal() - first + 1):
+        if (first + i - 1) % 7 >= 5:
+            bitmap |= 1 << i
+    for holiday in HolidayUtil.getHolidays(year):
+        i = date.fromisoformat(holiday.getDay()).toordinal() - first
+        if holiday.isWork():
+            bitmap &= ~(1 << i)
+        else:
+            bitmap |= 1 << i
+    return bitmap
+
+
+class YiJiIndex:
+    """按年份缓存的宜忌倒排索引。
+
+    缺少的年份由进程池并行计算（lunar_python 是纯 Python 实现，线程无法并行），
+    结果保存在 CONFIG_DIR 中，以 lunar_python 版本区分；查询只做位运算。
+    """
+
+    def __init__(self, directory=CONFIG_DIR):
+        self.directory = directory
+        self.years = None
+
+    @property
+    def path(self):
+        try:
+            version = metadata.version("lunar_python")
+        except metadata.PackageNotFoundError:
+            version = "unknown"
+        return os.path.join(self.directory, f"yiji_index-{zlib.crc32(version.encode('utf-8')):08x}.json")
+
+    def _load(self):
+        self.years = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        for year, index in data.items():
+            self.years[int(year)] = YiJiYear(
+                {activity: int(bits, 16) for activity, bits in index["yi"].items()},
+                {activity: int(bits, 16) for activity, bits in index["ji"].items()},
+            )
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        data = {
+            str(year): {
+                "yi": {activity: f"{bits:x}" for activity, bits in index.yi.items()},
+                "ji": {activity: f"{bits:x}" for activity, bits in index.ji.items()},
+            }
+            for year, index in sorted(self.years.items())
+        }
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+
+    def missing_years(self, first_year, last_year):
+        if self.years is None:
+            self._load()
+        return [year for year in range(first_year, last_year + 1) if year not in self.years]
+
+    def build(self, years, progress=None, cancelled=None):
+        """并行计算缺少的年份；progress(已完成数) 报告进度，cancelled() 返回真时提前结束"""
+        if self.years is None:
+            self._load()
+        years = [year for year in years if year not in self.years]
+        if not years:
+            return
+        # 图形界面在 QThread 中调用，fork 多线程进程不安全，统一用 spawn 启动工作进程
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(len(years), os.cpu_count() or 1), mp_context=context) as pool:
+            futures = [(year, pool.submit(build_yiji_year, year)) for year in years]
+            for done, (year, future) in enumerate(futures, 1):
+                if cancelled and cancelled():
+                    for _, pending in futures:
+                        pending.cancel()
+                    break
+                self.years[year] = future.result()
+                if progress:
+                    progress(done)
+        try:
+            self.save()
+        except OSError:
+            pass
+
+    def search(self, first, last, yi=(), ji=(), rest_only=False):
+        """日期序数在 [first, last] 内、宜 yi 中所有事项、不忌 ji 中任何事项的日子，需先 build 相应年份"""
+        if self.years is None:
+            self._load()
+        ordinals = []
+        for year in range(date.fromordinal(first).year, date.fromordinal(last).year + 1):
+            year_first = date(year, 1, 1).toordinal()
+            days = date(year, 12, 31).toordinal() - year_first + 1
+            start = max(first - year_first, 0)
+            end = min(last - year_first, days - 1)
+            bitmap = ((1 << (end + 1)) - 1) & ~((1 << start) - 1)
+
+            index = self.years[year]
+            for activity in yi:
+                bitmap &= index.yi.get(activity, 0)
+            for activity in ji:
+                bitmap &= ~index.ji.get(activity, 0)
+            if rest_only and bitmap:
+                bitmap &= rest_day_bitmap(year)
+
+            while bitmap:
+                low = bitmap & -bitmap
+                ordinals.append(year_first + low.bit_length() - 1)
+                bitmap ^= low
+        return ordinals
+
+
+# lunar_python 的儒略日（正午为整数）与 date.toordinal() 之差
+JULIAN_DAY_OFFSET = 1721425
+
+# 农历日期；month 为负数表示闰月
+LunarDate = namedtuple("LunarDate", ["year", "month", "day"])
+
+
+class LunarMonthTable:
+    """农历月份边界表：每个农历年各月初一的日期序数与天数，按年懒加载。
+
+    建好之后公历转农历只需二分查找，农历转公历只需查表加减，不再构造 lunar_python 对象。
+    """
+
+    def __init__(self):
+        self._years = {}
+
+    def _year(self, year):
+        """(各月初一的日期序数, 月份, 天数) 三个等长列表"""
+        table = self._years.get(year)
+        if table is None:
+            months = LunarYear.fromYear(year).getMonthsInYear()
+            table = (
+                [int(m.getFirstJulianDay()) - JULIAN_DAY_OFFSET for m in months],
+                [m.getMonth() for m in months],
+                [m.getDayCount() for m in months],
+            )
+            self._years[year] = table
+        return table
+
+    def to_solar(self, year, month, day):
+        """农历转公历日期序数，月份不存在或日超出月长时抛出 ValueError"""
+        if not MIN_YEAR <= year <= MAX_YEAR:
+            raise ValueError(f"仅支持农历 {MIN_YEAR}-{MAX_YEAR} 年")
+        starts, months, day_counts = self._year(year)
+        if month not in months:
+            raise ValueError(f"农历{year}年没有{'闰' if month < 0 else ''}{abs(month)}月")
+        i = months.index(month)
+        if not 1 <= day <= day_counts[i]:
+            raise ValueError(f"农历{year}年{'闰' if month < 0 else ''}{abs(month)}月只有{day_counts[i]}天")
+        return self._checked(starts[i] + day - 1)
+
+    def anniversary(self, year, month, day):
+        """农历纪念日在某个农历年对应的公历日期序数：闰月不存在时取普通月，日超出月长时取月末"""
+        if not MIN_YEAR <= year <= MAX_YEAR:
+            raise ValueError(f"仅支持农历 {MIN_YEAR}-{MAX_YEAR} 年")
+        starts, months, day_counts = self._year(year)
+        if month not in months:
+            month = abs(month)
+        if month not in months:
+            raise ValueError(f"农历月份无效：{month}")
+        i = months.index(month)
+        return self._checked(starts[i] + min(day, day_counts[i]) - 1)
+
+    @staticmethod
+    def _checked(ordinal):
+        # 农历 MAX_YEAR 年的后几个月已落在公历 MAX_YEAR 年之后
+        if ordinal > date.max.toordinal():
+            raise ValueError(f"超出支持范围：公历只支持到 {MAX_YEAR} 年")
+        return ordinal
+
+    def to_lunar(self, ordinal):
+        """公历日期序数转农历"""
+        year = date.fromordinal(ordinal).year
+        starts, months, _ = self._year(year)
+        if ordinal < starts[0]:
+            # 正月初一之前属于上一个农历年
+            year -= 1
+            starts, months, _ = self._year(year)
+        i = bisect_right(starts, ordinal) - 1
+        return LunarDate(year, months[i], ordinal - starts[i] + 1)
+
+
+LUNAR_TABLE = LunarMonthTable()
+
+LUNAR_DATE_PATTERN = re.compile(r"^\s*(?:(\d{1,4})\s*[-/.年]\s*)?(闰|[Ll])?\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})\s*日?\s*$")
+
+
+def parse_lunar_date(text, year=None):
+    """解析 "2025-08-15"、"2025-闰6-1"、"2025-L06-01"、"2025年闰6月1日"。
+
+    给出 year 时允许只写月日（"8-15"、"闰4-12"），文本中的年份优先。
+    """
+    match = LUNAR_DATE_PATTERN.match(text)
+    if not match or (match.group(1) is None and year is None):
+        raise ValueError(f"无法识别的农历日期：{text.strip()}")
+    month = int(match.group(3))
+    if not 1 <= month <= 12:
+        raise ValueError(f"农历月份无效：{text.strip()}")
+    return LunarDate(int(match.group(1) or year), -month if match.group(2) else month, int(match.group(4)))
+
+
+def format_lunar_date(lunar):
+    return f"{lunar.year:04d}-{'闰' if lunar.month < 0 else ''}{abs(lunar.month):02d}-{lunar.day:02d}"
+
+
+def iter_converted_rows(rows, to_solar, column=0, year=None, table=LUNAR_TABLE):
+    """逐行换算 CSV 行中第 column 列的日期，在行尾追加结果。
+
+    to_solar 为真时农历转公历，给出 year 时按该农历年换算纪念日（如生日）；否则公历转农历。
+    逐行产出 (新行, 错误信息)，无法换算的行结果为空、错误信息非空。
+    第一行的日期列不含数字时视为表头（如 date、生日），追加结果列的列名，不算作错误。
+    """
+    first = True
+    for row in rows:
+        if not row:
+            continue
+        if first:
+            first = False
+            if len(row) > column and not any(c.isdigit() for c in row[column]):
+                yield row + ["公历" if to_solar else "农历"], None
+                continue
+        try:
+            text = row[column]
+            if to_solar:
+                lunar = parse_lunar_date(text, year)
+                if year is not None:
+                    ordinal = table.anniversary(year, lunar.month, lunar.day)
+                else:
+                    ordinal = table.to_solar(*lunar)
+                result = date.fromordinal(ordinal).isoformat()
+            else:
+                result = format_lunar_date(table.to_lunar(_parse_record_date(text).toordinal()))
+        except (IndexError, ValueError) as e:
+            yield row + [""], str(e) or "日期无效"
+        else:
+            yield row + [result], None
+
+
+# 个人日程的重复方式；农历每年重复时 month 为负数表示闰月
+EVENT_ONCE = "once"
+EVENT_YEARLY = "yearly"
+EVENT_LUNAR_YEARLY = "lunar_yearly"
+
+# 个人日程；year 只对单次日程有意义，remind_minute 为当天提醒时间（距零点的分钟数），None 表示不提醒
+PersonalEvent = namedtuple("PersonalEvent", ["id", "title", "repeat", "year", "month", "day", "remind_minute"])
+
+# 日程在某一天的一次发生
+EventOccurrence = namedtuple("EventOccurrence", ["ordinal", "event"])
+
+EVENT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    repeat TEXT NOT NULL,
+    year INTEGER,
+    month INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    remind_minute INTEGER
+);
+-- 日程展开到具体日期后的索引，按日期序数聚簇，按月查询是一次范围扫描
+CREATE TABLE IF NOT EXISTS occurrences (
+    ordinal INTEGER NOT NULL,
+    event_id INTEGER NOT NULL REFERENCES events(id) ON DELETE CASCADE,
+    PRIMARY KEY (ordinal, event_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS occurrences_event ON occurrences(event_id);
+-- 已展开重复日程的公历年份
+CREATE TABLE IF NOT EXISTS expanded_years (year INTEGER PRIMARY KEY);
+"""
+
+
+def _lunar_ordinal(lunar_year, month, day):
+    """农历某月某日对应的公历日期序数；闰月不存在时取同名的普通月，日超出月长时取月末"""
+    try:
+        return LUNAR_TABLE.anniversary(lunar_year, month, day)
+    except ValueError:
+        return None
+
+
+def event_ordinals_in_year(event, year):
+    """日程在公历某年中发生的日期序数"""
+    if event.repeat == EVENT_ONCE:
+        return [date(event.year, event.month, event.day).toordinal()] if event.year == year else []
+
+    if event.repeat == EVENT_YEARLY:
+        try:
+            return [date(year, event.month, event.day).toordinal()]
+        except ValueError:
+            return [] # 2 月 29 日只在闰年出现
+
+    # 农历腊月等日子落在下一个公历年，需要同时检查上一个农历年
+    ordinals = []
+    for lunar_year in (year - 1, year):
+        ordinal = _lunar_ordinal(lunar_year, event.month, event.day)
+        if ordinal is not None and ordinal <= date.max.toordinal() and date.fromordinal(ordinal).year == year:
+            ordinals.append(ordinal)
+    return ordinals
+
+
+class EventStore:
+    """个人日程的 SQLite 存储。
+
+    重复日程只在某个公历年份第一次被查询时展开到 occurrences 表，展开过的年份记录在
+    expanded_years 中，之后的查询都是对日期序数的一次范围扫描。
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(CONFIG_DIR, exist_ok=True)
+            path = os.path.join(CONFIG_DIR, "events.sqlite3")
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(EVENT_SCHEMA)
+        self.expanded_years = {year for year, in self.connection.execute("SELECT year FROM expanded_years")}
+
+    def ensure_years(self, first_year, last_year):
+        """把重复日程展开到尚未展开的年份"""
+        years = [year for year in range(first_year, last_year + 1) if year not in self.expanded_years]
+        if not years:
+            return
+        recurring = [PersonalEvent(*row) for row in self.connection.execute(
+            "SELECT * FROM events WHERE repeat != ?", (EVENT_ONCE,))]
+        with self.connection:
+            for year in years:
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO occurrences (ordinal, event_id) VALUES (?, ?)",
+                    [(ordinal, event.id) for event in recurring for ordinal in event_ordinals_in_year(event, year)])
+                self.connection.execute("INSERT OR IGNORE INTO expanded_years (year) VALUES (?)", (year,))
+        self.expanded_years.update(years)
+
+    def add_event(self, title, repeat, year, month, day, remind_minute=None):
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO events (title, repeat, year, month, day, remind_minute) VALUES (?, ?, ?, ?, ?, ?)",
+                (title, repeat, year if repeat == EVENT_ONCE else None, month, day, remind_minute))
+            event = PersonalEvent(cursor.lastrowid, title, repeat, year, month, day, remind_minute)
+            years = [year] if repeat == EVENT_ONCE else sorted(self.expanded_years)
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO occurrences (ordinal, event_id) VALUES (?, ?)",
+                [(ordinal, event.id) for y in years for ordinal in event_ordinals_in_year(event, y)])
+        return event
+
+    def delete_event(self, event_id):
+        with self.connection:
+            self.connection.execute("DELETE FROM events WHERE id = ?", (event_id,))
+
+    def events_between(self, first, last, reminders_only=False):
+        """日期序数在 [first, last] 内的所有日程发生，按日期排序"""
+        self.ensure_years(date.fromordinal(first).year, date.fromordinal(last).year)
+        query = (
+            "SELECT o.ordinal, e.* FROM occurrences o JOIN events e ON e.id = o.event_id "
+            "WHERE o.ordinal BETWEEN ? AND ?"
+        )
+        if reminders_only:
+            query += " AND e.remind_minute IS NOT NULL"
+        rows = self.connection.execute(query + " ORDER BY o.ordinal, e.id", (first, last))
+        return [EventOccurrence(row[0], PersonalEvent(*row[1:])) for row in rows]
+
+    def month_events(self, year, month):
+        """{日期序数: (日程, ...)}，供月历网格一次取出整月数据"""
+        first = date(year, month, 1).toordinal()
+        last = first + calendar.monthrange(year, month)[1] - 1
+        events = {}
+        for occurrence in self.events_between(first, last):
+            events.setdefault(occurrence.ordinal, []).append(occurrence.event)
+        return {ordinal: tuple(day_events) for ordinal, day_events in events.items()}
+
+    def close(self):
+        self.connection.close()
+
+
+# 导出到 iCalendar 的事件；end 为最后一天（含），rrule 非空时表示按规则重复
+CalendarEvent = namedtuple("CalendarEvent", ["start", "end", "summary", "category", "rrule", "holiday", "target"],
+                           defaults=("", "", ""))
+
+ICS_WEEKDAYS = ["SU", "MO", "TU", "WE", "TH", "FR", "SA"]
+
+
+def iter_calendar_events(start_year, end_year, holidays=True, festivals=True, jieqi=True):
+    """按时间顺序生成 [start_year, end_year] 内的日历事件。
+
+    公历固定日期和按周计算的节日压缩成带 RRULE 的重复事件最先输出，
+    其余事件逐年计算、排序后输出，任意时刻只在内存中保留一年的数据。
+    """
+    if festivals:
+        yield from _recurring_festival_events(start_year, end_year)
+
+    for year in range(start_year, end_year + 1):
+        events = []
+        if holidays:
+            events.extend(_holiday_events(year))
+        if festivals:
+            events.extend(_lunar_festival_events(year))
+        if jieqi:
+            events.extend(_jieqi_events(year))
+        events.sort(key=lambda event: event.start)
+        yield from events
+
+
+def _recurring_festival_events(start_year, end_year):
+    until = f"{end_year}1231"
+    fixed = [(key, name) for key, name in SolarUtil.FESTIVAL.items()]
+    fixed += [(key, name) for key, names in SolarUtil.OTHER_FESTIVAL.items() for name in names]
+    for key, name in fixed:
+        month, day = (int(part) for part in key.split("-"))
+        start = date(start_year, month, day)
+        yield CalendarEvent(start, start, name, "节日", f"FREQ=YEARLY;UNTIL={until}")
+
+    for key, name in SolarUtil.WEEK_FESTIVAL.items():
+        # 键为 "月-第几周-星期"，第几周为 0 表示最后一周
+        month, nth, week = (int(part) for part in key.split("-"))
+        days = [d for d in range(1, calendar.monthrange(start_year, month)[1] + 1)
+                if date(start_year, month, d).isoweekday() % 7 == week]
+        start = date(start_year, month, days[-1] if nth == 0 else days[nth - 1])
+        by_day = f"{-1 if nth == 0 else nth}{ICS_WEEKDAYS[week]}"
+        yield CalendarEvent(start, start, name, "节日", f"FREQ=YEARLY;BYMONTH={month};BYDAY={by_day};UNTIL={until}")
+
+
+def _holiday_events(year):
+    """法定假日：连续的放假日合并为一个多日事件，调休上班日单独成事件"""
+    events = []
+    holidays = sorted(HolidayUtil.getHolidays(year) or [], key=lambda h: h.getDay())
+    for h in holidays:
+        day = date.fromisoformat(h.getDay())
+        target = h.getTarget().replace("-", "")
+        if h.isWork():
+            events.append(CalendarEvent(day, day, f"{h.getName()} 班", "班", "", h.getName(), target))
+            continue
+
+        last = events[-1] if events else None
+        if (last and last.category == "休" and last.holiday == h.getName()
+                and last.target == target and last.end + timedelta(days=1) == day):
+            events[-1] = last._replace(end=day)
+        else:
+            events.append(CalendarEvent(day, day, f"{h.getName()} 休", "休", "", h.getName(), target))
+    return events
+
+
+def _lunar_festival_events(year):
+    """农历节日（含除夕），上一农历年的年末节日可能落在本公历年初"""
+    events = []
+    for lunar_year in (year - 1, year):
+        for key, name in LunarUtil.FESTIVAL.items():
+            month, day = (int(part) for part in key.split("-"))
+            solar_day = Lunar.fromYmd(lunar_year, month, day).getSolar()
+            if solar_day.getYear() == year:
+                start = date(year, solar_day.getMonth(), solar_day.getDay())
+                events.append(CalendarEvent(start, start, name, "节日", ""))
+
+        last_day = LunarMonth.fromYm(lunar_year, 12).getDayCount()
+        solar_day = Lunar.fromYmd(lunar_year, 12, last_day).getSolar()
+        if solar_day.getYear() == year:
+            start = date(year, solar_day.getMonth(), solar_day.getDay())
+            events.append(CalendarEvent(start, start, "除夕", "节日", ""))
+    return events
+
+
+def _jieqi_events(year):
+    """二十四节气；农历年的节气表跨公历年，取相邻两张表中落在本年的部分"""
+    seen = {}
+    for lunar_year in (year, year + 1):
+        for name, solar_day in Lunar.fromYmd(lunar_year, 1, 1).getJieQiTable().items():
+            # 表中大写拼音的键是相邻年份的节气，与中文键重复
+            if name.isascii() or solar_day.getYear() != year:
+                continue
+            seen[name] = date(year, solar_day.getMonth(), solar_day.getDay())
+    return [CalendarEvent(day, day, name, "节气", "") for name, day in seen.items()]
+
+
+def iter_ics_lines(events, stamp=None):
+    """把事件流转换为 iCalendar 文本行（已按 75 字节折行，含 CRLF）"""
+    stamp = stamp or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    header = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//OfflineCalendar//WanNianLi//CN",
+        "CALSCALE:GREGORIAN",
+        "X-WR-CALNAME:万年历本地版",
+    ]
+    for line in header:
+        yield _fold_ics_line(line)
+
+    for event in events:
+        uid = zlib.crc32(f"{event.category}:{event.summary}".encode("utf-8"))
+        lines = [
+            "BEGIN:VEVENT",
+            f"UID:{event.start:%Y%m%d}-{uid:08x}@offlinecalendar",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART;VALUE=DATE:{event.start:%Y%m%d}",
+            f"DTEND;VALUE=DATE:{event.end + timedelta(days=1):%Y%m%d}",
+            f"SUMMARY:{_escape_ics_text(event.summary)}",
+            f"CATEGORIES:{event.category}",
+            "TRANSP:TRANSPARENT" if event.category != "班" else "TRANSP:OPAQUE",
+        ]
+        if event.rrule:
+            lines.append(f"RRULE:{event.rrule}")
+        if event.holiday:
+            # 自定义属性，导入时据此还原 HolidayUtil 数据
+            lines.append(f"X-OFFLINECALENDAR-HOLIDAY:{_escape_ics_text(event.holiday)}")
+            lines.append(f"X-OFFLINECALENDAR-TARGET:{event.target}")
+        lines.append("END:VEVENT")
+        for line in lines:
+            yield _fold_ics_line(line)
+
+    yield _fold_ics_line("END:VCALENDAR")
+
+
+def _escape_ics_text(text):
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _fold_ics_line(line):
+    """RFC 5545 折行：每行不超过 75 字节，且不截断多字节字符"""
+    parts = []
+    current = ""
+    size = 0
+    for char in line:
+        width = len(char.encode("utf-8"))
+        if size + width > 75:
+            parts.append(current)
+            current = " "
+            size = 1
+        current += char
+        size += width
+    parts.append(current)
+    return "\r\n".join(parts) + "\r\n"
+
+
+def write_ics(path, events):
+    """把事件流逐行写入文件，不在内存中拼接整个日历"""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for line in iter_ics_lines(events):
+            f.write(line)
+
+
+# 常见写法到 HolidayUtil.NAMES 标准名称的映射
+HOLIDAY_NAME_ALIASES = {
+    "元旦": "元旦节",
+    "春节": "春节",
+    "清明节": "清明节",
+    "劳动节": "劳动节",
+    "端午节": "端午节",
+    "中秋节": "中秋节",
+    "国庆节": "国庆节",
+    "国庆节、中秋节": "国庆中秋",
+    "中秋节、国庆节": "国庆中秋"
+}
+
+# 从外部文件导入的一天假期安排；target 为空时按同名假期的第一天推断
+HolidayRecord = namedtuple("HolidayRecord", ["day", "name", "is_work", "target"])
+
+REST_WORDS = ("休", "放假", "rest", "off", "holiday", "1")
+WORK_WORDS = ("班", "上班", "补班", "work", "0")
+
+
+def _parse_record_date(text):
+    text = text.strip().replace("/", "-").replace(".", "-")
+    if len(text) == 8 and text.isdigit():
+        return date(int(text[:4]), int(text[4:6]), int(text[6:]))
+    year, month, day = (int(part) for part in text.split("-"))
+    return date(year, month, day)
+
+
+def _holiday_kind(text):
+    """判断"休/班"列或事件标题表示放假还是上班，无法判断时返回 None"""
+    text = text.strip().lower()
+    if any(word in text for word in WORK_WORDS[:3]) or text in WORK_WORDS:
+        return True
+    if any(word in text for word in REST_WORDS[:2]) or text in REST_WORDS:
+        return False
+    return None
+
+
+def iter_csv_holiday_records(lines):
+    """逐行解析 CSV（日期, 名称, 休/班），无法识别的行（如表头）直接跳过"""
+    for row in csv.reader(lines):
+        if len(row) < 3:
+            continue
+        try:
+            day = _parse_record_date(row[0])
+        except ValueError:
+            continue
+        is_work = _holiday_kind(row[2])
+        if is_work is None:
+            continue
+        yield HolidayRecord(day, row[1].strip(), is_work, None)
+
+
+def _iter_unfolded_ics_lines(lines):
+    """还原 RFC 5545 折行，逐行输出逻辑行"""
+    pending = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and pending is not None:
+            pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending
+        pending = line
+    if pending is not None:
+        yield pending
+
+
+def iter_ics_holiday_records(lines):
+    """流式解析 .ics 中的假期事件，多日事件按天展开；重复事件（节日）忽略。
+
+    全天事件（VALUE=DATE）的 DTEND 不含当天；带时刻的事件包含 DTEND 所在的那天：
+
+    >>> event = ["BEGIN:VEVENT", "DTSTART:20250101T090000", "DTEND:20250101T180000", "SUMMARY:元旦（休）", "END:VEVENT"]
+    >>> [(record.day.isoformat(), record.name, record.is_work) for record in iter_ics_holiday_records(event)]
+    [('2025-01-01', '元旦', False)]
+    """
+    event = None
+    for line in _iter_unfolded_ics_lines(lines):
+        if line == "BEGIN:VEVENT":
+            event = {}
+            continue
+        if event is None:
+            continue
+        if line == "END:VEVENT":
+            yield from _ics_event_records(event)
+            event = None
+            continue
+
+        name, _, value = line.partition(":")
+        event[name.split(";")[0].upper()] = value.replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\")
+
+
+def _ics_local_date(value):
+    """ICS 的 DATE 或 DATE-TIME 值所在的日期，以及是否带有非零点的时刻。
+
+    以 Z 结尾的 UTC 时间换算为 HOLIDAY_TIMEZONE 后再取日期，其余时间按当地时间处理。
+    """
+    day = _parse_record_date(value[:8])
+    if value[8:9] != "T":
+        return day, False
+    hour, minute, second = int(value[9:11]), int(value[11:13]), int(value[13:15])
+    if value.endswith("Z"):
+        moment = datetime(day.year, day.month, day.day, hour, minute, second, tzinfo=timezone.utc)
+        moment = moment.astimezone(HOLIDAY_TIMEZONE)
+        day, hour, minute, second = moment.date(), moment.hour, moment.minute, moment.second
+    return day, (hour, minute, second) != (0, 0, 0)
+
+
+def _ics_event_records(event):
+    if "RRULE" in event or "DTSTART" not in event:
+        return
+
+    summary = event.get("SUMMARY", "").strip()
+    name = event.get("X-OFFLINECALENDAR-HOLIDAY")
+    is_work = _holiday_kind(event.get("CATEGORIES", ""))
+    if is_work is None:
+        is_work = _holiday_kind(summary)
+    if is_work is None:
+        return
+    if not name:
+        # 去掉标题中的"休/班"等字样，剩下的部分作为假期名称
+        name = re.sub(r"[（(]?(休|放假|补班|上班|班)[)）]?$", "", summary).strip()
+
+    start, _ = _ics_local_date(event["DTSTART"])
+    end = start + timedelta(days=1)
+    if "DTEND" in event:
+        # 带时刻的结束时间落在当天之内时当天也属于事件，恰好零点结束的不算
+        end_day, inclusive = _ics_local_date(event["DTEND"])
+        end = max(end, end_day + timedelta(days=1 if inclusive else 0))
+    target = event.get("X-OFFLINECALENDAR-TARGET")
+    target = _parse_record_date(target) if target else None
+
+    day = start
+    while day < end:
+        yield HolidayRecord(day, name, is_work, target)
+        day += timedelta(days=1)
+
+
+def compile_holiday_records(records, names=HolidayUtil.NAMES, extend_names=False):
+    """把假期记录编译为按年份分组的 HolidayUtil.fix 数据串。
+
+    返回 ({年份: 数据串}, 跳过的记录数)。名称无法映射到 names 的记录会被跳过；
+    extend_names 为真时改为把新名称追加到 names（names 必须是列表）。
+    """
+    name_to_index = {name: i for i, name in enumerate(names)}
+    years = {}
+    skipped = 0
+    for record in records:
+        name = record.name if record.name in name_to_index else HOLIDAY_NAME_ALIASES.get(record.name)
+        if name is None and extend_names and record.name and len(names) < MAX_HOLIDAY_NAMES:
+            name = record.name
+            name_to_index[name] = len(names)
+            names.append(name)
+        if name not in name_to_index:
+            skipped += 1
+            continue
+        years.setdefault(record.day.year, []).append(record._replace(name=name))
+
+    compiled = {}
+    for year, year_records in years.items():
+        year_records.sort(key=lambda r: r.day)
+        # 每个假期的第一个放假日作为默认目标日期
+        first_rest = {}
+        for r in year_records:
+            if not r.is_work:
+                first_rest.setdefault(r.name, r.day)
+
+        data = []
+        for r in year_records:
+            target = r.target or first_rest.get(r.name, r.day)
+            data.append(f"{r.day:%Y%m%d}{chr(48 + name_to_index[r.name])}{0 if r.is_work else 1}{target:%Y%m%d}")
+        compiled[year] = "".join(data)
+    return compiled, skipped
+
+
+def extract_vacation_dates(vacation_text, year):
+    """
+    从放假日期文本中提取所有日期
+
+    Args:
+        vacation_text (str): 放假日期文本部分
+        year (int): 年份
+
+    Returns:
+        list: datetime 对象列表
+    """
+    dates = []
+
+    # 清理文本，去掉括号内容和无关描述
+    cleaned_text = re.sub(r'（[^）]*）', '', vacation_text)
+    cleaned_text = re.sub(r'\([^)]*\)', '', cleaned_text)
+    cleaned_text = re.sub(r'放假调休，共\d+天', '', cleaned_text)
+    cleaned_text = re.sub(r'放假，共\d+天', '', cleaned_text)
+
+    # 多种日期格式模式，按优先级排序
+    patterns = [
+        # 跨年格式：2022年12月31日至2023年1月2日
+        (r'(\d{4})年(\d+)月(\d+)日至(\d{4})年(\d+)月(\d+)日', 'cross_year'),
+        # 跨月格式：1月28日至2月4日
+        (r'(\d+)月(\d+)日至(\d+)月(\d+)日', 'cross_month'),
+        # 同月跨日格式：4月4日至6日
+        (r'(\d+)月(\d+)日至(\d+)日', 'same_month'),
+        # 单日格式：1月1日
+        (r'(\d+)月(\d+)日', 'single_day')
+    ]
+
+    for pattern, pattern_type in patterns:
+        matches = re.findall(pattern, cleaned_text)
+        if not matches:
+            continue
+
+        for match in matches:
+            try:
+                if pattern_type == 'cross_year':
+                    start_date = datetime(int(match[0]), int(match[1]), int(match[2]))
+                    end_date = datetime(int(match[3]), int(match[4]), int(match[5]))
+                elif pattern_type == 'cross_month':
+                    start_date = datetime(year, int(match[0]), int(match[1]))
+                    end_date = datetime(year, int(match[2]), int(match[3]))
+                elif pattern_type == 'same_month':
+                    start_date = datetime(year, int(match[0]), int(match[1]))
+                    end_date = datetime(year, int(match[0]), int(match[2]))
+                elif pattern_type == 'single_day':
+                    start_date = datetime(year, int(match[0]), int(match[1]))
+                    end_date = start_date
+
+                # 生成日期范围
+                current_date = start_date
+                while current_date <= end_date:
+                    if current_date not in dates:  # 避免重复
+                        dates.append(current_date)
+                    current_date += timedelta(days=1)
+
+            except (ValueError, TypeError, IndexError):
+                continue
+
+        # 如果找到了匹配，就不再尝试其他模式
+        if matches:
+            break
+
+    return sorted(dates)
+
+def extract_work_days(adjust_text, year):
+    """
+    从调休文本中提取上班日期
+
+    Args:
+        adjust_text (str): 调休文本部分
+        year (int): 年份
+
+    Returns:
+        list: datetime 对象列表
+    """
+    work_dates = []
+
+    # 清理文本，去掉最后的句号
+    cleaned_text = adjust_text.rstrip('。')
+
+    # 先尝试直接匹配包含"上班"的日期
+    direct_patterns = [
+        r'(\d+)月(\d+)日（?(?:星期|周)?[一二三四五六日日]?）?\s*上班',
+        r'(\d+)月(\d+)日\([^)]*\)\s*上班',
+        r'(\d+)月(\d+)日（[^）]*）\s*上班',
+        r'(\d+)月(\d+)日\s*上班'
+    ]
+
+    for pattern in direct_patterns:
+        matches = re.findall(pattern, cleaned_text)
+        for month, day in matches:
+            try:
+                work_date = datetime(year, int(month), int(day))
+                if work_date not in work_dates:  # 避免重复
+                    work_dates.append(work_date)
+            except (ValueError, TypeError, IndexError):
+                continue
+
+    # 然后处理"X月X日（周X）、X月X日上班"这种格式
+    # 将文本按逗号分割，检查每段是否包含上班信息
+    parts = re.split(r'[，、]', cleaned_text)
+    for i, part in enumerate(parts):
+        part = part.strip()
+        if not part:
+            continue
+
+        # 如果当前部分包含"上班"，已经处理过了
+        if '上班' in part:
+            continue
+
+        # 如果当前部分不包含"上班"，但下一部分包含"上班"，
+        # 那么当前部分可能也是上班日
+        if i + 1 < len(parts) and '上班' in parts[i + 1]:
+            # 尝试从当前部分提取日期
+            date_pattern = r'(\d+)月(\d+)日（?(?:星期|周)?[一二三四五六日日]?）?'
+            matches = re.findall(date_pattern, part)
+            for month, day in matches:
+                try:
+                    work_date = datetime(year, int(month), int(day))
+                    if work_date not in work_dates:  # 避免重复
+                        work_dates.append(work_date)
+                except (ValueError, TypeError, IndexError):
+                    continue
+
+    return sorted(work_dates)
+
+
+# 放假通知中的假期行：一、元旦：1月1日（周三）放假1天。…
+HOLIDAY_NOTICE_LINE = re.compile(r'^([一二三四五六七八九十]+)、([^：]+)：(.+)$')
+
+# 放假通知中一个假期行的解析结果
+HolidayNoticeLine = namedtuple("HolidayNoticeLine", ["name", "vacation_dates", "work_dates"])
+
+# 整篇放假通知的解析结果：数据串、假期名称、{日期序数: "休"/"班"} 与逐行的问题说明
+HolidayNoticePreview = namedtuple("HolidayNoticePreview", ["data", "names", "marks", "problems"])
+
+
+def parse_holiday_notice_line(line, year):
+    """解析放假通知中的一行，不是"[中文数字]、[节日名]：[安排文本]"格式时返回 None"""
+    holiday_match = HOLIDAY_NOTICE_LINE.match(line.strip())
+    if not holiday_match:
+        return None
+
+    _, holiday_name, arrangement = holiday_match.groups()
+    # 分割安排文本：放假日期文本 和 调休文本（按第一个句号分割）
+    parts = arrangement.strip().split('。', 1)
+    vacation_dates = extract_vacation_dates(parts[0], year)
+    # 从调休文本中提取上班日（仅当有调休文本时）
+    work_dates = extract_work_days(parts[1], year) if len(parts) > 1 and parts[1] else []
+    return HolidayNoticeLine(holiday_name.strip(), vacation_dates, work_dates)
+
+
+def compile_holiday_notice(lines):
+    """把各假期行的解析结果编译为 HolidayUtil 数据串"""
+    data_string = ""
+    name_to_index = {name: i for i, name in enumerate(HolidayUtil.NAMES)}
+
+    all_vacation_days = []
+    all_work_days = []
+    for line in lines:
+        all_work_days.extend(line.work_dates)
+        # 注意：这里直接使用原始节日名称，不做映射
+        for date_obj in line.vacation_dates:
+            all_vacation_days.append((date_obj, line.name))
+
+    # 生成数据字符串
+    for date_obj, holiday_name in all_vacation_days:
+        # 尝试映射到HolidayUtil的标准名称，如果无法映射则跳过
+        name_index = name_to_index.get(holiday_name)
+        if name_index is None:
+            # 尝试常见映射
+            name_index = name_to_index.get(HOLIDAY_NAME_ALIASES.get(holiday_name))
+            if name_index is None:
+                continue
+
+        day_str = date_obj.strftime("%Y%m%d")
+        target_date_str = day_str
+        data_string += f"{day_str}{name_index}1{target_date_str}"
+
+    # 每个放假日期第一次出现时的位置和节日名称，以及每个节日的第一个放假日
+    first_vacation = {}
+    first_day_of = {}
+    for i, (vac_date, vac_name) in enumerate(all_vacation_days):
+        first_vacation.setdefault(vac_date, (i, vac_name))
+        first_day_of.setdefault(vac_name, vac_date)
+    vacation_dates = sorted(first_vacation)
+
+    # 为每个上班日找到对应的节假日：距离最近（30天内）的放假日，距离相同时取通知中先出现的
+    work_to_holiday = {}
+    for work_date in all_work_days:
+        i = bisect_left(vacation_dates, work_date)
+        candidates = [d for d in vacation_dates[max(i - 1, 0):i + 1] if abs((work_date - d).days) <= 30]
+        if candidates:
+            distance = min(abs((work_date - d).days) for d in candidates)
+            closest = min(first_vacation[d] for d in candidates if abs((work_date - d).days) == distance)
+            work_to_holiday[work_date] = closest[1]
+
+    for work_date, holiday_name in work_to_holiday.items():
+        # 映射到HolidayUtil的标准名称
+        mapped_holiday = HOLIDAY_NAME_ALIASES.get(holiday_name)
+        if mapped_holiday:
+            name_index = name_to_index.get(mapped_holiday)
+            if name_index is not None:
+                day_str = work_date.strftime("%Y%m%d")
+                # 对应假期的第一天作为目标日期
+                target_date_str = first_day_of[holiday_name].strftime("%Y%m%d")
+                data_string += f"{day_str}{name_index}0{target_date_str}"
+
+    return data_string
+
+
+@METRICS.timed
+def preview_holiday_notice(year, text, cache=None):
+    """解析整篇放假通知。
+
+    cache 是以 (年份, 行文本) 为键的逐行解析结果，只有新出现或改动过的行才重新解析；
+    解析结束后 cache 只保留当前文本中的行。
+    """
+    parsed = {}
+    lines = []
+    problems = []
+    for number, line in enumerate(text.split("\n"), 1):
+        line = line.strip()
+        if not line:
+            continue
+        key = (year, line)
+        if key in parsed:
+            result = parsed[key]
+        elif cache is not None and key in cache:
+            result = parsed[key] = cache[key]
+        else:
+            result = parsed[key] = parse_holiday_notice_line(line, year)
+        if result is None:
+            continue
+
+        lines.append(result)
+        if not result.vacation_dates:
+            problems.append(f"第 {number} 行：没有找到放假日期")
+        elif result.name not in HolidayUtil.NAMES and HOLIDAY_NAME_ALIASES.get(result.name) not in HolidayUtil.NAMES:
+            problems.append(f"第 {number} 行：无法识别的假期名称“{result.name}”，已跳过")
+    if cache is not None:
+        cache.clear()
+        cache.update(parsed)
+
+    data = compile_holiday_notice(lines)
+    marks = {}
+    for i in range(0, len(data), 18):
+        day = date(int(data[i:i + 4]), int(data[i + 4:i + 6]), int(data[i + 6:i + 8]))
+        marks[day.toordinal()] = "休" if data[i + 9] == "1" else "班"
+    if not lines:
+        problems.append("没有找到“一、元旦：1月1日放假……”格式的假期行")
+    return HolidayNoticePreview(data, sorted({line.name for line in lines}), marks, problems)
@@ -0,0 +1,163 @@
+"""运行时性能计数：热点函数的调用次数与耗时分布、缓存命中率、存活对象数与常驻内存。
+
+计数始终开启，每次调用只多两次 perf_counter、一次加锁和一次分桶；
+被计时的函数也会在后台线程中运行，计数的更新与快照都在同一把锁内进行。
+图形界面按 Ctrl+Shift+F12 显示诊断浮层，启动参数 --metrics-dump 文件 定期把快照写成 JSON。
+本模块不依赖 PySide6。
+"""
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# 耗时分布的分桶上界（毫秒），超过最后一个上界的记入溢出桶
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class LatencyStats:
+    """一个函数的调用次数、总耗时、最大耗时与分桶直方图"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, milliseconds):
+        self.count += 1
+        self.total += milliseconds
+        if milliseconds > self.max:
+            self.max = milliseconds
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, milliseconds)] += 1
+
+    def percentile(self, fraction):
+        """近似分位数：返回所在桶的上界，落在溢出桶时返回最大耗时"""
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def to_dict(self):
+        buckets = {f"<={bound}": count for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)}
+        buckets[f">{LATENCY_BUCKETS_MS[-1]}"] = self.buckets[-1]
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": round(self.max, 3),
+            "buckets": buckets,
+        }
+
+
+def resident_memory():
+    """当前进程的常驻内存（字节），无法读取时返回 None"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        # 非 Linux 平台只能取到峰值；macOS 的单位是字节，其余是 KB
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+    except (ImportError, OSError, AttributeError):
+        return None
+
+
+class Metrics:
+    """进程内的性能计数器集合"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.timings = {}
+        self.instances = {}
+        self.caches = {}
+        self.lock = threading.Lock()
+
+    def timed(self, func):
+        """装饰器：按函数的限定名记录每次调用的耗时"""
+        name = func.__qualname__
+        stats = self.timings.setdefault(name, LatencyStats())
+        lock = self.lock
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    stats.record(elapsed)
+        return wrapper
+
+    def count_instance(self, name, delta):
+        """记录对象的创建（+1）与销毁（-1），用于发现未释放的控件"""
+        with self.lock:
+            live, created = self.instances.get(name, (0, 0))
+            self.instances[name] = (live + delta, created + max(delta, 0))
+
+    def register_cache(self, name, cache):
+        """登记一个带有 hits/misses 计数的缓存"""
+        self.caches[name] = cache
+
+    def snapshot(self):
+        caches = {}
+        for name, cache in self.caches.items():
+            lookups = cache.hits + cache.misses
+            caches[name] = {
+                "hits": cache.hits,
+                "misses": cache.misses,
+                "hit_rate": round(cache.hits / lookups, 4) if lookups else None,
+            }
+        with self.lock:
+            timings = {name: stats.to_dict() for name, stats in sorted(self.timings.items()) if stats.count}
+            instances = {name: {"live": live, "created": created} for name, (live, created) in self.instances.items()}
+        return {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "uptime_s": round(time.monotonic() - self.started, 1),
+            "rss_bytes": resident_memory(),
+            "timings": timings,
+            "instances": instances,
+            "caches": caches,
+        }
+
+    def dump(self, path):
+        """把快照写入 JSON 文件（先写临时文件再替换，读取方不会看到半个文件）"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+
+    def format_text(self):
+        """诊断浮层显示的纯文本表格"""
+        snapshot = self.snapshot()
+        rss = snapshot["rss_bytes"]
+        lines = [f"运行 {snapshot['uptime_s']:.0f} 秒  常驻内存 {rss / 1048576:.1f} MB" if rss is not None
+                 else f"运行 {snapshot['uptime_s']:.0f} 秒"]
+        lines.append("")
+        lines.append(f"{'函数':<36}{'次数':>7}{'平均':>9}{'P95':>8}{'最大':>9}")
+        for name, stats in snapshot["timings"].items():
+            lines.append(f"{name:<36}{stats['count']:>7}{stats['mean_ms']:>9.2f}{stats['p95_ms']:>8}"
+                         f"{stats['max_ms']:>9.1f}")
+        if snapshot["instances"]:
+            lines.append("")
+            for name, counts in snapshot["instances"].items():
+                lines.append(f"{name}：存活 {counts['live']}，累计创建 {counts['created']}")
+        if snapshot["caches"]:
+            lines.append("")
+            for name, counts in snapshot["caches"].items():
+                rate = f"{counts['hit_rate']:.0%}" if counts["hit_rate"] is not None else "-"
+                lines.append(f"{name}：命中率 {rate}（{counts['hits']}/{counts['hits'] + counts['misses']}）")
+        return "\n".join(lines)
+
+
+METRICS = Metrics()
@@ -0,0 +1,284 @@
+"""万年历本地查询服务，供同一台机器上的其他工具查询工作日与农历。
+
+用法：python main.py serve [--host 127.0.0.1] [--port 8765] [--region mainland]
+
+    GET /day/2025-10-01              某天的农历、干支、节日、宜忌与休/班
+    GET /month/2025/10               某月每一天的摘要
+    GET /workdays?from=2025-10-01&to=2025-10-31
+                                     区间内（含两端）的工作日天数
+    GET /yiji?from=2025-01-01&to=2034-12-31&yi=嫁娶&ji=入宅&rest=1
+                                     区间内宜 yi、不忌 ji（均可重复）且为休息日（rest=1 时）的日子，
+                                     一次最多跨 20 个公历年
+
+服务不加载 PySide6。工作日按周几直接计数，再用启动时算好的法定调休修正表
+（前缀和，二分查找）校正；日/月的 JSON 响应按需计算后以编码好的字节缓存，
+当年的数据在启动时预热。
+"""
+import argparse
+import json
+import sys
+import threading
+import traceback
+from bisect import bisect_left
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import accumulate
+from urllib.parse import urlsplit, parse_qs
+from lunar_python import Solar
+from lunar_python.util import HolidayUtil
+from calendar_core import (
+    MIN_YEAR, MAX_YEAR, HOLIDAY_REGIONS, DEFAULT_REGION, HolidayRegions, LRUCache, YiJiIndex, build_month_days
+)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# 缓存的响应数量：约一年的日响应加上十年的月响应
+DAY_RESPONSE_CACHE_SIZE = 400
+MONTH_RESPONSE_CACHE_SIZE = 120
+
+# 择日查询一次最多跨越的公历年数：缺少的年份要在请求中建立索引（每年约 0.7 秒），
+# 建立期间其他择日请求需要等待
+YIJI_MAX_YEARS = 20
+
+
+class QueryError(Exception):
+    """请求参数错误，status 为返回的 HTTP 状态码"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _encode(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _parse_date(text):
+    try:
+        year, month, day = (int(part) for part in text.split("-"))
+        return date(year, month, day)
+    except ValueError:
+        raise QueryError(400, f"日期格式应为 YYYY-MM-DD：{text}")
+
+
+def _is_weekday(ordinal):
+    # 序数 1（0001-01-01）是星期一
+    return (ordinal - 1) % 7 < 5
+
+
+def _weekdays_before(ordinal):
+    """序数小于 ordinal 的日子中周一到周五的天数"""
+    weeks, rest = divmod(ordinal - 1, 7)
+    return weeks * 5 + min(rest, 5)
+
+
+class CalendarTables:
+    """服务使用的内存表：调休修正前缀和，以及日/月响应缓存"""
+
+    def __init__(self):
+        # 法定节假日安排只覆盖少数年份，只记录与"周一到周五上班"不一致的日子：
+        # 工作日放假记 -1，周末调休上班记 +1
+        adjustments = {}
+        for year in range(MIN_YEAR, MAX_YEAR + 1):
+            for holiday in HolidayUtil.getHolidays(year):
+                ordinal = _parse_date(holiday.getDay()).toordinal()
+                if holiday.isWork() != _is_weekday(ordinal):
+                    adjustments[ordinal] = 1 if holiday.isWork() else -1
+        self.adjusted_days = sorted(adjustments)
+        self.adjustment_prefix = list(accumulate((adjustments[o] for o in self.adjusted_days), initial=0))
+
+        # lunar_python 不保证线程安全，缓存未命中时的计算串行进行
+        self.lock = threading.Lock()
+        self.day_responses = LRUCache(self.build_day_response, DAY_RESPONSE_CACHE_SIZE)
+        self.month_responses = LRUCache(self.build_month_response, MONTH_RESPONSE_CACHE_SIZE)
+
+        # 宜忌索引缺少的年份在首次查询时建立，建立期间其他查询不受影响
+        self.yiji_index = YiJiIndex()
+        self.yiji_lock = threading.Lock()
+
+    def check_range(self, year):
+        if not MIN_YEAR <= year <= MAX_YEAR:
+            raise QueryError(404, f"仅支持 {MIN_YEAR}-{MAX_YEAR} 年")
+
+    def warm_up(self, year):
+        """预先计算某年的日/月响应"""
+        for month in range(1, 13):
+            self.month(year, month)
+        for ordinal in range(date(year, 1, 1).toordinal(), date(year, 12, 31).toordinal() + 1):
+            self.day(date.fromordinal(ordinal))
+
+    def day(self, day):
+        self.check_range(day.year)
+        with self.lock:
+            return self.day_responses.get(day.toordinal())
+
+    def month(self, year, month):
+        if not 1 <= month <= 12:
+            raise QueryError(400, f"月份应在 1-12 之间：{month}")
+        self.check_range(year)
+        with self.lock:
+            return self.month_responses.get(year, month)
+
+    def workdays(self, start, end):
+        self.check_range(start.year)
+        self.check_range(end.year)
+        if start > end:
+            raise QueryError(400, "from 不能晚于 to")
+        a = start.toordinal()
+        b = end.toordinal() + 1
+        workdays = _weekdays_before(b) - _weekdays_before(a)
+        workdays += self.adjustment_prefix[bisect_left(self.adjusted_days, b)]
+        workdays -= self.adjustment_prefix[bisect_left(self.adjusted_days, a)]
+        return _encode({
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "days": b - a,
+            "workdays": workdays,
+        })
+
+    def yiji(self, start, end, yi, ji, rest_only):
+        self.check_range(start.year)
+        self.check_range(end.year)
+        if start > end:
+            raise QueryError(400, "from 不能晚于 to")
+        if end.year - start.year + 1 > YIJI_MAX_YEARS:
+            raise QueryError(400, f"择日查询一次最多跨 {YIJI_MAX_YEARS} 年")
+        with self.yiji_lock:
+            self.yiji_index.build(self.yiji_index.missing_years(start.year, end.year))
+            ordinals = self.yiji_index.search(start.toordinal(), end.toordinal(), yi, ji, rest_only)
+        return _encode({
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "days": [date.fromordinal(ordinal).isoformat() for ordinal in ordinals],
+        })
+
+    def build_day_response(self, ordinal):
+        day = date.fromordinal(ordinal)
+        solar_day = Solar.fromYmd(day.year, day.month, day.day)
+        lunar_day = solar_day.getLunar()
+        holiday = HolidayUtil.getHoliday(day.year, day.month, day.day)
+
+        festivals = lunar_day.getFestivals() + solar_day.getFestivals() + solar_day.getOtherFestivals()
+        return _encode({
+            "date": day.isoformat(),
+            "week": solar_day.getWeek(),
+            "workday": holiday.isWork() if holiday else _is_weekday(ordinal),
+            "holiday": holiday.getName() if holiday else None,
+            "lunar": {
+                "year": lunar_day.getYear(),
+                "month": lunar_day.getMonth(),
+                "day": lunar_day.getDay(),
+                "text": f"{lunar_day.getMonthInChinese()}月{lunar_day.getDayInChinese()}",
+            },
+            "ganzhi": f"{lunar_day.getYearInGanZhi()}年 {lunar_day.getMonthInGanZhi()}月 {lunar_day.getDayInGanZhi()}日",
+            "shengxiao": lunar_day.getYearShengXiao(),
+            "jieqi": lunar_day.getJieQi() or None,
+            "festivals": list(dict.fromkeys(festivals)),
+            "yi": lunar_day.getDayYi(),
+            "ji": lunar_day.getDayJi(),
+        })
+
+    def build_month_response(self, year, month):
+        return _encode({
+            "year": year,
+            "month": month,
+            "days": [
+                {
+                    "date": date.fromordinal(info.ordinal).isoformat(),
+                    "week": info.week,
+                    "workday": info.mark != "休",
+                    "mark": info.mark,
+                    "lunar": info.lunar_text,
+                    "festival": info.festival,
+                }
+                for info in build_month_days(year, month)
+            ],
+        })
+
+
+class CalendarRequestHandler(BaseHTTPRequestHandler):
+    """HTTP/1.1 处理器，连接保持复用；tables 由 serve() 注入"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    tables = None
+
+    def do_GET(self):
+        try:
+            body = self.route(urlsplit(self.path))
+            status = 200
+        except QueryError as e:
+            body = _encode({"error": str(e)})
+            status = e.status
+        except Exception as e:
+            # 意外错误也返回 JSON，客户端不会遇到没有响应就断开的连接；详细信息输出到标准错误
+            traceback.print_exc()
+            body = _encode({"error": f"服务器内部错误：{e}"})
+            status = 500
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def route(self, url):
+        parts = url.path.strip("/").split("/")
+        if parts[0] == "day" and len(parts) == 2:
+            return self.tables.day(_parse_date(parts[1]))
+
+        if parts[0] == "month" and len(parts) == 3:
+            try:
+                year, month = int(parts[1]), int(parts[2])
+            except ValueError:
+                raise QueryError(400, "路径格式应为 /month/YYYY/M")
+            return self.tables.month(year, month)
+
+        if parts == ["workdays"]:
+            query = parse_qs(url.query)
+            if "from" not in query or "to" not in query:
+                raise QueryError(400, "需要 from 与 to 参数")
+            return self.tables.workdays(_parse_date(query["from"][0]), _parse_date(query["to"][0]))
+
+        if parts == ["yiji"]:
+            query = parse_qs(url.query)
+            if "from" not in query or "to" not in query:
+                raise QueryError(400, "需要 from 与 to 参数")
+            return self.tables.yiji(_parse_date(query["from"][0]), _parse_date(query["to"][0]),
+                                    query.get("yi", []), query.get("ji", []), query.get("rest", ["0"])[0] == "1")
+
+        raise QueryError(404, f"未知路径：{url.path}")
+
+    def log_message(self, format, *args):
+        pass # 查询频繁，不逐条输出访问日志
+
+
+def serve(host, port, region=DEFAULT_REGION):
+    HolidayRegions().activate(region)
+    tables = CalendarTables()
+    tables.warm_up(date.today().year)
+
+    handler = type("Handler", (CalendarRequestHandler,), {"tables": tables})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"万年历查询服务已启动：http://{host}:{server.server_port}/", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="main.py serve", description="万年历本地查询服务（不启动图形界面）")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"监听地址，默认 {DEFAULT_HOST}")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"监听端口，默认 {DEFAULT_PORT}")
+    parser.add_argument("--region", default=DEFAULT_REGION, choices=[key for key, _ in HOLIDAY_REGIONS],
+                        help=f"使用哪个地区的假期安排，默认 {DEFAULT_REGION}")
+    args = parser.parse_args(argv)
+    return serve(args.host, args.port, args.region)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,27 +1,380 @@
 import sys
-import re
+import gc
+import ctypes
+import calendar
+import csv
+import heapq
+import io
 import json
+import multiprocessing
 import os
+import threading
+import time
 from pathlib import Path
-from datetime import datetime, timedelta
-from PySide6.QtCore import Qt, Signal, QSettings, QTimer
-from PySide6.QtGui import QIcon, QAction
+from datetime import datetime, timedelta, date
+
+# 打包后宜忌索引的工作进程也从这里启动，需要先交给 multiprocessing 处理
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+
+# 命令行服务不需要图形界面，在导入 PySide6 之前分流
+if __name__ == "__main__" and sys.argv[1:2] == ["serve"]:
+    from calendar_server import main as serve_main
+    sys.exit(serve_main(sys.argv[2:]))
+if __name__ == "__main__" and sys.argv[1:2] == ["convert"]:
+    from calendar_convert import main as convert_main
+    sys.exit(convert_main(sys.argv[2:]))
+
+from PySide6.QtCore import (
+    Qt, Signal, Slot, SLOT, QObject, QSettings, QTimer, QRect, QElapsedTimer, QThread, QAbstractListModel, QTime,
+    QDate, QRunnable, QThreadPool, QFileSystemWatcher
+)
+from PySide6.QtGui import (
+    QIcon, QAction, QPixmap, QPainter, QColor, QFont, QPalette, QPen, QCursor, QGuiApplication, QShortcut,
+    QKeySequence, QImage, QPicture, QPdfWriter, QPageSize, QPageLayout
+)
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QLabel, QHBoxLayout, QVBoxLayout,
     QGridLayout, QPushButton, QComboBox, QFrame, QDialog, QTextEdit,
-    QSpinBox, QMessageBox, QDialogButtonBox, QSystemTrayIcon, QMenu
+    QSpinBox, QMessageBox, QDialogButtonBox, QSystemTrayIcon, QMenu, QCheckBox, QFileDialog, QProgressDialog,
+    QLineEdit, QTimeEdit, QFormLayout, QDateEdit, QListWidget, QListWidgetItem
 )
-from lunar_python import Solar, SolarMonth, Lunar
+from lunar_python import Solar, Lunar, LunarYear
 from lunar_python.util import HolidayUtil, LunarUtil, SolarUtil
+from calendar_metrics import METRICS
+from calendar_core import (
+    MIN_YEAR, MAX_YEAR, LRUCache, MonthDiskCache, get_day_mark, build_day_detail, shift_month,
+    iter_calendar_events, write_ics, iter_csv_holiday_records, iter_ics_holiday_records, compile_holiday_records,
+    preview_holiday_notice, HOLIDAY_REGIONS, DEFAULT_REGION, HolidayRegions, user_holidays_path, CONFIG_DIR,
+    EVENT_ONCE, EVENT_YEARLY, EVENT_LUNAR_YEARLY, EventStore, YI_JI_ACTIVITIES, YiJiIndex, iter_converted_rows,
+    DAY_TABLE, DAY_TABLE_FIRST_YEAR, DAY_TABLE_LAST_YEAR, np, current_holiday_data, build_months
+)
+
+# 连续导航时两次重绘之间的最小间隔（毫秒），约一帧
+FRAME_INTERVAL = 16
+
+# 渲染失效标记：网格、选中格子、左侧详情面板、法定节假日下拉框
+RENDER_GRID = 0x1
+RENDER_SELECTION = 0x2
+RENDER_LEFT_PANEL = 0x4
+RENDER_HOLIDAYS = 0x8
+RENDER_ALL = RENDER_GRID | RENDER_SELECTION | RENDER_LEFT_PANEL | RENDER_HOLIDAYS
+
+# 隐藏到托盘后释放界面内存的默认等待时间（秒）
+DEFAULT_LOW_MEMORY_DELAY = 300
+
+# 时钟跳变检测的间隔（毫秒）与容差（秒）
+CLOCK_WATCHDOG_INTERVAL = 30 * 1000
+CLOCK_JUMP_TOLERANCE = 5.0
+
+# 新算出的月份数据写入磁盘缓存前的等待时间（毫秒），连续翻页时合并写入
+MONTH_CACHE_SAVE_DELAY = 5000
+
+# 用户假期文件变化后等待多久（毫秒）再重新读取，合并同一次写入产生的多个通知
+HOLIDAYS_RELOAD_DELAY = 500
+
+# 导入对话框中停止输入多久（毫秒）后在后台重新解析预览
+IMPORT_PREVIEW_DELAY = 300
+
+# 导出月历时每页的逻辑尺寸（像素，约为横向 A4 的比例），PNG 按此尺寸输出，PDF 按页面缩放
+MONTH_PAGE_WIDTH = 1600
+MONTH_PAGE_HEIGHT = 1130
+
+# 诊断浮层的刷新间隔与 --metrics-dump 写文件的间隔（毫秒）
+METRICS_OVERLAY_INTERVAL = 1000
+METRICS_DUMP_INTERVAL = 10000
+
+
+class ClockService(QObject):
+    """持有"今天"的时钟服务，跨天、挂起恢复或系统时间变化时发出 today_changed。
+
+    "今天"以 date.toordinal() 的整数形式缓存，所有界面组件共用同一个值，
+    避免在每个格子、每次显示窗口时重复调用 datetime.now() 并格式化字符串。
+    """
+    today_changed = Signal(int, int)  # (旧日期序数, 新日期序数)
+    clock_changed = Signal()  # 挂起恢复或系统时间跳变（无论是否跨天）
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._today = date.today().toordinal()
+
+        # 午夜刷新定时器：每次触发、系统唤醒或时钟跳变后都按当前时间重新计算
+        self.midnight_timer = QTimer(self)
+        self.midnight_timer.setSingleShot(True)
+        self.midnight_timer.setTimerType(Qt.PreciseTimer)
+        self.midnight_timer.timeout.connect(self.on_midnight)
+
+        # QTimer 基于单调时钟，挂起期间不计时，系统时间被修改时也不会感知。
+        # 这里比较墙上时间与单调时钟的流逝量，两者不一致即视为时钟跳变。
+        self.watchdog = QTimer(self)
+        self.watchdog.setTimerType(Qt.VeryCoarseTimer)
+        self.watchdog.timeout.connect(self.check_clock_jump)
+        self.wall_clock_ref = time.time()
+        self.monotonic_ref = time.monotonic()
+        self.watchdog.start(CLOCK_WATCHDOG_INTERVAL)
+
+        self.connect_sleep_signal()
+        self.schedule_midnight()
+
+    def today(self):
+        """今天的日期序数"""
+        return self._today
+
+    def today_date(self):
+        return date.fromordinal(self._today)
+
+    def check(self):
+        """重新读取系统日期，变化时发出 today_changed"""
+        today = date.today().toordinal()
+        if today != self._today:
+            previous = self._today
+            self._today = today
+            self.today_changed.emit(previous, today)
+
+    def connect_sleep_signal(self):
+        """监听 logind 的挂起/恢复信号，不可用时仅依赖时钟跳变检测"""
+        try:
+            from PySide6.QtDBus import QDBusConnection
+        except ImportError:
+            return
+
+        bus = QDBusConnection.systemBus()
+        if not bus.isConnected():
+            return
+        bus.connect("org.freedesktop.login1", "/org/freedesktop/login1",
+                    "org.freedesktop.login1.Manager", "PrepareForSleep",
+                    self, SLOT("on_prepare_for_sleep(bool)"))
+
+    @Slot(bool)
+    def on_prepare_for_sleep(self, sleeping):
+        """系统挂起前后的回调，恢复时立即检查日期"""
+        if not sleeping:
+            self.on_clock_changed()
+
+    def check_clock_jump(self):
+        """检查系统时间是否发生跳变（手动改时间、NTP 校时或挂起恢复）"""
+        wall = time.time()
+        monotonic = time.monotonic()
+        drift = (wall - self.wall_clock_ref) - (monotonic - self.monotonic_ref)
+        self.wall_clock_ref = wall
+        self.monotonic_ref = monotonic
+
+        if abs(drift) > CLOCK_JUMP_TOLERANCE:
+            self.on_clock_changed()
+
+    def on_clock_changed(self):
+        """时钟变化后更新日期并重新安排午夜刷新，其他按墙上时间等待的定时器随 clock_changed 重新计算"""
+        self.check()
+        self.schedule_midnight()
+        self.clock_changed.emit()
+
+    def schedule_midnight(self):
+        """安排午夜精确刷新"""
+        # 计算到下一个午夜的时间，多留一秒避免定时器提前触发时仍停留在前一天
+        now = datetime.now()
+        tomorrow = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        time_until_midnight = (tomorrow - now).total_seconds() * 1000 + 1000  # 转换为毫秒
+
+        self.midnight_timer.start(int(time_until_midnight))
+
+    def on_midnight(self):
+        """午夜刷新处理"""
+        self.check()
+        # 重新安排下一个午夜刷新
+        self.schedule_midnight()
+
+
+class ReminderNotifier(QObject):
+    """日程提醒：今明两天的提醒放在按时间排序的最小堆里，只用一个单次定时器等待堆顶。
+
+    跨天（包括挂起恢复、系统时间变化）时由时钟服务触发重新加载，日程增删后调用 reload()；
+    定时器基于单调时钟，同一天内挂起恢复或系统时间跳变后按墙上时间重新计算等待时间，
+    期间已经到期的提醒立即发出。
+    """
+    reminder_due = Signal(str)  # 日程标题
+
+    def __init__(self, store, clock, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.clock = clock
+        self.heap = []
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.fire_due)
+        clock.today_changed.connect(self.reload)
+        clock.clock_changed.connect(self.arm)
+        self.reload()
+
+    def reload(self, *args):
+        today = self.clock.today()
+        now = time.time()
+        self.heap = []
+        for occurrence in self.store.events_between(today, today + 1, reminders_only=True):
+            event = occurrence.event
+            midnight = datetime.combine(date.fromordinal(occurrence.ordinal), datetime.min.time())
+            due = (midnight + timedelta(minutes=event.remind_minute)).timestamp()
+            if due > now:
+                self.heap.append((due, event.id, event.title))
+        heapq.heapify(self.heap)
+        self.arm()
+
+    def arm(self):
+        """按墙上时间重新计算到堆顶的等待时间"""
+        self.timer.stop()
+        if self.heap:
+            delay = max(0.0, self.heap[0][0] - time.time())
+            self.timer.start(int(delay * 1000))
+
+    def fire_due(self):
+        now = time.time()
+        while self.heap and self.heap[0][0] <= now + 0.5:
+            _, _, title = heapq.heappop(self.heap)
+            self.reminder_due.emit(title)
+        self.arm()
+
+
+# 主题配色，由 Theme 预先编译成调色板
+LIGHT_THEME_COLORS = {
+    "window": "#f8f9fa",
+    "panel": "#ffffff",
+    "panel_border": "#dee2e6",
+    "text": "#333333",
+    "secondary": "#555555",
+    "muted": "#888888",
+    "accent": "#4E6EF2",
+    "on_accent": "#ffffff",
+    "festival": "#e13844",
+    "rest_mark": "#28a745",
+    "cell": "#ffffff",
+    "cell_border": "#f1f1f1",
+    "cell_selected": "#e0e8ff",
+    "yi": "#3498db",
+    "ji": "#e74c3c",
+}
+
+DARK_THEME_COLORS = {
+    "window": "#1e1f22",
+    "panel": "#2b2d30",
+    "panel_border": "#3c3f41",
+    "text": "#e6e6e6",
+    "secondary": "#c0c0c0",
+    "muted": "#8c8c8c",
+    "accent": "#5b7cfa",
+    "on_accent": "#ffffff",
+    "festival": "#ff6b6b",
+    "rest_mark": "#4cc26a",
+    "cell": "#2b2d30",
+    "cell_border": "#35373a",
+    "cell_selected": "#34406b",
+    "yi": "#3a8ed4",
+    "ji": "#d9534f",
+}
+
+
+def build_theme_fonts():
+    """界面用到的全部字体，两套主题共用"""
+    def font(pixel_size=0, point_size=0, bold=False, weight=None):
+        f = QFont()
+        if pixel_size:
+            f.setPixelSize(pixel_size)
+        if point_size:
+            f.setPointSize(point_size)
+        if bold:
+            f.setBold(True)
+        if weight:
+            f.setWeight(weight)
+        return f
+
+    return {
+        "year_month": font(pixel_size=18),
+        "day_display": font(point_size=90, weight=QFont.Medium),
+        "lunar_weekday": font(pixel_size=16),
+        "ganzhi": font(pixel_size=13),
+        "festivals": font(pixel_size=14, bold=True),
+        "badge": font(pixel_size=14, bold=True),
+        "yi_ji": font(pixel_size=14),
+        "week_header": font(bold=True),
+        "cell_solar": font(point_size=18, bold=True),
+        "cell_festival": font(point_size=9, bold=True),
+        "cell_lunar": font(point_size=10),
+        "cell_mark": font(point_size=9, bold=True),
+    }
+
+
+class Theme:
+    """预先编译的主题：颜色、调色板和字体只创建一次，由所有控件共享。
+
+    切换主题时只需把另一组调色板设置到控件上，不涉及任何 QSS 解析。
+    """
+
+    def __init__(self, name, colors, fonts):
+        self.name = name
+        self.colors = {key: QColor(value) for key, value in colors.items()}
+        self.fonts = fonts
+
+        c = self.colors
+        self.app_palette = QPalette()
+        self.app_palette.setColor(QPalette.Window, c["window"])
+        self.app_palette.setColor(QPalette.WindowText, c["text"])
+        self.app_palette.setColor(QPalette.Base, c["panel"])
+        self.app_palette.setColor(QPalette.AlternateBase, c["window"])
+        self.app_palette.setColor(QPalette.Text, c["text"])
+        self.app_palette.setColor(QPalette.Button, c["panel"])
+        self.app_palette.setColor(QPalette.ButtonText, c["text"])
+        self.app_palette.setColor(QPalette.Highlight, c["accent"])
+        self.app_palette.setColor(QPalette.HighlightedText, c["on_accent"])
+        self.app_palette.setColor(QPalette.ToolTipBase, c["panel"])
+        self.app_palette.setColor(QPalette.ToolTipText, c["text"])
+
+        # 各类控件使用的调色板，键名即"角色"
+        self.palettes = {
+            "panel": self._palette(c["text"], c["panel"]),
+            "panel_border": self._palette(c["text"], c["panel_border"]),
+            "text": self._palette(c["text"]),
+            "secondary": self._palette(c["secondary"]),
+            "muted": self._palette(c["muted"]),
+            "festival": self._palette(c["festival"]),
+            "rest_mark": self._palette(c["rest_mark"]),
+            "on_accent": self._palette(c["on_accent"]),
+            "yi": self._palette(c["on_accent"], c["yi"]),
+            "ji": self._palette(c["on_accent"], c["ji"]),
+        }
+
+    @staticmethod
+    def _palette(text, background=None):
+        palette = QPalette()
+        palette.setColor(QPalette.WindowText, text)
+        if background is not None:
+            palette.setColor(QPalette.Window, background)
+        return palette
+
+
+class BadgeLabel(QLabel):
+    """圆角底色的小标签（宜/忌），底色取自调色板的 Window 颜色"""
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self.palette().color(QPalette.Window))
+        painter.drawRoundedRect(self.rect(), 4, 4)
+        painter.end()
+        super().paintEvent(event)
+
 
 class DayCell(QFrame):
     """Custom widget for a single day in the calendar grid."""
     day_clicked = Signal(Solar)
 
-    def __init__(self, solar_day=None):
+    def __init__(self, info=None, today=0, theme=None):
         super().__init__()
-        self.solar_day = solar_day
-        self.setProperty("is_selected", False)
+        self.info = info
+        self.ordinal = info.ordinal if info else 0
+        self.theme = theme
+        self.is_selected = False
+        self.is_today = False
+        self.is_hovered = False
+        self.events = ()
 
         self.setFrameShape(QFrame.NoFrame)
         self.setLayout(QVBoxLayout())
@@ -33,87 +386,310 @@ class DayCell(QFrame):
         self.lunar_label = QLabel()
         self.holiday_label = QLabel(self)
 
+        # 统计存活的格子数，翻页后数量不回落说明 deleteLater 的格子没有被释放
+        METRICS.count_instance("DayCell", 1)
+        self.destroyed.connect(lambda: METRICS.count_instance("DayCell", -1))
+
         self.solar_label.setAlignment(Qt.AlignCenter)
         self.major_festival_label.setAlignment(Qt.AlignCenter)
         self.lunar_label.setAlignment(Qt.AlignCenter)
+        self.solar_label.setMargin(2)
+        self.holiday_label.setMargin(2)
 
-        self.solar_label.setObjectName("solar_label")
-        self.major_festival_label.setObjectName("major_festival_label")
-        self.lunar_label.setObjectName("lunar_label")
-        self.holiday_label.setObjectName("holiday_label")
+        # 字体对象由主题统一创建，所有格子共享
+        fonts = theme.fonts
+        self.solar_label.setFont(fonts["cell_solar"])
+        self.major_festival_label.setFont(fonts["cell_festival"])
+        self.lunar_label.setFont(fonts["cell_lunar"])
+        self.holiday_label.setFont(fonts["cell_mark"])
 
         self.layout().addWidget(self.solar_label)
         self.layout().addWidget(self.major_festival_label)
         self.layout().addWidget(self.lunar_label)
 
-        if self.solar_day:
-            self.set_day()
-
-    def set_day(self):
-        lunar_day = self.solar_day.getLunar()
-        self.solar_label.setText(str(self.solar_day.getDay()))
+        if self.info:
+            self.set_day(today)
 
-        major_lunar_festivals = lunar_day.getFestivals()
-        major_solar_festivals = self.solar_day.getFestivals()
-        all_major_festivals = major_lunar_festivals + major_solar_festivals
-        self.major_festival_label.setText(all_major_festivals[0] if all_major_festivals else "")
+    @METRICS.timed
+    def set_day(self, today):
+        info = self.info
+        self.solar_label.setText(str(info.day))
+        self.major_festival_label.setText(info.festival)
+        self.lunar_label.setText(info.lunar_text)
+        self.holiday_label.setText(info.mark)
+        self.is_today = self.ordinal == today
+        self.apply_theme(self.theme)
 
-        lunar_text = f"{lunar_day.getMonthInChinese()}月{lunar_day.getDayInChinese()}"
-        self.lunar_label.setText(lunar_day.getJieQi() or lunar_text)
-
-        is_weekend = self.solar_day.getWeek() == 0 or self.solar_day.getWeek() == 6
-        holiday = HolidayUtil.getHoliday(self.solar_day.getYear(), self.solar_day.getMonth(), self.solar_day.getDay())
-        
-        self.setProperty("is_rest", False)
-        self.setProperty("is_work", False)
-        self.setProperty("is_today", self.solar_day.toYmd() == datetime.now().strftime("%Y-%m-%d"))
-
-        self.holiday_label.setText("")
-        if holiday:
-            if holiday.isWork():
-                self.holiday_label.setText("班")
-                self.setProperty("is_work", True)
-            else:
-                self.holiday_label.setText("休")
-                self.setProperty("is_rest", True)
-        elif is_weekend:
-            self.holiday_label.setText("休")
-            self.setProperty("is_rest", True)
-        
         # Position the holiday_label
         self.holiday_label.move(5, 5) # Move to top-left with some padding
         self.holiday_label.adjustSize() # Adjust size to fit content
 
+    def apply_theme(self, theme):
+        """按状态为子标签选择预编译的调色板"""
+        self.theme = theme
+        palettes = theme.palettes
+        mark = self.info.mark if self.info else ""
+
+        if self.is_today:
+            self.solar_label.setPalette(palettes["on_accent"])
+        elif mark == "休":
+            self.solar_label.setPalette(palettes["festival"])
+        else:
+            self.solar_label.setPalette(palettes["text"])
+        self.major_festival_label.setPalette(palettes["festival"])
+        self.lunar_label.setPalette(palettes["muted"])
+        self.holiday_label.setPalette(palettes["rest_mark"] if mark == "休" else palettes["muted"])
+        self.update()
+
+    def paintEvent(self, event):
+        colors = self.theme.colors
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), colors["cell_selected"] if self.is_selected else colors["cell"])
+        painter.setPen(QPen(colors["accent"] if self.is_selected or self.is_hovered else colors["cell_border"], 1))
+        painter.drawRect(self.rect().adjusted(0, 0, -1, -1))
+
+        if self.is_today:
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(colors["accent"])
+            painter.drawRoundedRect(self.solar_label.geometry(), 10, 10)
+
+        if self.events:
+            # 有个人日程的日子在右上角画一个小圆点
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(colors["accent"])
+            painter.drawEllipse(self.width() - 12, 6, 6, 6)
+        painter.end()
+
+    def set_events(self, events):
+        self.events = events
+        self.setToolTip("\n".join(event.title for event in events))
+        self.update()
+
+    def set_today(self, is_today):
+        self.is_today = is_today
+        self.apply_theme(self.theme)
+
+    def enterEvent(self, event):
+        self.is_hovered = True
+        self.update()
+        super().enterEvent(event)
+
+    def leaveEvent(self, event):
+        self.is_hovered = False
+        self.update()
+        super().leaveEvent(event)
+
     def mousePressEvent(self, event):
-        if self.solar_day:
-            self.day_clicked.emit(self.solar_day)
+        if self.info:
+            self.day_clicked.emit(Solar.fromYmd(self.info.year, self.info.month, self.info.day))
         super().mousePressEvent(event)
 
     def set_selected(self, selected):
-        self.setProperty("is_selected", selected)
-        self.style().unpolish(self)
-        self.style().polish(self)
+        self.is_selected = selected
+        self.update()
 
-class MainWindow(QMainWindow):
-    def _get_user_holidays_path(self):
-        config_dir = os.path.expanduser("~/.config/OfflineCalendar")
-        os.makedirs(config_dir, exist_ok=True)
-        return os.path.join(config_dir, "user_holidays.json")
+class MetricsOverlay(QLabel):
+    """诊断浮层：半透明地覆盖在主窗口右上角，显示时每秒刷新一次性能计数"""
 
-    def load_user_holidays(self):
-        holidays_file = self._get_user_holidays_path()
-        try:
-            with open(holidays_file, "r") as f:
-                user_data = json.load(f)
-                if isinstance(user_data, dict):
-                    for year, data_string in user_data.items():
-                        HolidayUtil.fix(None, data_string)
-        except (FileNotFoundError, json.JSONDecodeError):
-            pass # File doesn't exist or is invalid, just ignore
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setTextFormat(Qt.PlainText)
+        self.setAlignment(Qt.AlignTop | Qt.AlignLeft)
+        self.setMargin(10)
+        font = QFont("monospace")
+        font.setStyleHint(QFont.Monospace)
+        font.setPixelSize(11)
+        self.setFont(font)
+        # 不用样式表：文字颜色走调色板，半透明圆角背景在 paintEvent 中绘制
+        palette = self.palette()
+        palette.setColor(QPalette.WindowText, QColor("#e6e6e6"))
+        self.setPalette(palette)
+        self.background = QColor(0, 0, 0, 190)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(METRICS_OVERLAY_INTERVAL)
+        self.timer.timeout.connect(self.refresh)
+
+    def refresh(self):
+        self.setText(METRICS.format_text())
+        self.adjustSize()
+        parent = self.parentWidget()
+        self.move(parent.width() - self.width() - 10, 10)
+        self.raise_()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self.background)
+        painter.drawRoundedRect(self.rect(), 6, 6)
+        painter.end()
+        super().paintEvent(event)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+
+class TrayCalendarPopup(QWidget):
+    """托盘小日历：无边框弹出窗口，直接绘制月份缓存数据，不创建任何子控件"""
+    day_activated = Signal(int)  # 点击的日期序数
+
+    PADDING = 8
+    HEADER_HEIGHT = 32
+    WEEK_HEIGHT = 22
+    CELL_WIDTH = 42
+    CELL_HEIGHT = 38
+
+    def __init__(self, month_cache, clock, theme):
+        super().__init__(None, Qt.Popup | Qt.FramelessWindowHint)
+        self.month_cache = month_cache
+        self.clock = clock
+        self.theme = theme
+        self.year = MIN_YEAR
+        self.month = 1
+        self.cell_rects = []
+
+        self.setFixedSize(self.PADDING * 2 + self.CELL_WIDTH * 7,
+                          self.PADDING * 2 + self.HEADER_HEIGHT + self.WEEK_HEIGHT + self.CELL_HEIGHT * 6)
+
+        grid_left = self.PADDING
+        self.prev_rect = QRect(grid_left, self.PADDING, self.CELL_WIDTH, self.HEADER_HEIGHT)
+        self.next_rect = QRect(grid_left + self.CELL_WIDTH * 6, self.PADDING, self.CELL_WIDTH, self.HEADER_HEIGHT)
+        self.title_rect = QRect(grid_left + self.CELL_WIDTH, self.PADDING, self.CELL_WIDTH * 5, self.HEADER_HEIGHT)
+
+        # 字体只创建一次，绘制时直接复用
+        self.title_font = QFont()
+        self.title_font.setPixelSize(15)
+        self.title_font.setBold(True)
+        self.day_font = QFont()
+        self.day_font.setPixelSize(14)
+        self.day_font.setBold(True)
+        self.small_font = QFont()
+        self.small_font.setPixelSize(9)
+
+    def popup_near(self, anchor):
+        """在托盘图标附近弹出，并回到今天所在的月份"""
+        today = self.clock.today_date()
+        self.year = today.year
+        self.month = today.month
+
+        screen = QGuiApplication.screenAt(anchor.center()) or QGuiApplication.primaryScreen()
+        available = screen.availableGeometry()
+        x = min(max(anchor.center().x() - self.width() // 2, available.left()), available.right() - self.width())
+        if anchor.top() - self.height() >= available.top():
+            y = anchor.top() - self.height()
+        else:
+            y = min(anchor.bottom(), available.bottom() - self.height())
+        self.move(x, y)
+        self.show()
+
+    def show_month(self, year, month):
+        self.year, self.month = shift_month(year, month, 0)
+        self.update()
+
+    def paintEvent(self, event):
+        days = self.month_cache.get(self.year, self.month)
+        today = self.clock.today()
+        colors = self.theme.colors
+
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.fillRect(self.rect(), colors["panel"])
+        painter.setPen(colors["panel_border"])
+        painter.drawRect(self.rect().adjusted(0, 0, -1, -1))
+
+        painter.setFont(self.title_font)
+        painter.setPen(colors["text"])
+        painter.drawText(self.prev_rect, Qt.AlignCenter, "‹")
+        painter.drawText(self.next_rect, Qt.AlignCenter, "›")
+        painter.drawText(self.title_rect, Qt.AlignCenter, f"{self.year}年{self.month}月")
+
+        top = self.PADDING + self.HEADER_HEIGHT
+        painter.setFont(self.small_font)
+        for i, name in enumerate(["日", "一", "二", "三", "四", "五", "六"]):
+            painter.setPen(colors["festival"] if i == 0 or i == 6 else colors["secondary"])
+            painter.drawText(QRect(self.PADDING + i * self.CELL_WIDTH, top, self.CELL_WIDTH, self.WEEK_HEIGHT),
+                             Qt.AlignCenter, name)
+
+        top += self.WEEK_HEIGHT
+        self.cell_rects = []
+        for i, info in enumerate(days):
+            slot = days[0].week + i
+            rect = QRect(self.PADDING + (slot % 7) * self.CELL_WIDTH, top + (slot // 7) * self.CELL_HEIGHT,
+                         self.CELL_WIDTH, self.CELL_HEIGHT)
+            self.cell_rects.append((rect, info.ordinal))
+
+            number_rect = QRect(rect.left(), rect.top() + 2, rect.width(), 20)
+            if info.ordinal == today:
+                painter.setPen(Qt.NoPen)
+                painter.setBrush(colors["accent"])
+                painter.drawRoundedRect(number_rect.adjusted(8, 0, -8, 0), 8, 8)
+                painter.setPen(colors["on_accent"])
+            elif info.mark == "休":
+                painter.setPen(colors["festival"])
+            else:
+                painter.setPen(colors["text"])
+            painter.setFont(self.day_font)
+            painter.drawText(number_rect, Qt.AlignCenter, str(info.day))
+
+            painter.setFont(self.small_font)
+            painter.setPen(colors["festival"] if info.festival else colors["muted"])
+            painter.drawText(QRect(rect.left(), rect.top() + 22, rect.width(), 14), Qt.AlignCenter,
+                             info.festival or info.lunar_text)
+
+            if info.mark:
+                painter.setPen(colors["rest_mark"] if info.mark == "休" else colors["muted"])
+                painter.drawText(QRect(rect.left() + 1, rect.top(), 12, 12), Qt.AlignCenter, info.mark)
+        painter.end()
+
+    def mousePressEvent(self, event):
+        pos = event.position().toPoint()
+        if self.prev_rect.contains(pos):
+            self.show_month(*shift_month(self.year, self.month, -1))
+        elif self.next_rect.contains(pos):
+            self.show_month(*shift_month(self.year, self.month, 1))
+        elif self.title_rect.contains(pos):
+            today = self.clock.today_date()
+            self.show_month(today.year, today.month)
+        else:
+            for rect, ordinal in self.cell_rects:
+                if rect.contains(pos):
+                    self.hide()
+                    self.day_activated.emit(ordinal)
+                    return
+        event.accept()
+
+    def wheelEvent(self, event):
+        delta = -1 if event.angleDelta().y() > 0 else 1
+        self.show_month(*shift_month(self.year, self.month, delta))
+
+
+class YearListModel(QAbstractListModel):
+    """年份下拉框的模型：只报告行数，显示时按行号算出年份，不为每一年创建条目"""
+
+    def rowCount(self, parent=None):
+        return MAX_YEAR - MIN_YEAR + 1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return str(MIN_YEAR + index.row())
+        return None
 
+
+class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.load_user_holidays()
+        # 各地区的假期数据在启动时一次性编译，之后切换地区不再解析
+        self.holiday_regions = HolidayRegions()
 
         self.setWindowTitle("万年历本地版")
         self.setObjectName("WanNianLiBenDiBan")
@@ -126,24 +702,108 @@ class MainWindow(QMainWindow):
         self.selected_cell = None
         self.app = QApplication.instance()
         self.holiday_dates = {}
+        self.day_cells = {}
+        # 月份数据先查内存 LRU，再查磁盘缓存，都未命中才调用 lunar_python 计算；
+        # 每个地区各有一套缓存，切回某个地区时直接从缓存重绘
+        self.month_stores = {
+            key: MonthDiskCache(region=key, holiday_data=lambda key=key: self.holiday_regions.regions[key].data)
+            for key, _ in HOLIDAY_REGIONS
+        }
+        self.month_caches = {key: LRUCache(self.load_month_days, 24) for key, _ in HOLIDAY_REGIONS}
+        self.month_store_timer = QTimer(self)
+        self.month_store_timer.setSingleShot(True)
+        self.month_store_timer.setInterval(MONTH_CACHE_SAVE_DELAY)
+        self.month_store_timer.timeout.connect(lambda: self.month_store.save())
+        self.detail_cache = LRUCache(build_day_detail, 62)
+        # 个人日程：月历网格按月一次取出
+        self.event_store = EventStore()
+        self.event_cache = LRUCache(self.event_store.month_events, 24)
+        for key, _ in HOLIDAY_REGIONS:
+            METRICS.register_cache(f"month_cache.{key}", self.month_caches[key])
+            METRICS.register_cache(f"month_store.{key}", self.month_stores[key])
+        METRICS.register_cache("detail_cache", self.detail_cache)
+        METRICS.register_cache("event_cache", self.event_cache)
+        self.metrics_overlay = None
+        # 宜忌倒排索引，首次查询时才读取或计算
+        self.yiji_index = YiJiIndex()
+        self.yiji_dialog = None
+        self.convert_dialog = None
+        self.tray_popup = None
+        self.ui_released = False
+        self.wheel_delta = 0
+
+        # 渲染管线状态：界面上当前呈现的内容与待处理的失效标记
+        self.dirty = 0
+        self.drawn_month = None
+        self.holiday_year = None
+        self.panel_ordinal = None
+        self.panel_detail = None
+
+        # 渲染合并定时器：同一轮事件中的多次改动只提交一次渲染
+        self.redraw_timer = QTimer(self)
+        self.redraw_timer.setSingleShot(True)
+        self.redraw_timer.timeout.connect(self.commit_render)
+        self.redraw_clock = QElapsedTimer()
+        self.redraw_clock.start()
 
         # 系统托盘相关
         self.settings = QSettings("OfflineCalendar", "WanNianLi")
+        self.activate_holiday_region(self.settings.value("holiday_region", DEFAULT_REGION))
+
+        # 用户假期文件被其他实例或配置推送修改后自动重新读取，无需重启
+        self.holidays_watcher = QFileSystemWatcher(self)
+        self.holidays_watcher.fileChanged.connect(self.schedule_holidays_reload)
+        self.holidays_watcher.directoryChanged.connect(self.schedule_holidays_reload)
+        self.holidays_reload_timer = QTimer(self)
+        self.holidays_reload_timer.setSingleShot(True)
+        self.holidays_reload_timer.setInterval(HOLIDAYS_RELOAD_DELAY)
+        self.holidays_reload_timer.timeout.connect(self.reload_user_holidays)
+        self.watch_user_holidays()
+
+        # 可选的列式日表（需要 NumPy）：加载后月历、详情面板与休息日位图直接读表
+        self.day_table_worker = None
+        self.day_table_action = None
+        if self.is_day_table_enabled():
+            self.start_day_table(interactive=False)
+
+        # 两套主题在启动时一次性编译，切换时直接替换
+        fonts = build_theme_fonts()
+        self.themes = {
+            "light": Theme("light", LIGHT_THEME_COLORS, fonts),
+            "dark": Theme("dark", DARK_THEME_COLORS, fonts),
+        }
+        self.theme = self.themes["dark" if self.is_dark_theme_enabled() else "light"]
         self.tray_icon = None
+        self.tray_pixmaps = {}
+
+        # 低内存模式：隐藏到托盘一段时间后释放界面
+        self.release_timer = QTimer(self)
+        self.release_timer.setSingleShot(True)
+        self.release_timer.timeout.connect(self.release_ui)
+
+        # 设置定时器用于日期更新（托盘图标依赖时钟服务，需先创建）
+        self.setup_date_timer()
 
         # 初始化系统托盘
         self.setup_system_tray()
 
-        # 设置定时器用于日期更新
-        self.setup_date_timer()
+        # 日程提醒通过托盘消息显示
+        self.reminders = ReminderNotifier(self.event_store, self.clock, self)
+        self.reminders.reminder_due.connect(self.show_reminder)
 
         # --- Date State ---
-        today = datetime.now()
+        today = self.clock.today_date()
         self.year = today.year
         self.month = today.month
         self.day = today.day
 
         # --- UI Initialization ---
+        self.build_ui()
+        self.setup_shortcuts()
+
+    def build_ui(self):
+        """创建窗口内容并完成首次绘制，低内存模式释放后也通过这里重建"""
+        self.themed_widgets = []
         main_widget = QWidget()
         main_layout = QHBoxLayout(main_widget)
         main_layout.setContentsMargins(0, 0, 0, 0)
@@ -151,277 +811,362 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(main_widget)
 
         self.setup_left_panel()
-        right_panel = self.setup_right_panel()
+        self.right_panel = self.setup_right_panel()
+        self.setup_navigation_shortcuts()
+
+        # 左侧面板的右边框
+        separator = QFrame()
+        separator.setFixedWidth(1)
+        separator.setAutoFillBackground(True)
+        self.themed_widgets.append((separator, "panel_border"))
 
         main_layout.addWidget(self.left_panel)
-        main_layout.addWidget(right_panel)
+        main_layout.addWidget(separator)
+        main_layout.addWidget(self.right_panel)
 
         # --- Connect Signals ---
         self.year_combo.currentIndexChanged.connect(self.on_date_change)
         self.month_combo.currentIndexChanged.connect(self.on_date_change)
         self.holiday_combo.currentIndexChanged.connect(self.on_holiday_selected)
-        self.import_button.clicked.connect(self.on_import_holidays_clicked)
+        self.region_combo.currentIndexChanged.connect(self.on_region_selected)
+        import_menu = QMenu(self.import_button)
+        import_menu.addAction("粘贴放假通知文本…", self.on_import_holidays_clicked)
+        import_menu.addAction("从 ICS/CSV 文件导入…", self.on_import_file_clicked)
+        self.import_button.setMenu(import_menu)
+        export_menu = QMenu(self.export_button)
+        export_menu.addAction("导出 iCalendar（.ics）…", self.on_export_ics_clicked)
+        export_menu.addAction("导出月历 PDF/PNG…", self.on_export_pages_clicked)
+        self.export_button.setMenu(export_menu)
+        self.yiji_button.clicked.connect(self.on_yiji_search_clicked)
+        self.convert_button.clicked.connect(self.on_convert_clicked)
         self.today_button.clicked.connect(self.go_to_today)
 
         # --- Initial Draw & Style ---
         self.setup_styles()
-        self.update_combo_boxes()
-        self.update_holiday_combo()
-        self.draw_calendar()
-
-    def parse_holiday_text(self, year, text):
-        from datetime import timedelta
-        from lunar_python import Lunar
-
-        data_string = ""
-        name_to_index = {name: i for i, name in enumerate(HolidayUtil.NAMES)}
-
-        # 解析所有节假日行
-        all_vacation_days = []
-        all_work_days = []
-        holiday_names_list = []  # 用于界面下拉框的节假日名称列表
-
-        # 按行解析，支持任意中文数字（一、二、三...十）
-        lines = text.strip().split('\n')
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-
-            # 匹配格式：[中文数字]、[节日名]：[安排文本]
-            holiday_match = re.match(r'^([一二三四五六七八九十]+)、([^：]+)：(.+)$', line)
-            if not holiday_match:
-                continue
-
-            chinese_number, holiday_name, arrangement = holiday_match.groups()
-            holiday_name = holiday_name.strip()
-            arrangement = arrangement.strip()
-
-            # 添加到节假日名称列表（用于界面下拉框）
-            holiday_names_list.append(holiday_name)
-
-            # 分割安排文本：放假日期文本 和 调休文本
-            parts = arrangement.split('。', 1)  # 按第一个句号分割
-            vacation_text = parts[0]
-            adjust_text = parts[1] if len(parts) > 1 else ""
-
-            # 从放假日期文本中提取日期范围
-            vacation_dates = self._extract_vacation_dates(vacation_text, year)
-
-            # 从调休文本中提取上班日（仅当有调休文本时）
-            if adjust_text:
-                work_dates = self._extract_work_days(adjust_text, year)
-                all_work_days.extend(work_dates)
-
-            # 为每个节假日添加假期日期
-            # 注意：这里直接使用原始节日名称，不做映射
-            for date_obj in vacation_dates:
-                all_vacation_days.append((date_obj, holiday_name))
-
-        # 为界面下拉框提供节假日名称
-        self.available_holidays = sorted(list(set(holiday_names_list)))
-
-        # 生成数据字符串
-        for date_obj, holiday_name in all_vacation_days:
-            # 尝试映射到HolidayUtil的标准名称，如果无法映射则跳过
-            name_index = name_to_index.get(holiday_name)
-            if name_index is None:
-                # 尝试常见映射
-                mapping = {
-                    "元旦": "元旦节",
-                    "春节": "春节",
-                    "清明节": "清明节",
-                    "劳动节": "劳动节",
-                    "端午节": "端午节",
-                    "中秋节": "中秋节",
-                    "国庆节": "国庆节",
-                    "国庆节、中秋节": "国庆中秋",
-                    "中秋节、国庆节": "国庆中秋"
-                }
-                name_index = name_to_index.get(mapping.get(holiday_name))
-                if name_index is None:
-                    continue
-
-            day_str = date_obj.strftime("%Y%m%d")
-            target_date_str = day_str
-            data_string += f"{day_str}{name_index}1{target_date_str}"
-
-        # 为每个上班日找到对应的节假日
-        work_to_holiday = {}
-        for work_date in all_work_days:
-            # 查找最近的节假日
-            closest_holiday = None
-            min_distance = float('inf')
-
-            for vac_date, vac_name in all_vacation_days:
-                distance = abs((work_date - vac_date).days)
-                if distance < min_distance and distance <= 30:  # 30天内的上班日才关联
-                    min_distance = distance
-                    closest_holiday = vac_name
-
-            if closest_holiday:
-                work_to_holiday[work_date] = closest_holiday
-
-        for work_date, holiday_name in work_to_holiday.items():
-            # 映射到HolidayUtil的标准名称
-            mapping = {
-                "元旦": "元旦节",
-                "春节": "春节",
-                "清明节": "清明节",
-                "劳动节": "劳动节",
-                "端午节": "端午节",
-                "中秋节": "中秋节",
-                "国庆节": "国庆节",
-                "国庆节、中秋节": "国庆中秋",
-                "中秋节、国庆节": "国庆中秋"
-            }
-            mapped_holiday = mapping.get(holiday_name)
-            if mapped_holiday:
-                name_index = name_to_index.get(mapped_holiday)
-                if name_index is not None:
-                    day_str = work_date.strftime("%Y%m%d")
-                    # 找到对应的假期第一天作为目标日期
-                    target_date_str = None
-                    for vac_date, vac_name in all_vacation_days:
-                        if vac_name == holiday_name:
-                            target_date_str = vac_date.strftime("%Y%m%d")
-                            break
-                    if target_date_str:
-                        data_string += f"{day_str}{name_index}0{target_date_str}"
-
-        return data_string
-
-    def _extract_vacation_dates(self, vacation_text, year):
+        self.selected_cell = None
+        self.drawn_month = None
+        self.holiday_year = None
+        self.panel_ordinal = None
+        self.panel_detail = None
+        self.dirty = RENDER_ALL
+        self.commit_render()
+
+    def setup_shortcuts(self):
+        # 隐藏的诊断浮层，不出现在任何菜单中
+        shortcut = QShortcut(QKeySequence(Qt.CTRL | Qt.SHIFT | Qt.Key_F12), self)
+        shortcut.activated.connect(self.toggle_metrics_overlay)
+
+    def setup_navigation_shortcuts(self):
+        """键盘导航：方向键按天/周，PageUp/PageDown 按月，加 Ctrl 按年，Home 回到今天。
+
+        快捷键只在日历网格获得焦点时生效，下拉框、输入框和列表保留这些按键的原有行为；
+        网格随界面一起重建，快捷键也在这里随之创建。
         """
-        从放假日期文本中提取所有日期
+        bindings = [
+            (Qt.Key_Left, lambda: self.navigate_days(-1)),
+            (Qt.Key_Right, lambda: self.navigate_days(1)),
+            (Qt.Key_Up, lambda: self.navigate_days(-7)),
+            (Qt.Key_Down, lambda: self.navigate_days(7)),
+            (Qt.Key_PageUp, lambda: self.navigate_months(-1)),
+            (Qt.Key_PageDown, lambda: self.navigate_months(1)),
+            (Qt.CTRL | Qt.Key_PageUp, lambda: self.navigate_months(-12)),
+            (Qt.CTRL | Qt.Key_PageDown, lambda: self.navigate_months(12)),
+            (Qt.Key_Home, self.go_to_today),
+        ]
+        for key, handler in bindings:
+            shortcut = QShortcut(QKeySequence(key), self.calendar_page)
+            shortcut.setContext(Qt.WidgetWithChildrenShortcut)
+            shortcut.activated.connect(handler)
+
+    def toggle_metrics_overlay(self):
+        if self.metrics_overlay is None:
+            self.metrics_overlay = MetricsOverlay(self)
+        self.metrics_overlay.setVisible(not self.metrics_overlay.isVisible())
+
+    def navigate_days(self, delta):
+        """按天移动选中日期，只更新目标状态，重绘交给合并定时器"""
+        first = date(MIN_YEAR, 1, 1).toordinal()
+        last = date(MAX_YEAR, 12, 31).toordinal()
+        ordinal = min(max(date(self.year, self.month, self.day).toordinal() + delta, first), last)
+        target = date.fromordinal(ordinal)
+        self.year = target.year
+        self.month = target.month
+        self.day = target.day
+        self.schedule_redraw()
+
+    def navigate_months(self, delta):
+        """按月移动，日期超出目标月份天数时取月末"""
+        self.year, self.month = shift_month(self.year, self.month, delta)
+        self.day = min(self.day, calendar.monthrange(self.year, self.month)[1])
+        self.schedule_redraw()
+
+    def wheelEvent(self, event):
+        """在日历区域滚动滚轮切换月份，触控板的细小增量累积到一格再翻页"""
+        if self.ui_released or not self.right_panel.rect().contains(
+                self.right_panel.mapFrom(self, event.position().toPoint())):
+            super().wheelEvent(event)
+            return
 
-        Args:
-            vacation_text (str): 放假日期文本部分
-            year (int): 年份
+        self.wheel_delta += event.angleDelta().y()
+        steps = int(self.wheel_delta / 120)
+        if steps:
+            self.wheel_delta -= steps * 120
+            self.navigate_months(-steps)
+        event.accept()
+
+    def invalidate(self, flags):
+        """标记需要重新渲染的部分，实际渲染合并到下一次提交"""
+        self.dirty |= flags
+        self.schedule_redraw()
+
+    def schedule_redraw(self):
+        """安排一次合并渲染：同一帧内的多次改动只提交一次"""
+        if self.redraw_timer.isActive():
+            return
+        self.redraw_timer.start(max(0, FRAME_INTERVAL - self.redraw_clock.elapsed()))
 
-        Returns:
-            list: datetime 对象列表
-        """
-        dates = []
-
-        # 清理文本，去掉括号内容和无关描述
-        cleaned_text = re.sub(r'（[^）]*）', '', vacation_text)
-        cleaned_text = re.sub(r'\([^)]*\)', '', cleaned_text)
-        cleaned_text = re.sub(r'放假调休，共\d+天', '', cleaned_text)
-        cleaned_text = re.sub(r'放假，共\d+天', '', cleaned_text)
-
-        # 多种日期格式模式，按优先级排序
-        patterns = [
-            # 跨年格式：2022年12月31日至2023年1月2日
-            (r'(\d{4})年(\d+)月(\d+)日至(\d{4})年(\d+)月(\d+)日', 'cross_year'),
-            # 跨月格式：1月28日至2月4日
-            (r'(\d+)月(\d+)日至(\d+)月(\d+)日', 'cross_month'),
-            # 同月跨日格式：4月4日至6日
-            (r'(\d+)月(\d+)日至(\d+)日', 'same_month'),
-            # 单日格式：1月1日
-            (r'(\d+)月(\d+)日', 'single_day')
-        ]
+    @METRICS.timed
+    def commit_render(self):
+        """把目标日期和失效标记一次性提交到界面，只重做与变化相关的部分"""
+        self.redraw_timer.stop()
+        if self.ui_released:
+            return
+        self.redraw_clock.restart()
 
-        for pattern, pattern_type in patterns:
-            matches = re.findall(pattern, cleaned_text)
-            if not matches:
-                continue
+        dirty = self.dirty
+        self.dirty = 0
+        ordinal = date(self.year, self.month, self.day).toordinal()
 
-            for match in matches:
-                try:
-                    if pattern_type == 'cross_year':
-                        start_date = datetime(int(match[0]), int(match[1]), int(match[2]))
-                        end_date = datetime(int(match[3]), int(match[4]), int(match[5]))
-                    elif pattern_type == 'cross_month':
-                        start_date = datetime(year, int(match[0]), int(match[1]))
-                        end_date = datetime(year, int(match[2]), int(match[3]))
-                    elif pattern_type == 'same_month':
-                        start_date = datetime(year, int(match[0]), int(match[1]))
-                        end_date = datetime(year, int(match[0]), int(match[2]))
-                    elif pattern_type == 'single_day':
-                        start_date = datetime(year, int(match[0]), int(match[1]))
-                        end_date = start_date
-
-                    # 生成日期范围
-                    current_date = start_date
-                    while current_date <= end_date:
-                        if current_date not in dates:  # 避免重复
-                            dates.append(current_date)
-                        current_date += timedelta(days=1)
-
-                except (ValueError, TypeError, IndexError):
-                    continue
-
-            # 如果找到了匹配，就不再尝试其他模式
-            if matches:
-                break
-
-        return sorted(dates)
-
-    def _extract_work_days(self, adjust_text, year):
-        """
-        从调休文本中提取上班日期
+        # 除显式失效外，再根据目标状态与已呈现状态的差异补充标记
+        if (self.year, self.month) != self.drawn_month:
+            dirty |= RENDER_GRID
+        if self.year != self.holiday_year:
+            dirty |= RENDER_HOLIDAYS
+        if ordinal != self.panel_ordinal:
+            dirty |= RENDER_LEFT_PANEL
 
-        Args:
-            adjust_text (str): 调休文本部分
-            year (int): 年份
+        if dirty & RENDER_GRID:
+            self.update_combo_boxes()
+            self.draw_calendar()
+        if not self.selected_cell or self.selected_cell.ordinal != ordinal:
+            dirty |= RENDER_SELECTION
 
-        Returns:
-            list: datetime 对象列表
-        """
-        work_dates = []
+        if dirty & RENDER_HOLIDAYS:
+            self.update_holiday_combo()
+        if dirty & RENDER_SELECTION:
+            self.update_selection(ordinal)
+        if dirty & RENDER_LEFT_PANEL:
+            self.update_left_panel()
+
+    def load_month_days(self, year, month):
+        days = self.month_store.get(year, month)
+        if self.month_store.pending and not self.month_store_timer.isActive():
+            self.month_store_timer.start()
+        return days
+
+    def ensure_ui(self):
+        """若界面已在低内存模式下释放，则重新创建"""
+        if self.ui_released:
+            self.ui_released = False
+            self.build_ui()
+
+    def release_ui(self):
+        """释放隐藏窗口的控件和各类缓存，下次显示时重建"""
+        if self.ui_released or self.isVisible():
+            return
 
-        # 清理文本，去掉最后的句号
-        cleaned_text = adjust_text.rstrip('。')
+        self.takeCentralWidget().deleteLater()
+        self.day_cells.clear()
+        self.selected_cell = None
+        self.holiday_dates.clear()
+        for cache in self.month_caches.values():
+            cache.clear()
+        self.month_store_timer.stop()
+        self.save_month_stores()
+        self.month_store.close()
+        self.detail_cache.clear()
+        self.event_cache.clear()
+        self.themed_widgets = []
+        # 托盘只需要保留今天的图标
+        today = self.clock.today_date().day
+        self.tray_pixmaps = {day: pixmap for day, pixmap in self.tray_pixmaps.items() if day == today}
+        if self.tray_popup:
+            self.tray_popup.deleteLater()
+            self.tray_popup = None
+        # lunar_python 内部缓存了最近一次计算的农历年
+        LunarYear._LunarYear__CACHE_YEAR = None
+        self.ui_released = True
+
+        # 等待 deleteLater 执行完毕后再回收，并把空闲堆内存归还给系统
+        QTimer.singleShot(1000, self.trim_process_memory)
+
+    def trim_process_memory(self):
+        gc.collect()
+        try:
+            ctypes.CDLL("libc.so.6").malloc_trim(0)
+        except (OSError, AttributeError):
+            pass # 非 glibc 平台
+
+    def is_low_memory_enabled(self):
+        """检查是否启用了隐藏后释放内存"""
+        return self.settings.value("low_memory_mode", True, type=bool)
+
+    def toggle_low_memory_mode(self, enabled):
+        """切换低内存模式"""
+        self.settings.setValue("low_memory_mode", enabled)
+        if not enabled:
+            self.release_timer.stop()
+
+    def is_day_table_enabled(self):
+        """检查是否启用了列式日表，没有安装 NumPy 时始终为否"""
+        return np is not None and self.settings.value("day_table", False, type=bool)
+
+    def toggle_day_table(self, enabled):
+        """切换列式日表；表中数据与逐日计算的结果相同，已缓存的月份无需重算"""
+        self.settings.setValue("day_table", enabled)
+        if enabled:
+            self.start_day_table(interactive=True)
+        else:
+            if self.day_table_worker:
+                self.day_table_worker.requestInterruption()
+            DAY_TABLE.close()
 
-        # 先尝试直接匹配包含"上班"的日期
-        direct_patterns = [
-            r'(\d+)月(\d+)日（?(?:星期|周)?[一二三四五六日日]?）?\s*上班',
-            r'(\d+)月(\d+)日\([^)]*\)\s*上班',
-            r'(\d+)月(\d+)日（[^）]*）\s*上班',
-            r'(\d+)月(\d+)日\s*上班'
-        ]
+    def start_day_table(self, interactive):
+        """加载列式日表，尚未建立时在后台用进程池建立；interactive 为真时显示进度并允许取消"""
+        if self.day_table_worker is not None or DAY_TABLE.load():
+            return
 
-        for pattern in direct_patterns:
-            matches = re.findall(pattern, cleaned_text)
-            for month, day in matches:
-                try:
-                    work_date = datetime(year, int(month), int(day))
-                    if work_date not in work_dates:  # 避免重复
-                        work_dates.append(work_date)
-                except (ValueError, TypeError, IndexError):
-                    continue
-
-        # 然后处理"X月X日（周X）、X月X日上班"这种格式
-        # 将文本按逗号分割，检查每段是否包含上班信息
-        parts = re.split(r'[，、]', cleaned_text)
-        for i, part in enumerate(parts):
-            part = part.strip()
-            if not part:
-                continue
+        self.day_table_worker = DayTableWorker(DAY_TABLE, self)
+        self.day_table_worker.succeeded.connect(DAY_TABLE.load)
+        self.day_table_worker.finished.connect(self.on_day_table_worker_finished)
+        if interactive:
+            progress = QProgressDialog("正在建立列式日表…", "取消", 0,
+                                       DAY_TABLE_LAST_YEAR - DAY_TABLE_FIRST_YEAR + 1, self)
+            progress.setMinimumDuration(300)
+            self.day_table_worker.progress.connect(progress.setValue)
+            progress.canceled.connect(self.cancel_day_table)
+            self.day_table_worker.finished.connect(progress.close)
+            self.day_table_worker.failed.connect(
+                lambda message: QMessageBox.critical(self, "错误", f"建立列式日表时发生错误：\n{message}"))
+        self.day_table_worker.start()
+
+    def cancel_day_table(self):
+        self.toggle_day_table(False)
+        if self.day_table_action:
+            self.day_table_action.setChecked(False)
+
+    def on_day_table_worker_finished(self):
+        self.day_table_worker = None
+        # 建立期间又被关闭时丢弃刚加载的表
+        if not self.is_day_table_enabled():
+            DAY_TABLE.close()
+
+    def schedule_release(self):
+        """窗口隐藏后开始计时，超时即进入低内存模式"""
+        if not self.is_low_memory_enabled():
+            return
+        delay = self.settings.value("low_memory_delay", DEFAULT_LOW_MEMORY_DELAY, type=int)
+        self.release_timer.start(max(delay, 0) * 1000)
 
-            # 如果当前部分包含"上班"，已经处理过了
-            if '上班' in part:
+    def save_user_holidays(self, updates):
+        """把 {年份: 数据串} 合并写入用户假期文件，返回文件路径"""
+        holidays_file = user_holidays_path(self.holiday_region.key)
+        user_data = {}
+        try:
+            with open(holidays_file, "r") as f:
+                existing_data = json.load(f)
+                if isinstance(existing_data, dict):
+                    user_data = existing_data
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+        for year, data_str in updates.items():
+            user_data[str(year)] = data_str
+        if self.holiday_region.extends_names:
+            user_data["names"] = self.holiday_region.names
+
+        # 先写临时文件再替换，其他实例的文件监视不会读到写了一半的内容
+        temp_file = f"{holidays_file}.tmp"
+        with open(temp_file, "w") as f:
+            json.dump(user_data, f, ensure_ascii=False, indent=4)
+        os.replace(temp_file, holidays_file)
+        return holidays_file
+
+    def watch_user_holidays(self):
+        """监视配置目录与各地区的用户假期文件；文件被替换后监视会失效，每次重新读取前重新加入"""
+        paths = [CONFIG_DIR] + [user_holidays_path(key) for key, _ in HOLIDAY_REGIONS]
+        watched = set(self.holidays_watcher.files() + self.holidays_watcher.directories())
+        missing = [path for path in paths if path not in watched and os.path.exists(path)]
+        if missing:
+            self.holidays_watcher.addPaths(missing)
+
+    def schedule_holidays_reload(self, path):
+        self.holidays_reload_timer.start()
+
+    def reload_user_holidays(self):
+        """重新读取用户假期文件：只重新编译变化的年份，只丢弃受影响月份的缓存，
+        只有当前显示的月份或年份受影响时才重绘"""
+        self.holidays_reload_timer.stop()
+        self.watch_user_holidays()
+        for key, _ in HOLIDAY_REGIONS:
+            days = self.holiday_regions.reload_user_holidays(key)
+            if not days:
+                continue
+            months = {(day.year, day.month) for day in days}
+            store = self.month_stores[key]
+            if store is self.month_store:
+                self.month_store_timer.stop()
+            store.invalidate({year * 12 + month - 1 for year, month in months})
+            self.month_caches[key].discard(months)
+            if key != self.holiday_region.key:
                 continue
 
-            # 如果当前部分不包含"上班"，但下一部分包含"上班"，
-            # 那么当前部分可能也是上班日
-            if i + 1 < len(parts) and '上班' in parts[i + 1]:
-                # 尝试从当前部分提取日期
-                date_pattern = r'(\d+)月(\d+)日（?(?:星期|周)?[一二三四五六日日]?）?'
-                matches = re.findall(date_pattern, part)
-                for month, day in matches:
-                    try:
-                        work_date = datetime(year, int(month), int(day))
-                        if work_date not in work_dates:  # 避免重复
-                            work_dates.append(work_date)
-                    except (ValueError, TypeError, IndexError):
-                        continue
+            if self.month_store.pending:
+                self.month_store_timer.start()
+            flags = 0
+            if (self.year, self.month) in months:
+                flags |= RENDER_GRID
+            if any(year == self.year for year, _ in months):
+                flags |= RENDER_HOLIDAYS
+            if flags:
+                self.invalidate(flags)
+            if self.tray_popup and self.tray_popup.isVisible() and (self.tray_popup.year, self.tray_popup.month) in months:
+                self.tray_popup.update()
+            if self.clock.today_date() in days:
+                self.update_tray_icon()
+
+    def on_import_file_clicked(self):
+        path, _ = QFileDialog.getOpenFileName(self, "导入假期文件", "", "假期数据 (*.ics *.csv);;所有文件 (*)")
+        if not path:
+            return
+
+        try:
+            with open(path, "r", encoding="utf-8-sig", newline="") as f:
+                if path.lower().endswith(".ics"):
+                    records = iter_ics_holiday_records(f)
+                else:
+                    records = iter_csv_holiday_records(f)
+                compiled, skipped = compile_holiday_records(
+                    records, self.holiday_region.names, self.holiday_region.extends_names)
+
+            if not compiled:
+                QMessageBox.warning(self, "失败", "未能从文件中解析出有效的假期数据。")
+                return
 
-        return sorted(work_dates)
+            holidays_file = self.save_user_holidays(compiled)
+            self.reload_user_holidays()
+
+            years = "、".join(str(year) for year in sorted(compiled))
+            message = f"成功为 {years} 年导入并保存了假期数据。"
+            if skipped:
+                message += f"\n\n有 {skipped} 条记录的假期名称无法识别，已跳过。"
+            QMessageBox.information(self, "成功", f"{message}\n\n文件已保存至：{os.path.abspath(holidays_file)}")
+
+        except (OSError, UnicodeDecodeError, ValueError) as e:
+            QMessageBox.critical(self, "错误", f"读取或保存数据时发生错误：\n{e}")
 
     def on_import_holidays_clicked(self):
-        dialog = ImportDialog(self, self.year)
+        dialog = ImportDialog(self, self.year, self.theme)
         if dialog.exec():
             year, text = dialog.get_data()
             if not text.strip():
@@ -429,30 +1174,19 @@ class MainWindow(QMainWindow):
                 return
             
             try:
-                data_str = self.parse_holiday_text(year, text)
+                preview = dialog.final_preview()
+                data_str = preview.data
                 if not data_str:
-                    QMessageBox.warning(self, "失败", "未能从文本中解析出有效的假期数据。")
+                    QMessageBox.warning(self, "失败", "\n".join(["未能从文本中解析出有效的假期数据。"] + preview.problems))
                     return
 
-                holidays_file = self._get_user_holidays_path()
-                user_data = {}
-                try:
-                    with open(holidays_file, "r") as f:
-                        existing_data = json.load(f)
-                        if isinstance(existing_data, dict):
-                            user_data = existing_data
-                except (FileNotFoundError, json.JSONDecodeError):
-                    pass
-
-                user_data[str(year)] = data_str
+                holidays_file = self.save_user_holidays({year: data_str})
 
-                with open(holidays_file, "w") as f:
-                    json.dump(user_data, f, ensure_ascii=False, indent=4)
-
-                # Apply the new data to the current session and refresh
-                HolidayUtil.fix(None, data_str)
-                self.update_holiday_combo()
-                self.draw_calendar()
+                # 与其他实例修改文件时一样，只重新编译变化的年份并刷新
+                self.reload_user_holidays()
+                # 导入的数据生效后，才让界面下拉框改用导入的节假日名称
+                self.available_holidays = preview.names
+                self.invalidate(RENDER_HOLIDAYS)
 
                 QMessageBox.information(self, "成功", f"成功为 {year} 年导入并保存了假期数据。\n\n文件已保存至：{os.path.abspath(holidays_file)}")
 
@@ -462,10 +1196,86 @@ class MainWindow(QMainWindow):
 
 
 
+    def on_export_pages_clicked(self):
+        dialog = MonthExportDialog(self, self.year, self.month)
+        if not dialog.exec():
+            return
+
+        months, as_pdf = dialog.get_data()
+        first, last = months[0], months[-1]
+        name = f"万年历_{first[0]}-{first[1]:02d}" + (f"_{last[0]}-{last[1]:02d}" if len(months) > 1 else "")
+        if as_pdf:
+            path, _ = QFileDialog.getSaveFileName(self, "导出月历", f"{name}.pdf", "PDF 文件 (*.pdf)")
+        else:
+            path, _ = QFileDialog.getSaveFileName(self, "导出月历", f"{name}.png", "PNG 图片 (*.png)")
+        if not path:
+            return
+
+        # 先在进程池中计算各月数据，再逐页并行绘制，进度按两个阶段累计
+        progress = QProgressDialog("正在导出月历…", "取消", 0, len(months) * 2, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(300)
+
+        self.page_export_worker = MonthPageExportWorker(path, months, as_pdf, self.themes["light"], self)
+        self.page_export_worker.progress.connect(progress.setValue)
+        progress.canceled.connect(self.page_export_worker.requestInterruption)
+        self.page_export_worker.finished.connect(progress.close)
+        self.page_export_worker.succeeded.connect(
+            lambda paths: QMessageBox.information(
+                self, "成功", f"月历已导出至：\n{os.path.abspath(paths[0])}" +
+                (f"\n等 {len(paths)} 个文件" if len(paths) > 1 else "")))
+        self.page_export_worker.failed.connect(
+            lambda message: QMessageBox.critical(self, "错误", f"导出月历时发生错误：\n{message}"))
+        self.page_export_worker.cancelled.connect(
+            lambda: QMessageBox.information(self, "已取消", "已取消导出月历，没有保存任何文件。"))
+        self.page_export_worker.start()
+
+    def on_export_ics_clicked(self):
+        dialog = ExportDialog(self, self.year)
+        if not dialog.exec():
+            return
+
+        start_year, end_year, options = dialog.get_data()
+        path, _ = QFileDialog.getSaveFileName(self, "导出日历", f"万年历_{start_year}-{end_year}.ics",
+                                              "iCalendar 文件 (*.ics)")
+        if not path:
+            return
+
+        progress = QProgressDialog("正在导出日历…", "取消", start_year, end_year + 1, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(300)
+
+        self.export_worker = IcsExportWorker(path, start_year, end_year, options, self)
+        self.export_worker.progress.connect(progress.setValue)
+        progress.canceled.connect(self.export_worker.requestInterruption)
+        self.export_worker.finished.connect(progress.close)
+        self.export_worker.succeeded.connect(
+            lambda: QMessageBox.information(self, "成功", f"日历已导出至：\n{os.path.abspath(path)}"))
+        self.export_worker.failed.connect(
+            lambda message: QMessageBox.critical(self, "错误", f"导出日历时发生错误：\n{message}"))
+        self.export_worker.start()
+
+    def on_yiji_search_clicked(self):
+        if self.yiji_dialog is None:
+            self.yiji_dialog = YiJiSearchDialog(self.yiji_index, self)
+            self.yiji_dialog.day_activated.connect(self.open_date)
+        self.yiji_dialog.show()
+        self.yiji_dialog.raise_()
+        self.yiji_dialog.activateWindow()
+
+    def on_convert_clicked(self):
+        if self.convert_dialog is None:
+            self.convert_dialog = ConvertDialog(self, self.year)
+        self.convert_dialog.show()
+        self.convert_dialog.raise_()
+        self.convert_dialog.activateWindow()
+
     def setup_left_panel(self):
         self.left_panel = QWidget()
         self.left_panel.setFixedWidth(350)
         self.left_panel.setObjectName("left_panel")
+        self.left_panel.setAutoFillBackground(True)
+        self.themed_widgets.append((self.left_panel, "panel"))
         layout = QVBoxLayout(self.left_panel)
         layout.setContentsMargins(20, 20, 20, 20)
         layout.setAlignment(Qt.AlignTop)
@@ -476,6 +1286,7 @@ class MainWindow(QMainWindow):
         self.details_lunar_weekday_label = QLabel()
         self.details_ganzhi_label = QLabel()
         self.details_festivals_label = QLabel()
+        self.details_events_label = QLabel()
         self.details_yi_label = QLabel()
         self.details_ji_label = QLabel()
 
@@ -485,17 +1296,40 @@ class MainWindow(QMainWindow):
         self.details_lunar_weekday_label.setObjectName("details_lunar_weekday_label")
         self.details_ganzhi_label.setObjectName("details_ganzhi_label")
         self.details_festivals_label.setObjectName("details_festivals_label")
+        self.details_events_label.setObjectName("details_events_label")
         self.details_yi_label.setObjectName("details_yi_label")
         self.details_ji_label.setObjectName("details_ji_label")
 
         # --- Configure Label Properties ---
         self.details_festivals_label.setWordWrap(True)
+        self.details_events_label.setWordWrap(True)
         self.details_yi_label.setWordWrap(True)
         self.details_ji_label.setWordWrap(True)
         
-        for label in [self.details_year_month_label, self.details_day_display, self.details_lunar_weekday_label, self.details_ganzhi_label, self.details_festivals_label]:
+        for label in [self.details_year_month_label, self.details_day_display, self.details_lunar_weekday_label, self.details_ganzhi_label, self.details_festivals_label, self.details_events_label]:
             label.setAlignment(Qt.AlignCenter)
 
+        # --- Fonts & Palettes ---
+        fonts = self.theme.fonts
+        for label, font_key, role in [
+            (self.details_year_month_label, "year_month", "text"),
+            (self.details_day_display, "day_display", "text"),
+            (self.details_lunar_weekday_label, "lunar_weekday", "secondary"),
+            (self.details_ganzhi_label, "ganzhi", "muted"),
+            (self.details_festivals_label, "festivals", "secondary"),
+            (self.details_events_label, "festivals", "text"),
+            (self.details_yi_label, "yi_ji", "text"),
+            (self.details_ji_label, "yi_ji", "text"),
+        ]:
+            label.setFont(fonts[font_key])
+            self.themed_widgets.append((label, role))
+
+        # 与 DayDetail 字段一一对应
+        self.detail_labels = [
+            self.details_year_month_label, self.details_day_display, self.details_lunar_weekday_label,
+            self.details_ganzhi_label, self.details_festivals_label, self.details_yi_label, self.details_ji_label,
+        ]
+
         # --- Layout ---
         layout.addWidget(self.details_year_month_label)
         layout.addSpacing(5)
@@ -506,18 +1340,23 @@ class MainWindow(QMainWindow):
         layout.addWidget(self.details_ganzhi_label)
         layout.addSpacing(15)
         layout.addWidget(self.details_festivals_label)
-        layout.addSpacing(25)
+        layout.addSpacing(10)
+        layout.addWidget(self.details_events_label)
+        layout.addSpacing(15)
 
         # Yi/Ji Section
         yi_ji_layout = QGridLayout()
         yi_ji_layout.setColumnStretch(1, 1)
         
-        yi_icon = QLabel("宜")
-        ji_icon = QLabel("忌")
+        yi_icon = BadgeLabel("宜")
+        ji_icon = BadgeLabel("忌")
         yi_icon.setObjectName("yi_icon")
         ji_icon.setObjectName("ji_icon")
-        yi_icon.setAlignment(Qt.AlignCenter)
-        ji_icon.setAlignment(Qt.AlignCenter)
+        for icon, role in [(yi_icon, "yi"), (ji_icon, "ji")]:
+            icon.setAlignment(Qt.AlignCenter)
+            icon.setFont(fonts["badge"])
+            icon.setMinimumSize(30, 30)
+            self.themed_widgets.append((icon, role))
 
         yi_ji_layout.addWidget(yi_icon, 0, 0)
         yi_ji_layout.addWidget(self.details_yi_label, 0, 1)
@@ -539,11 +1378,22 @@ class MainWindow(QMainWindow):
 
         controls_layout = QHBoxLayout()
         self.year_combo = QComboBox()
-        self.year_combo.addItems([str(y) for y in range(1901, 2101)])
+        self.year_combo.setModel(YearListModel(self.year_combo))
+        # 避免按内容计算宽度时遍历所有年份
+        self.year_combo.setSizeAdjustPolicy(QComboBox.AdjustToMinimumContentsLengthWithIcon)
+        self.year_combo.setMinimumContentsLength(len(str(MAX_YEAR)))
+        self.year_combo.view().setUniformItemSizes(True)
         self.month_combo = QComboBox()
         self.month_combo.addItems([str(m) for m in range(1, 13)])
+        self.region_combo = QComboBox()
+        for key, label in HOLIDAY_REGIONS:
+            self.region_combo.addItem(label, key)
+        self.region_combo.setCurrentIndex(self.region_combo.findData(self.holiday_region.key))
         self.holiday_combo = QComboBox()
         self.import_button = QPushButton("导入假期")
+        self.export_button = QPushButton("导出日历")
+        self.yiji_button = QPushButton("择日")
+        self.convert_button = QPushButton("换算")
         self.today_button = QPushButton("今天")
 
         controls_layout.addWidget(self.year_combo)
@@ -551,166 +1401,197 @@ class MainWindow(QMainWindow):
         controls_layout.addWidget(self.month_combo)
         controls_layout.addWidget(QLabel("月"))
         controls_layout.addSpacing(20)
+        controls_layout.addWidget(self.region_combo)
         controls_layout.addWidget(self.holiday_combo)
         controls_layout.addStretch()
         controls_layout.addWidget(self.import_button)
+        controls_layout.addWidget(self.export_button)
+        controls_layout.addWidget(self.yiji_button)
+        controls_layout.addWidget(self.convert_button)
         controls_layout.addWidget(self.today_button)
 
-        self.calendar_grid = QGridLayout()
+        # 日历网格放在可获得焦点的容器中，点击日期格后焦点落在这里，键盘导航随之生效
+        self.calendar_page = QWidget()
+        self.calendar_page.setFocusPolicy(Qt.StrongFocus)
+        self.calendar_grid = QGridLayout(self.calendar_page)
+        self.calendar_grid.setContentsMargins(0, 0, 0, 0)
         self.calendar_grid.setSpacing(0)
         days_of_week = ["日", "一", "二", "三", "四", "五", "六"]
         for i, day in enumerate(days_of_week):
             header = QLabel(day)
             header.setAlignment(Qt.AlignCenter)
-            header.setStyleSheet("padding: 10px; font-weight: bold;")
-            if i == 0 or i == 6:
-                header.setStyleSheet("padding: 10px; font-weight: bold; color: #e13844;")
+            header.setMargin(10)
+            header.setFont(self.theme.fonts["week_header"])
+            self.themed_widgets.append((header, "festival" if i == 0 or i == 6 else "text"))
             self.calendar_grid.addWidget(header, 0, i)
 
         right_layout.addLayout(controls_layout)
-        right_layout.addLayout(self.calendar_grid)
+        right_layout.addWidget(self.calendar_page)
         return right_panel
 
     def setup_styles(self):
-        qss = """
-            QMainWindow { background-color: #f8f9fa; }
-            #left_panel { 
-                background-color: #fff; 
-                border-right: 1px solid #dee2e6; 
-            }
-
-            /* Left Panel Details */
-            #details_year_month_label {
-                font-size: 18px;
-                color: #333;
-            }
-            #details_day_display { 
-                font-size: 90pt; 
-                font-weight: 500; 
-                color: #333;
-                line-height: 1;
-            }
-            #details_lunar_weekday_label {
-                font-size: 16px;
-                color: #555;
-            }
-            #details_ganzhi_label {
-                font-size: 13px;
-                color: #888;
-            }
-            #details_festivals_label {
-                font-size: 14px;
-                color: #555;
-                font-weight: bold;
-            }
-            #yi_icon, #ji_icon {
-                font-size: 14px;
-                font-weight: bold;
-                color: white;
-                border-radius: 4px;
-                padding: 4px;
-                min-width: 22px;
-                min-height: 22px;
-            }
-            #yi_icon { background-color: #3498db; }
-            #ji_icon { background-color: #e74c3c; }
-            
-            #details_yi_label, #details_ji_label {
-                font-size: 14px;
-                color: #333;
-            }
-
-            /* Calendar Grid */
-            DayCell {
-                background-color: #fff;
-                border: 1px solid #f1f1f1;
-            }
-            DayCell:hover { 
-                border: 1px solid #4E6EF2; 
-            }
-            DayCell[is_selected="true"] {
-                background-color: #e0e8ff;
-                border: 1px solid #4E6EF2;
-            }
-            DayCell[is_today="true"] #solar_label {
-                background-color: #4E6EF2;
-                color: white;
-                border-radius: 10px;
-            }
-
-            DayCell #solar_label { font-size: 18pt; font-weight: bold; padding: 2px;}
-            DayCell #major_festival_label { color: #e13844; font-size: 9pt; font-weight: bold; }
-            DayCell #lunar_label { color: #888; font-size: 10pt; }
-            DayCell #holiday_label { font-size: 9pt; font-weight: bold; padding: 2px; }
-
-            DayCell[is_rest="true"] #solar_label { color: #e13844; }
-            DayCell[is_rest="true"] #holiday_label { color: #28a745; }
-            DayCell[is_work="true"] #holiday_label { color: #888; }
-        """
-        self.app.setStyleSheet(qss)
+        """应用当前主题的预编译调色板和字体，界面中不再使用 QSS"""
+        self.apply_theme(self.theme)
+
+    def apply_theme(self, theme):
+        """切换到另一套预编译主题，只替换调色板，不重新解析样式"""
+        self.theme = theme
+        self.app.setPalette(theme.app_palette)
+        if self.tray_popup:
+            self.tray_popup.theme = theme
+        if self.ui_released:
+            return
 
+        for widget, role in self.themed_widgets:
+            widget.setPalette(theme.palettes[role])
+        for cell in self.day_cells.values():
+            cell.apply_theme(theme)
+
+    def save_month_stores(self):
+        """保存所有地区新算出的月份；用户假期文件变化后，未生效地区保留下来的月份也在其中"""
+        for store in self.month_stores.values():
+            store.save()
+
+    def activate_holiday_region(self, key):
+        """切换 HolidayUtil 使用的假期数据以及对应地区的月份缓存"""
+        self.holiday_region = self.holiday_regions.activate(key)
+        self.month_store = self.month_stores[self.holiday_region.key]
+        self.month_cache = self.month_caches[self.holiday_region.key]
+        if self.tray_popup:
+            self.tray_popup.month_cache = self.month_cache
+
+    def on_region_selected(self, index):
+        key = self.region_combo.itemData(index)
+        if key == self.holiday_region.key:
+            return
+        # 当前地区新算出的月份先写盘，之后的计算都属于新地区
+        self.month_store_timer.stop()
+        self.month_store.save()
+        self.settings.setValue("holiday_region", key)
+        self.activate_holiday_region(key)
+        self.update_tray_icon()
+        self.invalidate(RENDER_GRID | RENDER_HOLIDAYS)
+
+    def is_dark_theme_enabled(self):
+        """检查是否使用深色主题"""
+        return self.settings.value("theme", "light") == "dark"
+
+    def toggle_dark_theme(self, enabled):
+        """切换深色/浅色主题"""
+        name = "dark" if enabled else "light"
+        self.settings.setValue("theme", name)
+        self.apply_theme(self.themes[name])
+
+    @METRICS.timed
     def draw_calendar(self):
+        """重建日历网格，选中状态和左侧面板由渲染管线单独更新"""
         for i in reversed(range(self.calendar_grid.count())):
             row, _, _, _ = self.calendar_grid.getItemPosition(i)
             if row > 0:
                 item = self.calendar_grid.takeAt(i)
                 if item and item.widget():
                     item.widget().deleteLater()
+        self.day_cells.clear()
+        self.selected_cell = None
 
-        month_data = SolarMonth.fromYm(self.year, self.month)
-        if not month_data: return
+        days = self.month_cache.get(self.year, self.month)
+        if not days: return
+        self.drawn_month = (self.year, self.month)
 
-        days = month_data.getDays()
-        start_col = days[0].getWeek()
+        start_col = days[0].week
+        today = self.clock.today()
+        events = self.event_cache.get(self.year, self.month)
 
         row = 1
         col = start_col
         for day in days:
-            cell = DayCell(day)
+            cell = DayCell(day, today, self.theme)
             cell.day_clicked.connect(self.on_day_selected)
+            if day.ordinal in events:
+                cell.set_events(events[day.ordinal])
+            cell.setContextMenuPolicy(Qt.CustomContextMenu)
+            cell.customContextMenuRequested.connect(lambda pos, cell=cell: self.show_day_menu(cell, pos))
             self.calendar_grid.addWidget(cell, row, col)
+            self.day_cells[cell.ordinal] = cell
             col += 1
             if col > 6:
                 col = 0
                 row += 1
-        
-        self.on_day_selected(Solar.fromYmd(self.year, self.month, self.day))
 
-    def on_day_selected(self, solar_day, cell=None):
+    @METRICS.timed
+    def on_day_selected(self, solar_day):
+        if (solar_day.getYear(), solar_day.getMonth(), solar_day.getDay()) == (self.year, self.month, self.day):
+            return # 点击的是当前选中的日期
         self.year = solar_day.getYear()
         self.month = solar_day.getMonth()
         self.day = solar_day.getDay()
+        self.schedule_redraw()
 
+    def update_selection(self, ordinal):
         if self.selected_cell:
             self.selected_cell.set_selected(False)
-        
-        if not cell:
-            for i in range(self.calendar_grid.count()):
-                widget = self.calendar_grid.itemAt(i).widget()
-                if isinstance(widget, DayCell) and widget.solar_day and widget.solar_day.toYmd() == solar_day.toYmd():
-                    cell = widget
-                    break
-        
+            self.selected_cell = None
+
+        cell = self.day_cells.get(ordinal)
         if cell:
             cell.set_selected(True)
             self.selected_cell = cell
 
-        # Update left panel
-        lunar_day = solar_day.getLunar()
-        
-        self.details_year_month_label.setText(f"{solar_day.getYear()}年{solar_day.getMonth()}月")
-        self.details_day_display.setText(str(solar_day.getDay()))
-        self.details_lunar_weekday_label.setText(f"{lunar_day.getMonthInChinese()}月{lunar_day.getDayInChinese()} 星期{solar_day.getWeekInChinese()}")
-        self.details_ganzhi_label.setText(f"{lunar_day.getYearInGanZhi()}年 {lunar_day.getMonthInGanZhi()}月 {lunar_day.getDayInGanZhi()}日 【属{lunar_day.getYearShengXiao()}】")
-
-        festivals = lunar_day.getFestivals() + solar_day.getFestivals() + solar_day.getOtherFestivals()
-        festivals = list(dict.fromkeys(festivals))
-        self.details_festivals_label.setText(" ".join(festivals) or "")
-        
-        self.details_yi_label.setText(" ".join(lunar_day.getDayYi()))
-        self.details_ji_label.setText(" ".join(lunar_day.getDayJi()))
+    @METRICS.timed
+    def update_left_panel(self):
+        self.panel_ordinal = date(self.year, self.month, self.day).toordinal()
+        detail = self.detail_cache.get(self.year, self.month, self.day)
+
+        # 只更新文字有变化的标签，避免自动换行标签在每次点击时重新布局
+        previous = self.panel_detail or (None,) * len(detail)
+        for label, text, old_text in zip(self.detail_labels, detail, previous):
+            if text != old_text:
+                label.setText(text)
+        self.panel_detail = detail
+
+        events = self.event_cache.get(self.year, self.month).get(self.panel_ordinal, ())
+        events_text = "日程：" + "、".join(event.title for event in events) if events else ""
+        if events_text != self.details_events_label.text():
+            self.details_events_label.setText(events_text)
+
+    def show_day_menu(self, cell, pos):
+        """格子右键菜单：添加日程或删除当天的日程"""
+        info = cell.info
+        menu = QMenu(self)
+        menu.addAction("添加日程…", lambda: self.add_event(info.year, info.month, info.day))
+        if cell.events:
+            menu.addSeparator()
+            for event in cell.events:
+                menu.addAction(f"删除日程：{event.title}", lambda event_id=event.id: self.delete_event(event_id))
+        menu.exec(cell.mapToGlobal(pos))
+
+    def add_event(self, year, month, day):
+        dialog = EventDialog(self, year, month, day)
+        if dialog.exec() != QDialog.Accepted:
+            return
+        title, *fields = dialog.get_event()
+        if not title:
+            QMessageBox.warning(self, "提示", "日程标题不能为空。")
+            return
+        self.event_store.add_event(title, *fields)
+        self.on_events_changed()
+
+    def delete_event(self, event_id):
+        self.event_store.delete_event(event_id)
+        self.on_events_changed()
 
+    def on_events_changed(self):
+        self.event_cache.clear()
+        self.reminders.reload()
+        self.invalidate(RENDER_GRID | RENDER_LEFT_PANEL)
+
+    def show_reminder(self, title):
+        if self.tray_icon:
+            self.tray_icon.showMessage("日程提醒", title, QSystemTrayIcon.Information, 10000)
+
+    @METRICS.timed
     def update_holiday_combo(self):
+        self.holiday_year = self.year
         self.holiday_combo.blockSignals(True)
         self.holiday_combo.clear()
         self.holiday_dates.clear()
@@ -771,44 +1652,30 @@ class MainWindow(QMainWindow):
             self.year = solar_day.getYear()
             self.month = solar_day.getMonth()
             self.day = solar_day.getDay()
-            self.update_combo_boxes()
-            self.draw_calendar()
-
+            self.schedule_redraw()
 
     def on_date_change(self):
-        old_year = self.year
-        self.year = int(self.year_combo.currentText())
+        self.year = MIN_YEAR + self.year_combo.currentIndex()
         self.month = int(self.month_combo.currentText())
         self.day = 1
-        if old_year != self.year:
-            self.update_holiday_combo()
-        self.draw_calendar()
+        self.schedule_redraw()
 
     def go_to_today(self):
         # 强制跳转到当前日期
-        today = datetime.now()
+        today = self.clock.today_date()
         self.year = today.year
         self.month = today.month
         self.day = today.day
-        self.update_combo_boxes()
-        self.draw_calendar()
+        self.schedule_redraw()
 
     def update_combo_boxes(self):
-        old_year = int(self.year_combo.currentText())
-        year_changed = self.year != old_year
-
-        if year_changed or self.month != int(self.month_combo.currentText()):
-            self.year_combo.blockSignals(True)
-            self.month_combo.blockSignals(True)
-            self.year_combo.setCurrentText(str(self.year))
-            self.month_combo.setCurrentText(str(self.month))
-            self.year_combo.blockSignals(False)
-            self.month_combo.blockSignals(False)
-            
-            if year_changed:
-                self.update_holiday_combo()
-
-            self.draw_calendar()
+        """让年月下拉框与目标日期一致，不触发 on_date_change"""
+        self.year_combo.blockSignals(True)
+        self.month_combo.blockSignals(True)
+        self.year_combo.setCurrentIndex(self.year - MIN_YEAR)
+        self.month_combo.setCurrentText(str(self.month))
+        self.year_combo.blockSignals(False)
+        self.month_combo.blockSignals(False)
 
     def setup_system_tray(self):
         """初始化系统托盘"""
@@ -817,20 +1684,9 @@ class MainWindow(QMainWindow):
             print("系统不支持系统托盘")
             return
 
-        # 获取应用程序图标
-        icon_path = os.path.join(os.path.dirname(__file__), "icon.png")
-        if not os.path.exists(icon_path):
-            print("找不到图标文件")
-            return
-
-        icon = QIcon(icon_path)
-        if icon.isNull():
-            print("无法加载图标")
-            return
-
-        # 创建系统托盘图标
-        self.tray_icon = QSystemTrayIcon(icon, self)
-        self.tray_icon.setToolTip("万年历本地版")
+        # 创建系统托盘图标，图标和提示显示今天的日期信息
+        self.tray_icon = QSystemTrayIcon(self)
+        self.update_tray_icon()
 
         # 创建托盘菜单
         self.create_tray_menu()
@@ -841,6 +1697,67 @@ class MainWindow(QMainWindow):
         # 显示托盘图标
         self.tray_icon.show()
 
+    def update_tray_icon(self):
+        """按今天的日期更新托盘图标和提示文字，仅在跨天时调用"""
+        if not self.tray_icon:
+            return
+        today = self.clock.today_date()
+        self.tray_icon.setIcon(QIcon(self.render_tray_pixmap(today.day)))
+        self.tray_icon.setToolTip(self.build_tray_tooltip(today))
+
+    def render_tray_pixmap(self, day):
+        """绘制带日期数字的托盘图标，按日缓存，最多 31 个"""
+        pixmap = self.tray_pixmaps.get(day)
+        if pixmap is not None:
+            return pixmap
+
+        size = 64
+        header = 18
+        pixmap = QPixmap(size, size)
+        pixmap.fill(Qt.transparent)
+
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor("#ffffff"))
+        painter.drawRoundedRect(0, 0, size, size, 10, 10)
+        # 顶部红色装订条，与日历格子中的节假日颜色一致
+        painter.setBrush(QColor("#e13844"))
+        painter.drawRoundedRect(0, 0, size, header + 10, 10, 10)
+        painter.setBrush(QColor("#ffffff"))
+        painter.drawRect(0, header, size, 10)
+
+        font = QFont()
+        font.setBold(True)
+        font.setPixelSize(40)
+        painter.setFont(font)
+        painter.setPen(QColor("#333333"))
+        painter.drawText(0, header, size, size - header, Qt.AlignCenter, str(day))
+        painter.end()
+
+        self.tray_pixmaps[day] = pixmap
+        return pixmap
+
+    def build_tray_tooltip(self, today):
+        """托盘提示：公历、农历、节气与休/班信息"""
+        solar_day = Solar.fromYmd(today.year, today.month, today.day)
+        lunar_day = solar_day.getLunar()
+
+        lines = [
+            f"{today.year}年{today.month}月{today.day}日 星期{solar_day.getWeekInChinese()}",
+            f"农历{lunar_day.getMonthInChinese()}月{lunar_day.getDayInChinese()}",
+        ]
+        jieqi = lunar_day.getJieQi()
+        if jieqi:
+            lines.append(f"节气：{jieqi}")
+        festivals = list(dict.fromkeys(lunar_day.getFestivals() + solar_day.getFestivals()))
+        if festivals:
+            lines.append(" ".join(festivals))
+        mark = get_day_mark(solar_day)
+        if mark:
+            lines.append(f"今日：{mark}")
+        return "\n".join(lines)
+
     def create_tray_menu(self):
         """创建系统托盘右键菜单"""
         tray_menu = QMenu()
@@ -866,6 +1783,29 @@ class MainWindow(QMainWindow):
         silent_autostart_action.triggered.connect(lambda checked: self.toggle_silent_autostart(checked))
         tray_menu.addAction(silent_autostart_action)
 
+        # 低内存模式动作
+        low_memory_action = QAction("隐藏后释放内存", self)
+        low_memory_action.setCheckable(True)
+        low_memory_action.setChecked(self.is_low_memory_enabled())
+        low_memory_action.triggered.connect(lambda checked: self.toggle_low_memory_mode(checked))
+        tray_menu.addAction(low_memory_action)
+
+        # 深色主题动作
+        dark_theme_action = QAction("深色主题", self)
+        dark_theme_action.setCheckable(True)
+        dark_theme_action.setChecked(self.is_dark_theme_enabled())
+        dark_theme_action.triggered.connect(lambda checked: self.toggle_dark_theme(checked))
+        tray_menu.addAction(dark_theme_action)
+
+        # 列式日表动作
+        day_table_action = QAction("列式日表（NumPy）", self)
+        day_table_action.setCheckable(True)
+        day_table_action.setEnabled(np is not None)
+        day_table_action.setChecked(self.is_day_table_enabled())
+        day_table_action.triggered.connect(lambda checked: self.toggle_day_table(checked))
+        tray_menu.addAction(day_table_action)
+        self.day_table_action = day_table_action
+
         tray_menu.addSeparator()
 
         # 退出动作
@@ -877,12 +1817,43 @@ class MainWindow(QMainWindow):
 
     def on_tray_icon_activated(self, reason):
         """处理托盘图标激活事件"""
-        if reason == QSystemTrayIcon.DoubleClick or reason == QSystemTrayIcon.Trigger:
-            # 双击或左键单击切换窗口显示/隐藏状态
+        if reason == QSystemTrayIcon.Trigger:
+            # 左键单击弹出轻量的小日历，不必创建和布局主窗口
+            self.toggle_tray_popup()
+        elif reason == QSystemTrayIcon.DoubleClick:
+            # 双击切换主窗口显示/隐藏状态
             self.toggle_window_visibility()
 
+    def toggle_tray_popup(self):
+        """显示或隐藏托盘小日历，首次使用时才创建"""
+        if self.tray_popup is None:
+            self.tray_popup = TrayCalendarPopup(self.month_cache, self.clock, self.theme)
+            self.tray_popup.day_activated.connect(self.open_date)
+
+        if self.tray_popup.isVisible():
+            self.tray_popup.hide()
+            return
+
+        anchor = self.tray_icon.geometry() if self.tray_icon else QRect()
+        if not anchor.isValid():
+            anchor = QRect(QCursor.pos(), QCursor.pos())
+        self.tray_popup.popup_near(anchor)
+
+    def open_date(self, ordinal):
+        """打开主窗口并定位到指定日期"""
+        self.ensure_ui()
+        target = date.fromordinal(ordinal)
+        self.year = target.year
+        self.month = target.month
+        self.day = target.day
+        # 显示前直接提交，避免窗口先以旧日期出现
+        self.commit_render()
+        self.show_window()
+
     def toggle_window_visibility(self):
         """切换窗口显示/隐藏状态"""
+        if self.tray_popup:
+            self.tray_popup.hide()
         if self.isVisible():
             # 如果窗口当前可见，则隐藏到托盘
             self.hide_to_tray()
@@ -892,6 +1863,8 @@ class MainWindow(QMainWindow):
 
     def show_window(self):
         """显示主窗口"""
+        self.release_timer.stop()
+        self.ensure_ui()
         # 显示窗口前先检查并更新日期（使用智能检查）
         self.check_date_on_show()
         self.show()
@@ -902,6 +1875,7 @@ class MainWindow(QMainWindow):
         """隐藏窗口到系统托盘"""
         if self.tray_icon:
             self.hide()
+            self.schedule_release()
             if not self.tray_icon.supportsMessages():
                 return
             # 可以在这里添加提示消息
@@ -1060,59 +2034,51 @@ StartupNotify=true
         # self.date_timer.timeout.connect(self.check_and_update_date)
         # self.date_timer.start(60000)  # 60秒 = 1分钟
 
-        # 只保留午夜精确刷新定时器
-        self.schedule_midnight_refresh()
-
-    def schedule_midnight_refresh(self):
-        """安排午夜精确刷新"""
-        self.midnight_timer = QTimer(self)
-        self.midnight_timer.setSingleShot(True)
-        self.midnight_timer.timeout.connect(self.on_midnight_refresh)
-
-        # 计算到下一个午夜的时间
-        now = datetime.now()
-        tomorrow = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
-        time_until_midnight = (tomorrow - now).total_seconds() * 1000  # 转换为毫秒
-
-        self.midnight_timer.start(int(time_until_midnight))
-
-    def on_midnight_refresh(self):
-        """午夜刷新处理"""
-        self.refresh_calendar()
-        # 重新安排下一个午夜刷新
-        self.schedule_midnight_refresh()
+        # 午夜刷新、挂起恢复与时钟跳变检测都由时钟服务负责
+        self.clock = ClockService(self)
+        self.clock.today_changed.connect(self.on_today_changed)
 
     def check_and_update_date(self):
         """检查日期是否发生变化，如果变化则显示提示"""
-        today = datetime.now()
-        current_date = today.strftime("%Y-%m-%d")
+        stored_date = date(self.year, self.month, self.day).toordinal()
 
-        # 获取当前存储的日期
-        stored_date = f"{self.year}-{self.month:02d}-{self.day:02d}"
-
-        if current_date != stored_date:
+        if self.clock.today() != stored_date:
             # 日期已变化，但不再自动切换，只在状态栏显示提示
             # 如果当前显示的不是今天，可以在状态栏显示一个提示
             # 或者完全忽略，让用户手动切换
             pass  # 不做自动切换，保持用户当前查看的月份
 
-    def refresh_calendar(self):
-        """刷新日历显示，但保持用户当前查看的月份"""
-        today = datetime.now()
+    def on_today_changed(self, previous, today):
+        """日期变化时增量更新：只改动昨天和今天两个格子，跨月跟随时才整体重绘"""
+        self.update_tray_icon()
 
-        # 只有当用户当前正在查看今天的月份时才更新到今天
-        if self.year == today.year and self.month == today.month:
-            self.year = today.year
-            self.month = today.month
-            self.day = today.day
-            self.update_combo_boxes()
-            self.draw_calendar()
-        else:
-            # 如果用户正在查看其他月份，只刷新日历显示但不改变月份
-            self.draw_calendar()
+        # 用户停留在"今天"上时，选中状态跟随到新的今天；否则保持用户当前查看的日期
+        follow_today = date(self.year, self.month, self.day).toordinal() == previous
+
+        old_cell = self.day_cells.get(previous)
+        if old_cell:
+            old_cell.set_today(False)
+        new_cell = self.day_cells.get(today)
+        if new_cell:
+            new_cell.set_today(True)
+
+        if not follow_today:
+            return
+
+        # 同月时渲染管线只更新选中格子和左侧面板，跨月（或跨年）才整体重绘；
+        # 界面已在低内存模式下释放时只更新日期状态，重建时会按新日期绘制
+        today = date.fromordinal(today)
+        self.year = today.year
+        self.month = today.month
+        self.day = today.day
+        self.schedule_redraw()
 
     def quit_application(self):
         """完全退出应用程序"""
+        self.save_month_stores()
+        if self.day_table_worker:
+            self.day_table_worker.requestInterruption()
+            self.day_table_worker.wait()
         # 退出Qt应用程序
         QApplication.quit()
 
@@ -1125,37 +2091,35 @@ StartupNotify=true
         else:
             # 如果系统托盘不可用，则正常关闭
             event.accept()
+            self.save_month_stores()
             QApplication.quit()
 
     def showEvent(self, event):
         """重写窗口显示事件，在窗口显示时检查日期"""
+        self.release_timer.stop()
+        self.ensure_ui()
         super().showEvent(event)
+        # 首次显示（或界面重建后）让日历网格获得焦点，方向键即可直接翻日期
+        if self.focusWidget() is None:
+            self.calendar_page.setFocus()
         self.check_date_on_show()
 
     def check_date_on_show(self):
         """在窗口显示时检查是否需要更新日期"""
-        today = datetime.now()
-        current_date = today.strftime("%Y-%m-%d")
-        stored_date = f"{self.year}-{self.month:02d}-{self.day:02d}"
-
-        # 如果存储的日期不是今天，说明可能已经跨天了
-        if current_date != stored_date:
-            # 如果用户当前查看的月份不是今天的月份，不做自动切换
-            # 如果用户正在查看今天的月份但日期不对，则更新到今天
-            if self.year == today.year and self.month == today.month:
-                self.year = today.year
-                self.month = today.month
-                self.day = today.day
-                self.update_combo_boxes()
-                self.draw_calendar()
-            # 如果用户查看的是其他月份，保持不变，让用户手动切换
+        # 隐藏期间可能已经跨天，按增量方式更新；未跨天时不做任何重绘
+        self.clock.check()
 
 
 class ImportDialog(QDialog):
-    def __init__(self, parent=None, year=2025):
+    """粘贴放假通知导入假期：输入停顿后在后台线程解析，右侧实时预览解析出的休/班日期"""
+    def __init__(self, parent=None, year=2025, theme=None):
         super().__init__(parent)
         self.setWindowTitle("导入假期安排")
-        self.setMinimumSize(500, 400)
+        self.setMinimumSize(960, 520)
+        # 逐行解析结果的缓存，只有改动过的行才重新解析
+        self.line_cache = {}
+        self.worker = None
+        self.preview_pending = False
 
         layout = QVBoxLayout(self)
 
@@ -1165,25 +2129,791 @@ class ImportDialog(QDialog):
         year_layout = QHBoxLayout()
         year_layout.addWidget(QLabel("年份："))
         self.year_spinbox = QSpinBox()
-        self.year_spinbox.setRange(2000, 2100)
+        self.year_spinbox.setRange(MIN_YEAR, MAX_YEAR)
         self.year_spinbox.setValue(year)
         year_layout.addWidget(self.year_spinbox)
         year_layout.addStretch()
         layout.addLayout(year_layout)
 
+        content_layout = QHBoxLayout()
         self.text_edit = QTextEdit()
-        layout.addWidget(self.text_edit)
+        self.text_edit.setAcceptRichText(False)
+        content_layout.addWidget(self.text_edit, 1)
+
+        preview_layout = QVBoxLayout()
+        self.preview_calendar = HolidayPreviewCalendar(theme or parent.theme)
+        preview_layout.addWidget(self.preview_calendar)
+        self.summary_label = QLabel()
+        preview_layout.addWidget(self.summary_label)
+        self.problems_label = QLabel()
+        self.problems_label.setWordWrap(True)
+        self.problems_label.setAlignment(Qt.AlignTop | Qt.AlignLeft)
+        preview_layout.addWidget(self.problems_label, 1)
+        content_layout.addLayout(preview_layout)
+        layout.addLayout(content_layout)
 
         button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
-        button_box.button(QDialogButtonBox.Ok).setText("导入")
+        self.ok_button = button_box.button(QDialogButtonBox.Ok)
+        self.ok_button.setText("导入")
+        self.ok_button.setEnabled(False)
         button_box.button(QDialogButtonBox.Cancel).setText("取消")
         button_box.accepted.connect(self.accept)
         button_box.rejected.connect(self.reject)
         layout.addWidget(button_box)
 
+        # 连续输入时只在停顿后解析一次
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(IMPORT_PREVIEW_DELAY)
+        self.preview_timer.timeout.connect(self.start_preview)
+        self.text_edit.textChanged.connect(self.preview_timer.start)
+        self.year_spinbox.valueChanged.connect(self.preview_timer.start)
+
     def get_data(self):
         return self.year_spinbox.value(), self.text_edit.toPlainText()
 
+    def start_preview(self):
+        if self.worker is not None:
+            # 上一次解析尚未结束，结束后再解析最新的文本
+            self.preview_pending = True
+            return
+        year, text = self.get_data()
+        self.worker = HolidayPreviewWorker(year, text, self.line_cache, self)
+        self.worker.parsed.connect(self.show_preview)
+        self.worker.finished.connect(self.on_worker_finished)
+        self.worker.start()
+
+    def on_worker_finished(self):
+        self.worker = None
+        if self.preview_pending:
+            self.preview_pending = False
+            self.start_preview()
+
+    def show_preview(self, preview):
+        self.preview_calendar.set_marks(preview.marks)
+        rest_days = sum(1 for mark in preview.marks.values() if mark == "休")
+        self.summary_label.setText(
+            f"识别出 {len(preview.names)} 个假期：放假 {rest_days} 天，调休上班 {len(preview.marks) - rest_days} 天")
+        self.problems_label.setText("\n".join(preview.problems))
+        self.ok_button.setEnabled(bool(preview.data))
+
+    def final_preview(self):
+        """等待后台解析结束，按最终文本给出结果；各行已在缓存中，不会重新解析"""
+        self.preview_timer.stop()
+        self.preview_pending = False
+        if self.worker is not None:
+            self.worker.wait()
+        year, text = self.get_data()
+        return preview_holiday_notice(year, text, self.line_cache)
+
+    def done(self, result):
+        if self.worker is not None:
+            self.worker.requestInterruption()
+            self.worker.wait()
+        super().done(result)
+
+
+class HolidayPreviewCalendar(QWidget):
+    """导入预览的小月历：只绘制含有休/班日期的月份（最多 12 个），每月一格"""
+    COLUMNS = 4
+    ROWS = 3
+    CELL = 16
+    TITLE_HEIGHT = 20
+    SPACING = 10
+
+    def __init__(self, theme, parent=None):
+        super().__init__(parent)
+        self.theme = theme
+        self.marks = {}
+        self.months = []
+        self.setFixedSize(self.COLUMNS * (self.CELL * 7 + self.SPACING), self.ROWS * self.month_height())
+
+        self.title_font = QFont()
+        self.title_font.setPixelSize(12)
+        self.title_font.setBold(True)
+        self.day_font = QFont()
+        self.day_font.setPixelSize(10)
+
+    def month_height(self):
+        return self.TITLE_HEIGHT + self.CELL * 6 + self.SPACING
+
+    def set_marks(self, marks):
+        self.marks = marks
+        months = sorted({(day.year, day.month) for day in map(date.fromordinal, marks)})
+        self.months = months[:self.COLUMNS * self.ROWS]
+        self.update()
+
+    def paintEvent(self, event):
+        colors = self.theme.colors
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.fillRect(self.rect(), colors["panel"])
+        if not self.months:
+            painter.setPen(colors["muted"])
+            painter.drawText(self.rect(), Qt.AlignCenter, "解析出的休/班日期将显示在这里")
+            painter.end()
+            return
+
+        for i, (year, month) in enumerate(self.months):
+            left = (i % self.COLUMNS) * (self.CELL * 7 + self.SPACING)
+            top = (i // self.COLUMNS) * self.month_height()
+            painter.setFont(self.title_font)
+            painter.setPen(colors["text"])
+            painter.drawText(QRect(left, top, self.CELL * 7, self.TITLE_HEIGHT), Qt.AlignCenter, f"{year}年{month}月")
+
+            painter.setFont(self.day_font)
+            first = date(year, month, 1)
+            offset = (first.weekday() + 1) % 7
+            for day in range(1, calendar.monthrange(year, month)[1] + 1):
+                slot = offset + day - 1
+                rect = QRect(left + (slot % 7) * self.CELL, top + self.TITLE_HEIGHT + (slot // 7) * self.CELL,
+                             self.CELL, self.CELL)
+                mark = self.marks.get(first.toordinal() + day - 1)
+                if mark:
+                    painter.setPen(Qt.NoPen)
+                    painter.setBrush(colors["festival"] if mark == "休" else colors["muted"])
+                    painter.drawRoundedRect(rect.adjusted(1, 1, -1, -1), 4, 4)
+                    painter.setPen(colors["on_accent"])
+                else:
+                    painter.setPen(colors["secondary"])
+                painter.drawText(rect, Qt.AlignCenter, str(day))
+        painter.end()
+
+
+class EventDialog(QDialog):
+    """为某一天添加个人日程"""
+
+    def __init__(self, parent, year, month, day):
+        super().__init__(parent)
+        self.setWindowTitle("添加日程")
+        self.year, self.month, self.day = year, month, day
+        lunar_day = Solar.fromYmd(year, month, day).getLunar()
+        self.lunar_month = lunar_day.getMonth()
+        self.lunar_day = lunar_day.getDay()
+
+        layout = QFormLayout(self)
+        self.title_edit = QLineEdit()
+        layout.addRow("标题：", self.title_edit)
+
+        self.repeat_combo = QComboBox()
+        self.repeat_combo.addItem(f"仅 {year}年{month}月{day}日", EVENT_ONCE)
+        self.repeat_combo.addItem(f"每年公历 {month}月{day}日", EVENT_YEARLY)
+        self.repeat_combo.addItem(f"每年农历 {lunar_day.getMonthInChinese()}月{lunar_day.getDayInChinese()}", EVENT_LUNAR_YEARLY)
+        layout.addRow("重复：", self.repeat_combo)
+
+        self.remind_checkbox = QCheckBox("当天提醒")
+        self.remind_time = QTimeEdit(QTime(9, 0))
+        self.remind_time.setDisplayFormat("HH:mm")
+        self.remind_time.setEnabled(False)
+        self.remind_checkbox.toggled.connect(self.remind_time.setEnabled)
+        remind_layout = QHBoxLayout()
+        remind_layout.addWidget(self.remind_checkbox)
+        remind_layout.addWidget(self.remind_time)
+        layout.addRow("提醒：", remind_layout)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.button(QDialogButtonBox.Ok).setText("添加")
+        button_box.button(QDialogButtonBox.Cancel).setText("取消")
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addRow(button_box)
+
+    def get_event(self):
+        """返回 EventStore.add_event 的参数"""
+        repeat = self.repeat_combo.currentData()
+        if repeat == EVENT_LUNAR_YEARLY:
+            month, day = self.lunar_month, self.lunar_day
+        else:
+            month, day = self.month, self.day
+        remind_minute = None
+        if self.remind_checkbox.isChecked():
+            remind_time = self.remind_time.time()
+            remind_minute = remind_time.hour() * 60 + remind_time.minute()
+        return self.title_edit.text().strip(), repeat, self.year, month, day, remind_minute
+
+
+class ExportDialog(QDialog):
+    def __init__(self, parent=None, year=2025):
+        super().__init__(parent)
+        self.setWindowTitle("导出日历（iCalendar）")
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("请选择导出的年份范围和内容："))
+
+        year_layout = QHBoxLayout()
+        year_layout.addWidget(QLabel("从"))
+        self.start_spinbox = QSpinBox()
+        self.start_spinbox.setRange(MIN_YEAR, MAX_YEAR)
+        self.start_spinbox.setValue(year)
+        year_layout.addWidget(self.start_spinbox)
+        year_layout.addWidget(QLabel("年 至"))
+        self.end_spinbox = QSpinBox()
+        self.end_spinbox.setRange(MIN_YEAR, MAX_YEAR)
+        self.end_spinbox.setValue(year)
+        year_layout.addWidget(self.end_spinbox)
+        year_layout.addWidget(QLabel("年"))
+        year_layout.addStretch()
+        layout.addLayout(year_layout)
+
+        self.holidays_checkbox = QCheckBox("法定节假日与调休（休/班）")
+        self.festivals_checkbox = QCheckBox("节日")
+        self.jieqi_checkbox = QCheckBox("二十四节气")
+        for checkbox in (self.holidays_checkbox, self.festivals_checkbox, self.jieqi_checkbox):
+            checkbox.setChecked(True)
+            layout.addWidget(checkbox)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.button(QDialogButtonBox.Ok).setText("导出")
+        button_box.button(QDialogButtonBox.Cancel).setText("取消")
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+    def get_data(self):
+        start_year = min(self.start_spinbox.value(), self.end_spinbox.value())
+        end_year = max(self.start_spinbox.value(), self.end_spinbox.value())
+        options = {
+            "holidays": self.holidays_checkbox.isChecked(),
+            "festivals": self.festivals_checkbox.isChecked(),
+            "jieqi": self.jieqi_checkbox.isChecked(),
+        }
+        return start_year, end_year, options
+
+
+class IcsExportWorker(QThread):
+    """在后台线程中流式写出 .ics 文件，按年份报告进度，可中途取消"""
+    progress = Signal(int)
+    succeeded = Signal()
+    failed = Signal(str)
+
+    def __init__(self, path, start_year, end_year, options, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.start_year = start_year
+        self.end_year = end_year
+        self.options = options
+
+    def run(self):
+        try:
+            write_ics(self.path, self.tracked(iter_calendar_events(self.start_year, self.end_year, **self.options)))
+        except InterruptedError:
+            os.remove(self.path)
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit()
+
+    def tracked(self, events):
+        year = self.start_year
+        for event in events:
+            if event.start.year != year and not event.rrule:
+                year = event.start.year
+                self.progress.emit(year)
+                if self.isInterruptionRequested():
+                    raise InterruptedError
+            yield event
+        self.progress.emit(self.end_year + 1)
+
+
+
+class MonthExportDialog(QDialog):
+    """选择导出月历的月份范围与格式"""
+    def __init__(self, parent=None, year=2025, month=1):
+        super().__init__(parent)
+        self.setWindowTitle("导出月历（PDF/PNG）")
+
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        range_layout = QHBoxLayout()
+        self.start_edit = QDateEdit(QDate(year, month, 1))
+        self.end_edit = QDateEdit(QDate(year, month, 1))
+        for edit in (self.start_edit, self.end_edit):
+            edit.setDisplayFormat("yyyy年M月")
+            edit.setDateRange(QDate(MIN_YEAR, 1, 1), QDate(MAX_YEAR, 12, 31))
+        range_layout.addWidget(self.start_edit)
+        range_layout.addWidget(QLabel("至"))
+        range_layout.addWidget(self.end_edit)
+        form.addRow("月份：", range_layout)
+
+        shortcut_layout = QHBoxLayout()
+        month_button = QPushButton("本月")
+        month_button.clicked.connect(lambda: self.set_range(year, month, year, month))
+        year_button = QPushButton(f"{year}年全年")
+        year_button.clicked.connect(lambda: self.set_range(year, 1, year, 12))
+        shortcut_layout.addWidget(month_button)
+        shortcut_layout.addWidget(year_button)
+        shortcut_layout.addStretch()
+        form.addRow("", shortcut_layout)
+
+        self.format_combo = QComboBox()
+        self.format_combo.addItems(["PDF（每月一页）", "PNG（每月一张图片）"])
+        form.addRow("格式：", self.format_combo)
+        layout.addLayout(form)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.button(QDialogButtonBox.Ok).setText("导出")
+        button_box.button(QDialogButtonBox.Cancel).setText("取消")
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+    def set_range(self, start_year, start_month, end_year, end_month):
+        self.start_edit.setDate(QDate(start_year, start_month, 1))
+        self.end_edit.setDate(QDate(end_year, end_month, 1))
+
+    def get_data(self):
+        """返回 ([(年, 月), ...], 是否为 PDF)"""
+        start, end = self.start_edit.date(), self.end_edit.date()
+        first = start.year() * 12 + start.month() - 1
+        last = end.year() * 12 + end.month() - 1
+        first, last = min(first, last), max(first, last)
+        return [(index // 12, index % 12 + 1) for index in range(first, last + 1)], self.format_combo.currentIndex() == 0
+
+
+def paint_month_page(painter, days, colors):
+    """按月历格子的样式在 MONTH_PAGE_WIDTH x MONTH_PAGE_HEIGHT 的页面上绘制一个月，可在工作线程中调用"""
+    margin = 60
+    title_height = 90
+    week_height = 50
+    info = days[0]
+
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.fillRect(QRect(0, 0, MONTH_PAGE_WIDTH, MONTH_PAGE_HEIGHT), colors["panel"])
+
+    font = QFont()
+    font.setPixelSize(44)
+    font.setBold(True)
+    painter.setFont(font)
+    painter.setPen(colors["text"])
+    painter.drawText(QRect(margin, margin - 20, MONTH_PAGE_WIDTH - margin * 2, title_height),
+                     Qt.AlignLeft | Qt.AlignVCenter, f"{info.year}年{info.month}月")
+
+    cell_width = (MONTH_PAGE_WIDTH - margin * 2) // 7
+    rows = (info.week + len(days) + 6) // 7
+    top = margin - 20 + title_height
+    cell_height = (MONTH_PAGE_HEIGHT - top - week_height - margin) // rows
+
+    font.setPixelSize(20)
+    font.setBold(False)
+    painter.setFont(font)
+    for i, name in enumerate(["日", "一", "二", "三", "四", "五", "六"]):
+        painter.setPen(colors["festival"] if i == 0 or i == 6 else colors["secondary"])
+        painter.drawText(QRect(margin + i * cell_width, top, cell_width, week_height), Qt.AlignCenter, name)
+    top += week_height
+
+    number_font = QFont()
+    number_font.setPixelSize(40)
+    number_font.setBold(True)
+    text_font = QFont()
+    text_font.setPixelSize(18)
+    mark_font = QFont()
+    mark_font.setPixelSize(16)
+    for i, day in enumerate(days):
+        slot = info.week + i
+        rect = QRect(margin + (slot % 7) * cell_width, top + (slot // 7) * cell_height, cell_width, cell_height)
+        painter.setPen(QPen(colors["cell_border"], 2))
+        painter.setBrush(colors["cell"])
+        painter.drawRect(rect)
+
+        if day.mark:
+            painter.setFont(mark_font)
+            painter.setPen(colors["rest_mark"] if day.mark == "休" else colors["muted"])
+            painter.drawText(QRect(rect.left() + 8, rect.top() + 6, 24, 24), Qt.AlignCenter, day.mark)
+
+        painter.setFont(number_font)
+        painter.setPen(colors["festival"] if day.mark == "休" else colors["text"])
+        painter.drawText(QRect(rect.left(), rect.top() + 10, rect.width(), rect.height() // 2),
+                         Qt.AlignCenter, str(day.day))
+
+        painter.setFont(text_font)
+        text_top = rect.top() + 10 + rect.height() // 2
+        if day.festival:
+            painter.setPen(colors["festival"])
+            painter.drawText(QRect(rect.left(), text_top - 24, rect.width(), 24), Qt.AlignCenter, day.festival)
+        painter.setPen(colors["muted"])
+        painter.drawText(QRect(rect.left(), text_top, rect.width(), 24), Qt.AlignCenter, day.lunar_text)
+
+
+class MonthPageTask(QRunnable):
+    """在线程池中绘制一页月历：PDF 录制为 QPicture（保留矢量），PNG 绘制到 QImage 后直接保存"""
+
+    def __init__(self, days, colors, path, job):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.days = days
+        self.colors = colors
+        self.path = path
+        self.job = job
+        self.page = None
+        self.error = None
+
+    def run(self):
+        if self.job.isInterruptionRequested():
+            return
+        try:
+            if self.path is None:
+                self.page = QPicture()
+            else:
+                self.page = QImage(MONTH_PAGE_WIDTH, MONTH_PAGE_HEIGHT, QImage.Format_RGB32)
+            painter = QPainter(self.page)
+            paint_month_page(painter, self.days, self.colors)
+            painter.end()
+            if self.path is not None:
+                if not self.page.save(self.path, "PNG"):
+                    raise OSError(f"无法写入 {self.path}")
+                self.page = None
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.job.page_done()
+
+
+class MonthPageExportWorker(QThread):
+    """在后台导出月历：进程池计算各月数据，线程池逐页并行绘制，PDF 最后按月份顺序写出。
+
+    所有文件先写成 .part 临时文件，全部成功后才改为正式文件名；取消或出错时删除临时文件，
+    不会留下不完整的一组 PNG 或半个 PDF。
+    """
+    progress = Signal(int)
+    succeeded = Signal(list)
+    failed = Signal(str)
+    cancelled = Signal()
+
+    def __init__(self, path, months, as_pdf, theme, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.months = months
+        self.as_pdf = as_pdf
+        self.colors = theme.colors
+        # 在界面线程中取出当前地区的假期数据，导出期间切换地区不影响结果
+        self.holiday_data = current_holiday_data()
+        self.pages_done = 0
+        self.pages_lock = threading.Lock()
+
+    def page_done(self):
+        with self.pages_lock:
+            self.pages_done += 1
+
+    def output_paths(self):
+        """最终写出的文件：PDF 只有一个文件，多个月份的 PNG 在文件名后加上年月"""
+        if self.as_pdf or len(self.months) == 1:
+            return [self.path]
+        base, extension = os.path.splitext(self.path)
+        return [f"{base}-{year}-{month:02d}{extension or '.png'}" for year, month in self.months]
+
+    def run(self):
+        count = len(self.months)
+        paths = self.output_paths()
+        temp_paths = [f"{path}.part" for path in paths]
+        try:
+            month_days = build_months(self.months, self.holiday_data, self.progress.emit,
+                                      self.isInterruptionRequested)
+            if month_days is None:
+                raise InterruptedError
+
+            pool = QThreadPool()
+            page_paths = [None] * count if self.as_pdf else temp_paths
+            tasks = [MonthPageTask(days, self.colors, path, self) for days, path in zip(month_days, page_paths)]
+            for task in tasks:
+                pool.start(task)
+            while not pool.waitForDone(100):
+                self.progress.emit(count + self.pages_done)
+            if self.isInterruptionRequested():
+                raise InterruptedError
+            errors = [task.error for task in tasks if task.error]
+            if errors:
+                raise RuntimeError(errors[0])
+
+            if self.as_pdf:
+                self.write_pdf([task.page for task in tasks], temp_paths[0])
+            for temp_path, path in zip(temp_paths, paths):
+                os.replace(temp_path, path)
+        except InterruptedError:
+            self.remove_files(temp_paths)
+            self.cancelled.emit()
+            return
+        except Exception as e:
+            self.remove_files(temp_paths)
+            self.failed.emit(str(e))
+            return
+        self.progress.emit(count * 2)
+        self.succeeded.emit(paths)
+
+    @staticmethod
+    def remove_files(paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def write_pdf(self, pages, path):
+        writer = QPdfWriter(path)
+        writer.setPageSize(QPageSize(QPageSize.A4))
+        writer.setPageOrientation(QPageLayout.Landscape)
+        writer.setResolution(150)
+        writer.setTitle("万年历")
+        painter = QPainter(writer)
+        if not painter.isActive():
+            raise OSError(f"无法写入 {path}")
+        viewport = painter.viewport()
+        scale = min(viewport.width() / MONTH_PAGE_WIDTH, viewport.height() / MONTH_PAGE_HEIGHT)
+        # QPicture 回放时会按录制设备与目标设备的 DPI 之比放大，这里先抵消
+        scale *= QPicture().logicalDpiX() / writer.logicalDpiX()
+        for i, page in enumerate(pages):
+            if i:
+                writer.newPage()
+            painter.save()
+            painter.scale(scale, scale)
+            painter.drawPicture(0, 0, page)
+            painter.restore()
+        painter.end()
+
+
+class YiJiSearchDialog(QDialog):
+    """择日：在日期范围内查找宜某事、不忌某事（可限定休息日）的日子"""
+    day_activated = Signal(int)  # 双击结果时的日期序数
+
+    ANY_ACTIVITY = "（不限）"
+    WEEKDAYS = "一二三四五六日"
+
+    def __init__(self, index, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("择日")
+        self.setMinimumSize(420, 480)
+        self.index = index
+        self.worker = None
+
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+
+        today = QDate.currentDate()
+        range_layout = QHBoxLayout()
+        self.start_edit = QDateEdit(today)
+        self.end_edit = QDateEdit(today.addYears(1))
+        for edit in (self.start_edit, self.end_edit):
+            edit.setCalendarPopup(True)
+            edit.setDisplayFormat("yyyy-MM-dd")
+            edit.setDateRange(QDate(MIN_YEAR, 1, 1), QDate(MAX_YEAR, 12, 31))
+        range_layout.addWidget(self.start_edit)
+        range_layout.addWidget(QLabel("至"))
+        range_layout.addWidget(self.end_edit)
+        form.addRow("日期：", range_layout)
+
+        self.yi_combo = QComboBox()
+        self.ji_combo = QComboBox()
+        for combo in (self.yi_combo, self.ji_combo):
+            combo.addItem(self.ANY_ACTIVITY)
+            combo.addItems(YI_JI_ACTIVITIES)
+        form.addRow("宜：", self.yi_combo)
+        form.addRow("不忌：", self.ji_combo)
+
+        self.rest_checkbox = QCheckBox("仅休息日（周末与法定假日）")
+        form.addRow("", self.rest_checkbox)
+        layout.addLayout(form)
+
+        self.search_button = QPushButton("查询")
+        self.search_button.clicked.connect(self.on_search_clicked)
+        layout.addWidget(self.search_button)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+        self.result_list = QListWidget()
+        self.result_list.itemActivated.connect(lambda item: self.day_activated.emit(item.data(Qt.UserRole)))
+        layout.addWidget(self.result_list)
+
+    def query(self):
+        first = self.start_edit.date().toPython().toordinal()
+        last = self.end_edit.date().toPython().toordinal()
+        first, last = min(first, last), max(first, last)
+        yi = [self.yi_combo.currentText()] if self.yi_combo.currentIndex() > 0 else []
+        ji = [self.ji_combo.currentText()] if self.ji_combo.currentIndex() > 0 else []
+        return first, last, yi, ji, self.rest_checkbox.isChecked()
+
+    def on_search_clicked(self):
+        first, last = self.query()[:2]
+        missing = self.index.missing_years(date.fromordinal(first).year, date.fromordinal(last).year)
+        if not missing:
+            self.show_results()
+            return
+
+        # 缺少的年份先在后台并行建立索引
+        progress = QProgressDialog("正在建立宜忌索引…", "取消", 0, len(missing), self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(300)
+
+        self.search_button.setEnabled(False)
+        self.worker = YiJiIndexWorker(self.index, missing, self)
+        self.worker.progress.connect(progress.setValue)
+        progress.canceled.connect(self.worker.requestInterruption)
+        self.worker.finished.connect(progress.close)
+        self.worker.finished.connect(lambda: self.search_button.setEnabled(True))
+        self.worker.succeeded.connect(self.show_results)
+        self.worker.failed.connect(
+            lambda message: QMessageBox.critical(self, "错误", f"建立宜忌索引时发生错误：\n{message}"))
+        self.worker.start()
+
+    def show_results(self):
+        first, last, yi, ji, rest_only = self.query()
+        ordinals = self.index.search(first, last, yi, ji, rest_only)
+
+        self.result_list.clear()
+        for ordinal in ordinals:
+            day = date.fromordinal(ordinal)
+            item = QListWidgetItem(f"{day:%Y-%m-%d}  星期{self.WEEKDAYS[day.weekday()]}")
+            item.setData(Qt.UserRole, ordinal)
+            self.result_list.addItem(item)
+        self.summary_label.setText(f"共 {len(ordinals)} 天，双击打开")
+
+
+class ConvertDialog(QDialog):
+    """农历与公历批量换算：每行一个日期（或 CSV 的某一列），结果追加在行尾"""
+    def __init__(self, parent=None, year=2025):
+        super().__init__(parent)
+        self.setWindowTitle("农历公历换算")
+        self.setMinimumSize(520, 520)
+
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        self.direction_combo = QComboBox()
+        self.direction_combo.addItems(["农历转公历", "公历转农历"])
+        form.addRow("方向：", self.direction_combo)
+
+        year_layout = QHBoxLayout()
+        self.anniversary_checkbox = QCheckBox("按农历年换算纪念日（如生日）")
+        self.year_spinbox = QSpinBox()
+        self.year_spinbox.setRange(MIN_YEAR, MAX_YEAR)
+        self.year_spinbox.setValue(year)
+        self.year_spinbox.setEnabled(False)
+        self.anniversary_checkbox.toggled.connect(self.year_spinbox.setEnabled)
+        self.direction_combo.currentIndexChanged.connect(
+            lambda index: self.anniversary_checkbox.setEnabled(index == 0))
+        year_layout.addWidget(self.anniversary_checkbox)
+        year_layout.addWidget(self.year_spinbox)
+        year_layout.addWidget(QLabel("年"))
+        year_layout.addStretch()
+        form.addRow("", year_layout)
+
+        self.column_spinbox = QSpinBox()
+        self.column_spinbox.setRange(1, 99)
+        form.addRow("日期所在列：", self.column_spinbox)
+        layout.addLayout(form)
+
+        layout.addWidget(QLabel("输入（每行一个日期，闰月写作 2025-闰06-01；也可粘贴 CSV）："))
+        self.input_edit = QTextEdit()
+        self.input_edit.setAcceptRichText(False)
+        layout.addWidget(self.input_edit)
+
+        button_layout = QHBoxLayout()
+        self.open_button = QPushButton("打开文件…")
+        self.open_button.clicked.connect(self.on_open_clicked)
+        self.convert_button = QPushButton("换算")
+        self.convert_button.clicked.connect(self.on_convert_clicked)
+        self.save_button = QPushButton("保存结果…")
+        self.save_button.clicked.connect(self.on_save_clicked)
+        button_layout.addWidget(self.open_button)
+        button_layout.addStretch()
+        button_layout.addWidget(self.convert_button)
+        button_layout.addWidget(self.save_button)
+        layout.addLayout(button_layout)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+        self.output_edit = QTextEdit()
+        self.output_edit.setReadOnly(True)
+        layout.addWidget(self.output_edit)
+
+    def on_open_clicked(self):
+        path, _ = QFileDialog.getOpenFileName(self, "打开日期文件", "", "CSV/文本文件 (*.csv *.txt);;所有文件 (*)")
+        if not path:
+            return
+        try:
+            with open(path, encoding="utf-8-sig") as f:
+                self.input_edit.setPlainText(f.read())
+        except (OSError, UnicodeDecodeError) as e:
+            QMessageBox.warning(self, "打开失败", f"无法读取文件：{e}")
+
+    def on_convert_clicked(self):
+        year = self.year_spinbox.value() if self.anniversary_checkbox.isChecked() else None
+        to_solar = self.direction_combo.currentIndex() == 0
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator="\n")
+        converted = errors = 0
+        for row, error in iter_converted_rows(csv.reader(self.input_edit.toPlainText().splitlines()), to_solar,
+                                              self.column_spinbox.value() - 1, year if to_solar else None):
+            writer.writerow(row)
+            converted += 1
+            errors += bool(error)
+        self.output_edit.setPlainText(output.getvalue())
+        self.summary_label.setText(f"共 {converted} 行，{errors} 行无法换算" if errors else f"共 {converted} 行")
+
+    def on_save_clicked(self):
+        path, _ = QFileDialog.getSaveFileName(self, "保存换算结果", "converted.csv", "CSV 文件 (*.csv)")
+        if not path:
+            return
+        try:
+            with open(path, "w", encoding="utf-8-sig", newline="") as f:
+                f.write(self.output_edit.toPlainText())
+        except OSError as e:
+            QMessageBox.warning(self, "保存失败", f"无法写入文件：{e}")
+
+
+class YiJiIndexWorker(QThread):
+    """在后台线程中用进程池建立宜忌索引，按年份报告进度，可中途取消"""
+    progress = Signal(int)
+    succeeded = Signal()
+    failed = Signal(str)
+
+    def __init__(self, index, years, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.years = years
+
+    def run(self):
+        try:
+            self.index.build(self.years, self.progress.emit, self.isInterruptionRequested)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        if not self.isInterruptionRequested():
+            self.succeeded.emit()
+
+
+class HolidayPreviewWorker(QThread):
+    """在后台线程中解析导入对话框的文本，逐行结果缓存在 line_cache 中"""
+    parsed = Signal(object)
+
+    def __init__(self, year, text, line_cache, parent=None):
+        super().__init__(parent)
+        self.year = year
+        self.text = text
+        self.line_cache = line_cache
+
+    def run(self):
+        preview = preview_holiday_notice(self.year, self.text, self.line_cache)
+        if not self.isInterruptionRequested():
+            self.parsed.emit(preview)
+
+
+class DayTableWorker(QThread):
+    """在后台线程中用进程池建立列式日表，按年份报告进度，可中途取消"""
+    progress = Signal(int)
+    succeeded = Signal()
+    failed = Signal(str)
+
+    def __init__(self, table, parent=None):
+        super().__init__(parent)
+        self.table = table
+
+    def run(self):
+        try:
+            built = self.table.build(self.progress.emit, self.isInterruptionRequested)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        if built:
+            self.succeeded.emit()
+
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -1201,6 +2931,25 @@ if __name__ == "__main__":
     # 检查是否为静默启动模式
     silent_start = "--silent" in sys.argv or "--tray" in sys.argv
 
+    # --metrics-dump 文件：定期并在退出时把性能计数写入 JSON 文件，便于用户反馈卡顿时附上
+    metrics_dump_path = None
+    for i, arg in enumerate(sys.argv):
+        if arg == "--metrics-dump" and i + 1 < len(sys.argv):
+            metrics_dump_path = sys.argv[i + 1]
+        elif arg.startswith("--metrics-dump="):
+            metrics_dump_path = arg.split("=", 1)[1]
+    if metrics_dump_path:
+        def dump_metrics():
+            try:
+                METRICS.dump(metrics_dump_path)
+            except OSError as e:
+                print(f"无法写入性能计数文件：{e}", file=sys.stderr)
+
+        metrics_dump_timer = QTimer()
+        metrics_dump_timer.timeout.connect(dump_metrics)
+        metrics_dump_timer.start(METRICS_DUMP_INTERVAL)
+        app.aboutToQuit.connect(dump_metrics)
+
     window = MainWindow()
 
     # 如果不是静默启动，则显示主窗口
@@ -1210,6 +2959,7 @@ if __name__ == "__main__":
         # 静默启动时，确保窗口最小化到托盘
         if window.tray_icon and window.tray_icon.isVisible():
             print("静默启动模式，程序已在系统托盘运行")
+            window.schedule_release()
         else:
             # 如果系统不支持托盘，仍然显示窗口
             print("系统不支持托盘，显示主窗口")
@@ -0,0 +1,198 @@
+"""calendar_core 的单元测试（不依赖 PySide6）：python -m unittest test_calendar_core"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+
+import calendar_core
+from calendar_core import (
+    DEFAULT_REGION, HolidayRegion, HolidayUtil, MonthDiskCache, current_holiday_data, iter_ics_holiday_records,
+    user_holidays_path,
+)
+
+
+def ics_event(dtstart, dtend=None, summary="元旦（休）"):
+    lines = ["BEGIN:VCALENDAR", "BEGIN:VEVENT", f"DTSTART{dtstart}"]
+    if dtend is not None:
+        lines.append(f"DTEND{dtend}")
+    lines += [f"SUMMARY:{summary}", "END:VEVENT", "END:VCALENDAR"]
+    return lines
+
+
+def imported_days(lines):
+    return [record.day for record in iter_ics_holiday_records(lines)]
+
+
+class IcsHolidayRecordsTest(unittest.TestCase):
+    def test_all_day_event_end_is_exclusive(self):
+        days = imported_days(ics_event(";VALUE=DATE:20250128", ";VALUE=DATE:20250131", "春节（休）"))
+        self.assertEqual(days, [date(2025, 1, 28), date(2025, 1, 29), date(2025, 1, 30)])
+
+    def test_floating_date_time_event_keeps_its_day(self):
+        records = list(iter_ics_holiday_records(ics_event(":20250101T090000", ":20250101T180000")))
+        self.assertEqual([(r.day, r.name, r.is_work) for r in records], [(date(2025, 1, 1), "元旦", False)])
+
+    def test_date_time_end_includes_its_date_unless_midnight(self):
+        self.assertEqual(imported_days(ics_event(":20250128T090000", ":20250130T180000")),
+                         [date(2025, 1, 28), date(2025, 1, 29), date(2025, 1, 30)])
+        self.assertEqual(imported_days(ics_event(":20250128T000000", ":20250130T000000")),
+                         [date(2025, 1, 28), date(2025, 1, 29)])
+
+    def test_utc_date_time_is_converted_to_china_time(self):
+        # 2024-12-31 16:00 UTC 是北京时间 2025-01-01 零点
+        self.assertEqual(imported_days(ics_event(":20241231T160000Z", ":20250101T160000Z")), [date(2025, 1, 1)])
+        # 北京时间 1 月 1 日 09:00-18:00
+        self.assertEqual(imported_days(ics_event(":20250101T010000Z", ":20250101T100000Z")), [date(2025, 1, 1)])
+        # 北京时间 10 月 1 日至 10 月 7 日 23:59
+        days = imported_days(ics_event(":20250930T160000Z", ":20251007T155900Z", "国庆节（休）"))
+        self.assertEqual(days, [date(2025, 10, day) for day in range(1, 8)])
+
+    def test_missing_dtend_yields_start_day(self):
+        self.assertEqual(imported_days(ics_event(":20241231T170000Z")), [date(2025, 1, 1)])
+
+
+def holiday_record(day, name_index=0, is_work=False, target=None):
+    return f"{day}{chr(48 + name_index)}{int(is_work)}{target or day}"
+
+
+class UserHolidaysReloadTest(unittest.TestCase):
+    """按年份增量重新编译的结果必须与从头编译完全一致"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        patcher = mock.patch.object(calendar_core, "CONFIG_DIR", directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        _, self.base_data = current_holiday_data()
+        self.path = user_holidays_path(DEFAULT_REGION)
+        self.mtime = 10 ** 18
+        self.region = self.new_region()
+
+    def new_region(self):
+        return HolidayRegion(DEFAULT_REGION, "内地", list(HolidayUtil.NAMES), self.base_data)
+
+    def write_years(self, years):
+        with open(self.path, "w") as f:
+            json.dump(years, f)
+        # 同一秒内多次写入时 mtime 可能不变，这里手动推进
+        self.mtime += 10 ** 9
+        os.utime(self.path, ns=(self.mtime, self.mtime))
+
+    def assert_matches_full_compile(self):
+        full = self.new_region()
+        full.load_user_holidays()
+        self.assertEqual(self.region.data, full.data)
+
+    def test_edit_year(self):
+        self.write_years({"2025": holiday_record("20250102") + holiday_record("20250103"),
+                          "2026": holiday_record("20260105", 1, True)})
+        self.region.load_user_holidays()
+        self.assert_matches_full_compile()
+
+        self.write_years({"2025": holiday_record("20250102") + holiday_record("20250106", 2),
+                          "2026": holiday_record("20260105", 1, True)})
+        days = self.region.load_user_holidays()
+        self.assertEqual(days, {date(2025, 1, 2), date(2025, 1, 3), date(2025, 1, 6)})
+        self.assert_matches_full_compile()
+        self.assertNotIn("20250103", self.region.data)
+
+    def test_removal_and_later_records_win(self):
+        self.write_years({"2025": holiday_record("20251001", 5) + "20251002~020251002"
+                          + holiday_record("20251001", 6, True)})
+        self.region.load_user_holidays()
+        self.assert_matches_full_compile()
+        self.assertIn(holiday_record("20251001", 6, True), self.region.data)
+
+    def test_delete_year(self):
+        self.write_years({"2025": holiday_record("20250102"), "2026": holiday_record("20260105")})
+        self.region.load_user_holidays()
+        self.write_years({"2026": holiday_record("20260105")})
+        self.assertEqual(self.region.load_user_holidays(), {date(2025, 1, 2)})
+        self.assert_matches_full_compile()
+
+    def test_delete_file(self):
+        self.write_years({"2025": holiday_record("20250102")})
+        self.region.load_user_holidays()
+        os.remove(self.path)
+        self.assertEqual(self.region.load_user_holidays(), {date(2025, 1, 2)})
+        self.assert_matches_full_compile()
+        self.assertEqual(self.region.data, self.base_data)
+
+    def test_unchanged_file_is_not_recompiled(self):
+        self.write_years({"2025": holiday_record("20250102")})
+        self.region.load_user_holidays()
+        self.assertEqual(self.region.load_user_holidays(), set())
+
+
+class MonthDiskCacheTest(unittest.TestCase):
+    """保存、重新打开、按月份失效后，读到的数据与直接计算的一致"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.holiday_data = "v1"
+        self.months = [(2025, month) for month in range(1, 13)]
+
+    def new_store(self):
+        store = MonthDiskCache(self.directory, DEFAULT_REGION, lambda: self.holiday_data)
+        self.addCleanup(store.close)
+        return store
+
+    def fill(self, store):
+        return [store.get(year, month) for year, month in self.months]
+
+    def cache_files(self):
+        return [name for name in os.listdir(self.directory) if name.endswith(".bin")]
+
+    def test_save_and_reopen(self):
+        store = self.new_store()
+        expected = self.fill(store)
+        self.assertEqual(store.misses, 12)
+        store.save()
+
+        reopened = self.new_store()
+        self.assertEqual(self.fill(reopened), expected)
+        self.assertEqual((reopened.hits, reopened.misses), (12, 0))
+
+    def check_invalidate_months(self, store, expected):
+        self.holiday_data = "v2"
+        store.invalidate({2025 * 12 + 2})
+        self.assertEqual(len(store.pending), 11)
+        store.save()
+        self.assertEqual(len(self.cache_files()), 1)
+
+        reopened = self.new_store()
+        self.assertEqual(self.fill(reopened), expected)
+        self.assertEqual((reopened.hits, reopened.misses), (11, 1))
+
+    def test_invalidate_months_while_open(self):
+        store = self.new_store()
+        expected = self.fill(store)
+        store.save()
+        reopened = self.new_store()
+        self.fill(reopened)
+        self.check_invalidate_months(reopened, expected)
+
+    def test_invalidate_months_after_save(self):
+        store = self.new_store()
+        expected = self.fill(store)
+        store.save()
+        self.check_invalidate_months(store, expected)
+
+    def test_invalidate_all(self):
+        store = self.new_store()
+        self.fill(store)
+        store.save()
+        self.holiday_data = "v2"
+        store.invalidate()
+        self.assertEqual(store.pending, {})
+        self.fill(store)
+        self.assertEqual(store.misses, 24)
+
+
+if __name__ == "__main__":
+    unittest.main()